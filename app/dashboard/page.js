@@ -920,7 +920,7 @@ export default function Dashboard() {
                               return item.image_filename && isOwner ? (
                                 <div className="mb-3 rounded-lg overflow-hidden">
                                   <img
-                                    src={`http://localhost:5000/api/uploads/${item.image_filename}`}
+                                    src={`http://localhost:5000/api/uploads/${item.image_filename}?w=640`}
                                     alt={item.title}
                                     loading="lazy"
                                     className="w-full h-48 object-cover hover:scale-105 transition-transform duration-200"
@@ -970,7 +970,7 @@ export default function Dashboard() {
                               return item.image_filename && isOwner ? (
                                 <div className="mb-3 rounded-lg overflow-hidden">
                                   <img
-                                    src={`http://localhost:5000/api/uploads/${item.image_filename}`}
+                                    src={`http://localhost:5000/api/uploads/${item.image_filename}?w=640`}
                                     alt={item.title}
                                     loading="lazy"
                                     className="w-full h-48 object-cover hover:scale-105 transition-transform duration-200"
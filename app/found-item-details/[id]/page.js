@@ -308,7 +308,7 @@ export default function FoundItemDetailsPage() {
                   <h3 className="font-semibold text-gray-900 mb-2">Photo</h3>
                   <div className="rounded-lg overflow-hidden w-64">
                     <img
-                      src={`http://localhost:5000/api/uploads/${foundItem.image_filename}`}
+                      src={`http://localhost:5000/api/uploads/${foundItem.image_filename}?w=640`}
                       alt={foundItem.title}
                       loading="lazy"
                       className="w-full h-48 object-cover hover:scale-105 transition-transform duration-200"
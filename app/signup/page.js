@@ -70,6 +70,10 @@ export default function Signup() {
         }
         // Store email for verification page
         localStorage.setItem("pendingVerificationEmail", email.trim().toLowerCase());
+        // Code was refused (rate limit / mail backlog): verification page asks to resend
+        if (data.verification_sent === false) {
+          localStorage.setItem("verificationNotice", data.message);
+        }
         nav.push("/verify-email");
       } else {
         setError(data.error || "Registration failed");
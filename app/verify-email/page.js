@@ -20,6 +20,11 @@ export default function VerifyEmail() {
     const pendingEmail = localStorage.getItem("pendingVerificationEmail");
     if (pendingEmail) {
       setEmail(pendingEmail);
+      const notice = localStorage.getItem("verificationNotice");
+      if (notice) {
+        setError(`${notice} Use "Resend Code" to get a new one.`);
+        localStorage.removeItem("verificationNotice");
+      }
     } else {
       // If no pending email, redirect to signup
       router.push("/signup");
@@ -0,0 +1,316 @@
+"""
+Approximate Nearest-Neighbour Index
+Pure-NumPy inverted-file (IVF) index over normalized description embeddings.
+Vectors are bucketed under k-means centroids; a search only scans the
+nprobe buckets closest to the query instead of every item.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+# Buckets scanned per query (higher = better recall, slower)
+ANN_NPROBE = int(os.environ.get('ANN_NPROBE', '16'))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000
+# Retrain the centroids once the index has grown this many times past its training size
+RETRAIN_GROWTH = 4.0
+
+
+class IVFIndex:
+    """Inner-product IVF index keyed by item id, with incremental insert and delete"""
+
+    def __init__(self, dim, nprobe=ANN_NPROBE, seed=0):
+        """
+        Args:
+            dim: Embedding dimension
+            nprobe: Number of buckets scanned per search
+            seed: Random seed for centroid initialization
+        """
+        self.dim = dim
+        self.nprobe = max(1, nprobe)
+        self.seed = seed
+        self.centroids = None
+        self.trained_size = 0
+
+        self._vectors = {}     # item id -> vector
+        self._assign = {}      # item id -> bucket number
+        self._members = []     # bucket number -> set of item ids
+        self._packed = []      # bucket number -> (ids array, vectors array) or None when stale
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def __contains__(self, item_id):
+        return item_id in self._vectors
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
+
+    def train(self, vectors):
+        """
+        Fit spherical k-means centroids (about sqrt(N) buckets) on a sample of vectors
+
+        Args:
+            vectors: (N, dim) array of normalized vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+        if n == 0:
+            self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+            self.trained_size = 0
+            return
+
+        sample = vectors
+        if n > KMEANS_SAMPLE:
+            sample = vectors[rng.choice(n, KMEANS_SAMPLE, replace=False)]
+
+        nlist = int(np.clip(round(np.sqrt(n)), 1, len(sample)))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Empty buckets keep their previous centroid
+            sums[~empty] /= norms[~empty]
+            sums[empty] = centroids[empty]
+            centroids = sums
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = n
+
+    def needs_training(self):
+        """Whether the centroids are missing or stale for the current size"""
+        with self._lock:
+            return self._needs_training()
+
+    def _needs_training(self):
+        if self.centroids is None or len(self.centroids) == 0:
+            return len(self._vectors) > 0
+        return len(self._vectors) > RETRAIN_GROWTH * max(self.trained_size, 1)
+
+    def rebuild(self):
+        """Retrain the centroids on the current contents and reassign every vector"""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        ids = list(self._vectors)
+        vectors = np.stack([self._vectors[i] for i in ids]) if ids else np.zeros((0, self.dim), dtype=np.float32)
+        self.train(vectors)
+        self._members = [set() for _ in range(len(self.centroids))]
+        self._packed = [None] * len(self.centroids)
+        self._assign = {}
+        if ids:
+            buckets = np.argmax(vectors @ self.centroids.T, axis=1)
+            for item_id, bucket in zip(ids, buckets.tolist()):
+                self._assign[item_id] = bucket
+                self._members[bucket].add(item_id)
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+    # The public methods hold self._lock for the whole change (delete, insert
+    # and any retrain), so a concurrent search never sees a half-applied update.
+
+    def add(self, ids, vectors):
+        """
+        Insert or replace vectors (zero vectors are treated as deletes),
+        retraining the centroids once the index has outgrown them
+
+        Args:
+            ids: Sequence of item ids
+            vectors: (len(ids), dim) array of normalized vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        with self._lock:
+            self._add(ids, vectors)
+
+    def _add(self, ids, vectors):
+        self._remove(ids)
+
+        keep = np.flatnonzero(np.any(vectors != 0, axis=1))
+        if len(keep) == 0:
+            return
+
+        trained = self.centroids is not None and len(self.centroids) > 0
+        buckets = np.argmax(vectors[keep] @ self.centroids.T, axis=1).tolist() if trained else [None] * len(keep)
+        for row, bucket in zip(keep.tolist(), buckets):
+            item_id = ids[row]
+            self._vectors[item_id] = vectors[row].copy()
+            if bucket is not None:
+                self._assign[item_id] = bucket
+                self._members[bucket].add(item_id)
+                self._packed[bucket] = None
+
+        if self._needs_training():
+            self._rebuild()
+
+    def remove(self, ids):
+        """Delete item ids from the index (unknown ids are ignored)"""
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids):
+        for item_id in ids:
+            if self._vectors.pop(item_id, None) is None:
+                continue
+            bucket = self._assign.pop(item_id, None)
+            if bucket is not None:
+                self._members[bucket].discard(item_id)
+                self._packed[bucket] = None
+
+    def sync(self, ids, vectors):
+        """
+        Bring the index in line with a full snapshot, touching only the differences
+
+        Args:
+            ids: Array of item ids currently in the candidate set
+            vectors: (len(ids), dim) array of their embeddings
+
+        Returns:
+            Tuple of (added, removed, updated) counts
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        current = {item_id: row for row, item_id in enumerate(np.asarray(ids).tolist())}
+
+        with self._lock:
+            removed = [item_id for item_id in self._vectors if item_id not in current]
+            self._remove(removed)
+
+            added, updated = [], []
+            for item_id, row in current.items():
+                stored = self._vectors.get(item_id)
+                if stored is None:
+                    if vectors[row].any():
+                        added.append(item_id)
+                elif not np.array_equal(stored, vectors[row]):
+                    updated.append(item_id)
+
+            changed = added + updated
+            if changed:
+                self._add(changed, vectors[[current[item_id] for item_id in changed]])
+        return len(added), len(removed), len(updated)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _bucket(self, bucket):
+        packed = self._packed[bucket]
+        if packed is None:
+            ids = np.fromiter(self._members[bucket], dtype=np.int64, count=len(self._members[bucket]))
+            vectors = np.stack([self._vectors[i] for i in ids.tolist()]) if len(ids) else np.zeros((0, self.dim), dtype=np.float32)
+            packed = (ids, vectors)
+            self._packed[bucket] = packed
+        return packed
+
+    def search(self, query, k, nprobe=None, min_score=None):
+        """
+        Approximate top-k items by inner product with the query
+
+        Args:
+            query: Normalized query vector
+            k: Number of neighbours to return
+            nprobe: Buckets to scan (defaults to the index setting)
+            min_score: Drop neighbours scoring below this
+
+        Returns:
+            Tuple of (ids, scores) arrays sorted by descending score
+        """
+        # add() retrains as the index grows, so search never has to
+        with self._lock:
+            if not self._vectors or self.centroids is None or len(self.centroids) == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            query = np.asarray(query, dtype=np.float32)
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            centroid_scores = self.centroids @ query
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+            id_parts, score_parts = [], []
+            for bucket in probes.tolist():
+                ids, vectors = self._bucket(bucket)
+                if len(ids):
+                    id_parts.append(ids)
+                    score_parts.append(vectors @ query)
+
+        if not id_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        ids = np.concatenate(id_parts)
+        scores = np.concatenate(score_parts)
+        if min_score is not None:
+            keep = scores >= min_score
+            ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return ids[order], scores[order]
+
+
+if __name__ == '__main__':
+    # Recall benchmark: ANN shortlist vs exact vectorized scoring on the local database
+    import sys
+    from ml_matching_service import MLMatchingService
+    from match_engine import VectorizedMatcher, ANN_CANDIDATES
+
+    db_path = os.path.join(os.path.dirname(__file__), 'traceback_100k.db')
+    sample_size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    min_score = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+
+    service = MLMatchingService(db_path)
+    service.embedding_store.refresh_all()
+    exact = VectorizedMatcher(service, use_ann=False)
+    approx = VectorizedMatcher(service, use_ann=True, ann_min_items=0)
+
+    matrix = approx.candidates('lost')
+    index = approx.index('lost')
+    print(f"Indexed {len(index)} lost items in {len(index.centroids)} buckets (nprobe={index.nprobe})")
+
+    conn = service.get_db_connection()
+    found_rows = conn.execute("""
+        SELECT f.rowid as id, f.*, c.name as category, loc.name as location
+        FROM found_items f
+        LEFT JOIN categories c ON f.category_id = c.id
+        LEFT JOIN locations loc ON f.location_id = loc.id
+        ORDER BY RANDOM() LIMIT ?
+    """, (sample_size,)).fetchall()
+    conn.close()
+
+    text_hits = text_total = match_hits = match_total = 0
+    exact_seconds = approx_seconds = 0.0
+    for row in found_rows:
+        item = dict(row)
+        query_vec = service.item_embedding('found', item)
+        if query_vec is not None:
+            # Raw retrieval recall against brute-force inner products
+            truth = matrix.ids[np.argsort(-(matrix.embeddings @ query_vec), kind='stable')[:ANN_CANDIDATES]]
+            found_ids, _ = index.search(query_vec, ANN_CANDIDATES)
+            text_hits += len(np.intersect1d(truth, found_ids))
+            text_total += len(truth)
+
+        start = time.perf_counter()
+        expected = {r['id'] for r, _ in exact.top_matches('found', item, min_score, 10)}
+        exact_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        got = {r['id'] for r, _ in approx.top_matches('found', item, min_score, 10)}
+        approx_seconds += time.perf_counter() - start
+
+        match_hits += len(expected & got)
+        match_total += len(expected)
+
+    queries = max(len(found_rows), 1)
+    print(f"Text recall@{ANN_CANDIDATES}: {text_hits / max(text_total, 1):.4f}")
+    print(f"Match recall (min_score={min_score}, top 10): {match_hits / max(match_total, 1):.4f} ({match_total} exact matches)")
+    print(f"Exact: {exact_seconds / queries * 1000:.2f} ms/query, ANN: {approx_seconds / queries * 1000:.2f} ms/query")
@@ -0,0 +1,110 @@
+"""
+Claim Window Flag
+found_items.in_claim_window is 1 while an item has a potential claimer
+(a successful claim attempt marked by the finder). Browse filters on the
+indexed column instead of a NOT IN subquery over claim_attempts.
+
+The flag is kept current by triggers on claim_attempts (migration 4 in
+migrations.py), so every write path - submit_claim_answers,
+update_claim_attempt, finalize_claim, account deletion - updates it in the
+same transaction. check_claim_window() reports and repairs any drift.
+
+Usage:
+    python claim_window.py            # report drift
+    python claim_window.py --repair   # report and fix drift
+"""
+
+import os
+import sqlite3
+import sys
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traceback_100k.db')
+
+# Source of truth for the flag
+POTENTIAL_CLAIM_ITEMS = """
+    SELECT found_item_id FROM claim_attempts
+    WHERE success = 1 AND marked_as_potential_at IS NOT NULL
+"""
+
+_column_available = False
+
+
+def claim_window_available(conn):
+    """Whether found_items has the in_claim_window column (migration 4 applied)"""
+    global _column_available
+    if not _column_available:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(found_items)').fetchall()}
+        _column_available = 'in_claim_window' in columns
+    return _column_available
+
+
+def claim_window_filter(conn):
+    """Browse condition excluding items in their claim window"""
+    if claim_window_available(conn):
+        return 'f.in_claim_window = 0'
+    return f'f.rowid NOT IN ({POTENTIAL_CLAIM_ITEMS})'
+
+
+def check_claim_window(conn, repair=False):
+    """
+    Compare in_claim_window with claim_attempts
+
+    Args:
+        conn: Database connection
+        repair: Rewrite the flag on drifted rows
+
+    Returns:
+        Dictionary with 'missing' (should be flagged but aren't) and 'stale'
+        (flagged without a potential claimer) item id lists
+    """
+    missing = [row[0] for row in conn.execute(f"""
+        SELECT rowid FROM found_items
+        WHERE in_claim_window = 0 AND rowid IN ({POTENTIAL_CLAIM_ITEMS})
+    """).fetchall()]
+    stale = [row[0] for row in conn.execute(f"""
+        SELECT rowid FROM found_items
+        WHERE in_claim_window = 1 AND rowid NOT IN ({POTENTIAL_CLAIM_ITEMS})
+    """).fetchall()]
+
+    if repair and (missing or stale):
+        conn.executemany('UPDATE found_items SET in_claim_window = 1 WHERE rowid = ?', [(i,) for i in missing])
+        conn.executemany('UPDATE found_items SET in_claim_window = 0 WHERE rowid = ?', [(i,) for i in stale])
+        conn.commit()
+
+    return {'missing': missing, 'stale': stale}
+
+
+def repair_claim_window_drift(db_path=DB_PATH):
+    """Scheduler task: fix drifted flags and log what was found"""
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        if not claim_window_available(conn):
+            return None
+        drift = check_claim_window(conn, repair=True)
+        if drift['missing'] or drift['stale']:
+            print(f"[WARNING] Repaired claim window flag drift: "
+                  f"{len(drift['missing'])} missing, {len(drift['stale'])} stale")
+        return drift
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    db_path = os.environ.get('TRACEBACK_DB', DB_PATH)
+    if not os.path.exists(db_path):
+        print(f"[ERROR] Database not found: {db_path}")
+        sys.exit(1)
+
+    repair = '--repair' in sys.argv
+    conn = sqlite3.connect(db_path)
+    if not claim_window_available(conn):
+        print("[ERROR] found_items.in_claim_window missing - run migrations.py first")
+        sys.exit(1)
+    drift = check_claim_window(conn, repair=repair)
+    conn.close()
+
+    print(f"Missing flags: {len(drift['missing'])} {drift['missing'][:20]}")
+    print(f"Stale flags:   {len(drift['stale'])} {drift['stale'][:20]}")
+    if repair and (drift['missing'] or drift['stale']):
+        print("[INFO] Drift repaired")
+    sys.exit(1 if (drift['missing'] or drift['stale']) and not repair else 0)
@@ -8,6 +8,7 @@ import os
 import time
 from datetime import datetime
 import schedule
+from hot_queries import EXPIRED_CLAIMED_ITEMS, DELETE_EXPIRED_CLAIMED_ITEMS
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'traceback_100k.db')
 
@@ -21,13 +22,7 @@ def cleanup_old_claimed_items():
         cursor = conn.cursor()
         
         # Get items to be deleted for logging
-        cursor.execute('''
-            SELECT rowid, title, claimed_date 
-            FROM found_items 
-            WHERE status = 'CLAIMED' 
-            AND claimed_date IS NOT NULL
-            AND datetime(claimed_date) <= datetime('now', '-3 days')
-        ''')
+        cursor.execute(EXPIRED_CLAIMED_ITEMS)
         items_to_delete = cursor.fetchall()
         
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -40,12 +35,7 @@ def cleanup_old_claimed_items():
             print(f"\n[{timestamp}] ✨ No claimed items to clean up")
         
         # Delete the items
-        cursor.execute('''
-            DELETE FROM found_items 
-            WHERE status = 'CLAIMED' 
-            AND claimed_date IS NOT NULL
-            AND datetime(claimed_date) <= datetime('now', '-3 days')
-        ''')
+        cursor.execute(DELETE_EXPIRED_CLAIMED_ITEMS)
         
         deleted_count = cursor.rowcount
         conn.commit()
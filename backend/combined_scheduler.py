@@ -8,7 +8,8 @@ import os
 import time
 from datetime import datetime
 import schedule
-from ml_matching_service import MLMatchingService
+from hot_queries import EXPIRED_CLAIMED_ITEMS, DELETE_EXPIRED_CLAIMED_ITEMS
+from ml_matching_service import get_shared_ml_service
 from finder_decision_notification_scheduler import check_and_notify_finders, load_already_notified_finders
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'traceback_100k.db')
@@ -25,13 +26,7 @@ def cleanup_old_claimed_items():
         cursor = conn.cursor()
         
         # Get items to be deleted for logging
-        cursor.execute('''
-            SELECT rowid, title, claimed_date 
-            FROM found_items 
-            WHERE status = 'CLAIMED' 
-            AND claimed_date IS NOT NULL
-            AND datetime(claimed_date) <= datetime('now', '-3 days')
-        ''')
+        cursor.execute(EXPIRED_CLAIMED_ITEMS)
         items_to_delete = cursor.fetchall()
         
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -44,12 +39,7 @@ def cleanup_old_claimed_items():
             print(f"\n[{timestamp}] ✨ No claimed items to clean up")
         
         # Delete the items
-        cursor.execute('''
-            DELETE FROM found_items 
-            WHERE status = 'CLAIMED' 
-            AND claimed_date IS NOT NULL
-            AND datetime(claimed_date) <= datetime('now', '-3 days')
-        ''')
+        cursor.execute(DELETE_EXPIRED_CLAIMED_ITEMS)
         
         deleted_count = cursor.rowcount
         conn.commit()
@@ -74,11 +64,25 @@ def run_ml_matching():
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         print(f"\n[{timestamp}] 🤖 Starting ML Matching Process...")
         
-        # Initialize ML service
-        ml_service = MLMatchingService(
+        # Reuse the warm ML service held by this scheduler process
+        ml_service, load_seconds = get_shared_ml_service(
             db_path=DB_PATH,
             upload_folder=UPLOAD_FOLDER
         )
+        if load_seconds:
+            print(f"[{timestamp}] Model load time: {load_seconds:.2f}s (first run in this process)")
+        else:
+            print(f"[{timestamp}] Model load time: 0.00s (reusing warm model)")
+        match_started = time.perf_counter()
+        
+        # Embed new or edited descriptions once up front (cached in text_embeddings)
+        pruned = ml_service.embedding_store.prune()
+        encoded = ml_service.embedding_store.refresh_all()
+        print(f"[{timestamp}] Text embeddings refreshed: {encoded} encoded, {pruned} pruned")
+        
+        # Batch-embed any images not in the feature cache before pairwise scoring
+        images_embedded = ml_service.warm_image_features()
+        print(f"[{timestamp}] Image features cached: {images_embedded} newly embedded")
         
         # Get all unclaimed found items
         conn = sqlite3.connect(DB_PATH)
@@ -132,6 +136,7 @@ def run_ml_matching():
         print(f"   📈 Total matches found (≥60%): {total_matches}")
         print(f"   ⭐ High confidence matches (≥80%): {high_confidence}")
         print(f"   📊 Average matches per found item: {total_matches/found_count if found_count > 0 else 0:.2f}")
+        print(f"   ⏱️  Matching time: {time.perf_counter() - match_started:.2f}s")
         
         return total_matches
         
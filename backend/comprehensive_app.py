@@ -4,6 +4,9 @@ Handles 100,000 realistic items with full API functionality
 Works with SQLite database (compatible with MySQL structure)
 """
 
+import time
+_BOOT_STARTED = time.perf_counter()  # measured before the heavy imports below
+
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import sqlite3
@@ -16,15 +19,28 @@ from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash
 import uuid
 from profile_manager import create_profile_endpoints
+from db_pool import pooled_connect, init_db_pool, pool_metrics
+from migrations import apply_migrations
+from match_loader import load_matches, summarize_matches, MATCH_MIN_SCORE, SUMMARY_BUCKETS
+from hot_queries import (LOST_ITEMS_KEYSET, FOUND_ITEMS_KEYSET, MESSAGES_KEYSET, USER_LOST_ITEMS_PAGE,
+                         FOUND_ITEMS_PAGE, USER_LOST_REPORTS, USER_FOUND_REPORTS, FOUND_ITEM_MATCHES,
+                         PRIVATE_ITEM_MATCH_COUNT, USER_CONVERSATIONS, CONVERSATION_MESSAGES_PAGE,
+                         EXPIRED_CLAIMED_ITEMS, DELETE_EXPIRED_CLAIMED_ITEMS, found_browse_conditions)
+from pagination import Keyset, InvalidCursor, COUNT_MODES, total_count, cursor_pagination, page_sql
+from stats_service import StatsSnapshot, compute_stats
+from response_cache import response_cache, cached_response, tag_response
+from image_variants import create_variants, resolve_variant, variant_folder
+from mail_transport import get_outbox
+from search_index import (build_match_query, search_index_available, rank_expression,
+                          snippet_expression, highlight_snippet, matching_ids_clause, TITLE_COLUMN)
 import pytz
+import threading
+import importlib.util
 
-# Optional ML service - will be loaded later if available
-try:
-    from ml_matching_service import MLMatchingService
-    ML_SERVICE_AVAILABLE = True
-except ImportError as e:
-    ML_SERVICE_AVAILABLE = False
-    print(f"[WARNING] ML service not available: {e}")
+# Optional ML service - imported on first use so the API boots without loading models
+ML_SERVICE_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
+if not ML_SERVICE_AVAILABLE:
+    print("[WARNING] ML service not available: sentence_transformers is not installed")
     print("[INFO] App will work without ML matching features")
 
 # Timezone configuration - All times in ET (Eastern Time)
@@ -111,6 +127,7 @@ The TraceBack Team
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'dev-secret-key-2025-comprehensive'
 CORS(app)
+init_db_pool(app)  # return each request's pooled connection on teardown
 
 # File upload configuration
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -140,34 +157,64 @@ def save_uploaded_file(file):
         
         try:
             file.save(filepath)
-            return unique_filename
         except Exception as e:
             print(f"Error saving file: {e}")
             return None
+        # Downscaled WebP/JPEG variants for browse cards and the matcher
+        create_variants(app.config['UPLOAD_FOLDER'], unique_filename)
+        return unique_filename
     return None
 
+# Variants are named by content hash and originals are never overwritten
+VARIANT_MAX_AGE = 365 * 24 * 3600
+
 # Initialize email verification service
 verification_service = EmailVerificationService(DB_PATH)
 
+# Bring the schema (hot query indexes) up to date before serving requests
+try:
+    apply_migrations(DB_PATH)
+except Exception as e:
+    print(f"[WARNING] Schema migrations failed: {e}")
+
+# Drain the mail outbox (messages queued by this or other processes)
+mail_outbox = get_outbox(DB_PATH)
+mail_outbox.start()
+
 # Initialize ML matching service (lazy loading)
 ml_service = None
 notification_service = None
+_ml_service_lock = threading.Lock()
 
 def get_ml_service():
-    """Get or initialize ML matching service"""
+    """Get or initialize ML matching service (thread-safe, created on first use)"""
     global ml_service
     if not ML_SERVICE_AVAILABLE:
         return None
     if ml_service is None:
-        try:
-            print("[INFO] Initializing ML Matching Service...")
-            ml_service = MLMatchingService(DB_PATH, upload_folder=UPLOAD_FOLDER)
-            print("[INFO] ML Matching Service initialized!")
-        except Exception as e:
-            print(f"[WARNING] Error initializing ML service: {e}")
-            return None
+        with _ml_service_lock:
+            if ml_service is None:
+                try:
+                    print("[INFO] Initializing ML Matching Service...")
+                    from ml_matching_service import MLMatchingService
+                    ml_service = MLMatchingService(DB_PATH, upload_folder=UPLOAD_FOLDER)
+                    print(f"[INFO] ML Matching Service initialized in {ml_service.load_seconds:.2f}s!")
+                except Exception as e:
+                    print(f"[WARNING] Error initializing ML service: {e}")
+                    return None
     return ml_service
 
+def warm_up_ml_service():
+    """Optional warm-up hook: load the text and image models before the first ML request"""
+    service = get_ml_service()
+    if service is None:
+        return
+    try:
+        import image_similarity
+        image_similarity.warm_up()
+    except ImportError:
+        pass
+
 def get_notification_service():
     """Get or initialize ML notification service"""
     global notification_service
@@ -184,19 +231,42 @@ def get_notification_service():
             return None
     return notification_service
 
+# Background match jobs for newly reported items (started on first enqueue)
+match_job_queue = None
+
+def get_match_queue():
+    """Get or create the background match job queue"""
+    global match_job_queue
+    if match_job_queue is None:
+        with _ml_service_lock:
+            if match_job_queue is None:
+                from match_queue import MatchJobQueue
+                match_job_queue = MatchJobQueue(DB_PATH, get_ml_service)
+    return match_job_queue
+
+def enqueue_match_job(item_type, item_id):
+    """Queue matching for a new report without blocking the request (non-critical)"""
+    if not ML_SERVICE_AVAILABLE:
+        return False
+    try:
+        return get_match_queue().enqueue(item_type, item_id)
+    except Exception as e:
+        print(f"⚠️ Could not queue match job for {item_type} item {item_id}: {e}")
+        return False
+
 def get_db_connection(use_row_factory=True):
-    """Get database connection with timeout and WAL mode"""
+    """
+    Get a pooled database connection (WAL and cache PRAGMAs applied once per connection)
+    
+    Inside a request every call shares the request's connection, which goes back
+    to the pool on teardown; close() keeps working as before
+    """
     if not os.path.exists(DB_PATH):
         return None
-    
-    conn = sqlite3.connect(DB_PATH, timeout=10.0)
-    conn.execute('PRAGMA journal_mode=WAL')  # Enable Write-Ahead Logging for better concurrency
-    if use_row_factory:
-        conn.row_factory = sqlite3.Row
-    return conn
+    return pooled_connect(DB_PATH, row_factory=sqlite3.Row if use_row_factory else None)
 
 def get_db():
-    """Get database connection with row factory, timeout, and WAL mode"""
+    """Get pooled database connection with row factory"""
     return get_db_connection(use_row_factory=True)
 
 def dict_from_row(row):
@@ -269,6 +339,16 @@ def health():
                 'categories': categories_count,
                 'locations': locations_count
             },
+            'startup': {
+                'boot_seconds': round(STARTUP_SECONDS, 3),
+                'ml_service_loaded': ml_service is not None,
+                'ml_load_seconds': round(ml_service.load_seconds, 3) if ml_service is not None else None
+            },
+            'match_queue': dict(match_job_queue.stats, pending=match_job_queue.pending_count()) if match_job_queue is not None else None,
+            'database_pool': pool_metrics(),
+            'stats_snapshot': stats_snapshot.metrics(),
+            'response_cache': response_cache.metrics(),
+            'mail': mail_outbox.metrics(),
             'timestamp': get_et_now().isoformat()
         })
         
@@ -279,7 +359,26 @@ def health():
             'timestamp': get_et_now().isoformat()
         }), 500
 
+@app.route('/api/metrics/cache')
+def response_cache_metrics():
+    """Response cache counters (hits, misses, 304s, invalidations, evictions)"""
+    return jsonify(response_cache.metrics())
+
+@app.route('/api/metrics/mail')
+def mail_metrics():
+    """Mail outbox throughput (messages/sec), queue depth, SMTP session reuse, send latency and verification sends"""
+    return jsonify(dict(mail_outbox.metrics(), verification=verification_service.metrics()))
+
+@app.route('/api/metrics/db')
+def db_pool_metrics():
+    """Connection pool counters (opened/closed/reused connections, per-request sharing)"""
+    return jsonify({
+        'pools': pool_metrics(),
+        'timestamp': get_et_now().isoformat()
+    })
+
 @app.route('/api/categories')
+@cached_response(tags=('categories',), ttl=60)  # short TTL: item counts change with every report
 def get_categories():
     """Get all categories"""
     conn = get_db()
@@ -309,6 +408,7 @@ def get_categories():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/locations')
+@cached_response(tags=('locations',), ttl=60)
 def get_locations():
     """Get all Kent State locations"""
     conn = get_db()
@@ -337,6 +437,55 @@ def get_locations():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Sort keys for cursor (keyset) pagination; the trailing rowid makes each key unique
+ABUSE_REPORTS_KEYSET = Keyset('abuse_reports', [('ar.created_at', True), ('ar.rowid', True)])
+BUG_REPORTS_KEYSET = Keyset('bug_reports', [
+    ("CASE status WHEN 'OPEN' THEN 1 WHEN 'IN_PROGRESS' THEN 2 WHEN 'RESOLVED' THEN 3 ELSE 4 END", False),
+    ("CASE priority WHEN 'CRITICAL' THEN 1 WHEN 'HIGH' THEN 2 WHEN 'MEDIUM' THEN 3 WHEN 'LOW' THEN 4 ELSE 5 END", False),
+    ('created_at', True),
+    ('rowid', True),
+])
+# Open reports first, then by priority, newest first; {limit} is '' or 'LIMIT ?'
+BUG_REPORTS_PAGE = """
+    SELECT *{key_columns} FROM bug_reports
+    WHERE 1{seek}
+    ORDER BY {order}
+    {limit}
+"""
+
+def cursor_request_args():
+    """
+    Pagination mode of a list request
+
+    Cursor mode is selected by passing ?cursor= (empty for the first page, then
+    the previous response's next_cursor). ?count=exact|cached|none controls the
+    total; cursor mode defaults to none, page mode to exact.
+
+    Returns:
+        Tuple of (cursor_mode, cursor token, count mode)
+
+    Raises:
+        InvalidCursor: Unknown count mode
+    """
+    cursor_mode = 'cursor' in request.args
+    count_mode = request.args.get('count', 'none' if cursor_mode else 'exact')
+    if count_mode not in COUNT_MODES:
+        raise InvalidCursor(f"Invalid count mode (use one of: {', '.join(COUNT_MODES)})")
+    return cursor_mode, request.args.get('cursor', ''), count_mode
+
+def page_pagination(page, limit, total):
+    """Pagination block of a page-number response (total is None with ?count=none)"""
+    if total is None:
+        return {'page': page, 'limit': limit, 'total': None, 'pages': None, 'has_next': None, 'has_prev': page > 1}
+    return {
+        'page': page,
+        'limit': limit,
+        'total': total,
+        'pages': (total + limit - 1) // limit,
+        'has_next': page * limit < total,
+        'has_prev': page > 1
+    }
+
 @app.route('/api/lost-items')
 def get_lost_items():
     """
@@ -354,6 +503,7 @@ def get_lost_items():
         page = int(request.args.get('page', 1))
         limit = min(int(request.args.get('limit', 100)), 500)
         include_matches = request.args.get('include_matches', 'false').lower() == 'true'
+        cursor_mode, cursor, count_mode = cursor_request_args()
         
         # PRIVACY: Lost items are ONLY visible to the owner
         if not user_email:
@@ -366,18 +516,19 @@ def get_lost_items():
         offset = (page - 1) * limit
         
         # Get total count - only for this user's lost items
-        total = conn.execute('SELECT COUNT(*) as total FROM lost_items WHERE is_resolved = 0 AND user_email = ?', (user_email,)).fetchone()['total']
+        total = total_count(conn, count_mode,
+                            'SELECT COUNT(*) as total FROM lost_items WHERE is_resolved = 0 AND user_email = ?',
+                            (user_email,))
         
         # Get lost items - only for this user
-        items = conn.execute("""
-            SELECT l.rowid as id, l.*, c.name as category_name, loc.name as location_name
-            FROM lost_items l
-            LEFT JOIN categories c ON l.category_id = c.id
-            LEFT JOIN locations loc ON l.location_id = loc.id
-            WHERE l.is_resolved = 0 AND l.user_email = ?
-            ORDER BY l.created_at DESC
-            LIMIT ? OFFSET ?
-        """, (user_email, limit, offset)).fetchall()
+        # Keyset page: seek past the cursor's (created_at, rowid) instead of OFFSET
+        position = LOST_ITEMS_KEYSET.decode(cursor) if cursor_mode else None
+        items_query, seek_params = page_sql(USER_LOST_ITEMS_PAGE, LOST_ITEMS_KEYSET, cursor_mode, position,
+                                            default_order='l.created_at DESC')
+        page_params = [limit + 1, 0] if cursor_mode else [limit, offset]
+        items = conn.execute(items_query, [user_email, *seek_params, *page_params]).fetchall()
+        if cursor_mode:
+            items, next_cursor = LOST_ITEMS_KEYSET.page(items, limit)
         
         conn.close()
         
@@ -402,50 +553,33 @@ def get_lost_items():
             
             items_list.append(item_dict)
         
-        # Add ML matching if requested (from pre-computed ml_matches table)
+        # Add ML matching if requested (one batched query over the page's ids)
         if include_matches:
             conn2 = get_db()
             if conn2:
+                try:
+                    page_matches = load_matches(conn2, 'lost', [item['id'] for item in items_list], per_item=5)
+                except Exception as e:
+                    print(f"Error reading matches for lost items: {e}")
+                    page_matches = {}
                 for item in items_list:
-                    try:
-                        match_rows = conn2.execute("""
-                            SELECT m.match_score, m.score_breakdown,
-                                   f.rowid as id, f.title, f.description, f.color, f.size,
-                                   f.created_at, f.image_filename,
-                                   f.finder_name, f.finder_email, f.finder_phone,
-                                   f.current_location, f.is_claimed, f.status,
-                                   c.name as category_name,
-                                   loc.name as location_name
-                            FROM ml_matches m
-                            JOIN found_items f ON m.found_item_id = f.rowid
-                            LEFT JOIN categories c ON f.category_id = c.id
-                            LEFT JOIN locations loc ON f.location_id = loc.id
-                            WHERE m.lost_item_id = ? AND m.match_score >= 0.8
-                            ORDER BY m.match_score DESC
-                            LIMIT 5
-                        """, (item['id'],)).fetchall()
-                        
-                        matches = [dict(row) for row in match_rows]
-                        item['ml_matches'] = matches
-                        item['match_count'] = len(matches)
-                    except Exception as e:
-                        print(f"Error reading matches for lost item {item['id']}: {e}")
-                        item['ml_matches'] = []
-                        item['match_count'] = 0
+                    item['ml_matches'] = page_matches.get(item['id'], [])
+                    item['match_count'] = len(item['ml_matches'])
                 conn2.close()
         
+        if cursor_mode:
+            return jsonify({
+                'items': items_list,
+                'pagination': cursor_pagination(limit, cursor, next_cursor, total)
+            })
+        
         return jsonify({
             'items': items_list,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total,
-                'pages': (total + limit - 1) // limit,
-                'has_next': page * limit < total,
-                'has_prev': page > 1
-            }
+            'pagination': page_pagination(page, limit, total)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -470,29 +604,15 @@ def get_found_items():
         search = request.args.get('search', '').strip()
         include_private = request.args.get('include_private', 'false').lower() == 'true'  # For ML matching
         user_email = request.args.get('user_email', '').strip()  # Current user's email for matching
+        cursor_mode, cursor, count_mode = cursor_request_args()
         
         # Build query - exclude claimed items and items in claim window
-        where_conditions = ["(f.status IS NULL OR f.status != 'CLAIMED')"]  # Only unclaimed items
-        
-        # Exclude items with potential claimers (in claim window)
-        where_conditions.append("""f.rowid NOT IN (
-            SELECT found_item_id 
-            FROM claim_attempts 
-            WHERE success = 1 
-              AND marked_as_potential_at IS NOT NULL
-        )""")
+        # PRIVACY LOGIC: public browse only shows is_private = 0 (items are made public
+        # by the hourly scheduler when privacy_expires_at passes)
+        where_conditions = found_browse_conditions(conn, include_private)
         
         params = []
         
-        # PRIVACY LOGIC: Only show items where privacy has expired or is_private=0
-        # Items that are private (is_private=1) are ONLY shown through:
-        # 1. ML matching (80%+ score) on user's dashboard
-        # 2. Moderators viewing abuse reports
-        # This check is ONLY for public browse, not for dashboard or admin views
-        if not include_private:  # Public browse view
-            # Check is_private flag - items are made public by the hourly scheduler when privacy_expires_at passes
-            where_conditions.append("f.is_private = 0")
-        
         if category_id:
             where_conditions.append('f.category_id = ?')
             params.append(category_id)
@@ -506,9 +626,17 @@ def get_found_items():
             params.append(color)
         
         if search:
-            where_conditions.append('(LOWER(f.title) LIKE LOWER(?) OR LOWER(f.description) LIKE LOWER(?))')
-            search_term = f'%{search}%'
-            params.extend([search_term, search_term])
+            if search_index_available(conn):
+                match_query = build_match_query(search, columns=['title', 'description'])
+                if match_query:
+                    where_conditions.append(f'f.rowid IN ({matching_ids_clause("found")})')
+                    params.append(match_query)
+                else:
+                    where_conditions.append('0')  # punctuation-only input matches nothing
+            else:
+                where_conditions.append('(LOWER(f.title) LIKE LOWER(?) OR LOWER(f.description) LIKE LOWER(?))')
+                search_term = f'%{search}%'
+                params.extend([search_term, search_term])
         
         where_clause = ' AND '.join(where_conditions)
         offset = (page - 1) * limit
@@ -522,28 +650,18 @@ def get_found_items():
             WHERE {where_clause}
         '''
         
-        total = conn.execute(count_query, params).fetchone()['total']
+        total = total_count(conn, count_mode, count_query, params)
         
         # Get items
-        items_query = f'''
-            SELECT f.rowid as id, f.category_id, f.location_id,
-                   f.title, f.description, f.color, f.size,
-                   f.image_filename as image_url, f.created_at,
-                   f.current_location, f.finder_notes, f.is_private, f.privacy_expires_at,
-                   f.is_claimed, f.created_at, f.privacy_expires,
-                   f.finder_name, f.finder_email, f.finder_phone,
-                   c.name as category_name, loc.name as location_name,
-                   loc.building_code, loc.description as location_description
-            FROM found_items f
-            JOIN categories c ON f.category_id = c.id
-            JOIN locations loc ON f.location_id = loc.id
-            WHERE {where_clause}
-            ORDER BY f.created_at DESC
-            LIMIT ? OFFSET ?
-        '''
+        # Keyset page: seek past the cursor's (created_at, rowid) instead of OFFSET
+        position = FOUND_ITEMS_KEYSET.decode(cursor) if cursor_mode else None
+        items_query, seek_params = page_sql(FOUND_ITEMS_PAGE, FOUND_ITEMS_KEYSET, cursor_mode, position,
+                                            default_order='f.created_at DESC', where=where_clause)
+        page_params = [limit + 1, 0] if cursor_mode else [limit, offset]
         
-        params.extend([limit, offset])
-        items = conn.execute(items_query, params).fetchall()
+        items = conn.execute(items_query, params + seek_params + page_params).fetchall()
+        if cursor_mode:
+            items, next_cursor = FOUND_ITEMS_KEYSET.page(items, limit)
         
         conn.close()
         
@@ -584,48 +702,24 @@ def get_found_items():
             
             items_list.append(item_dict)
         
-        # Add ML matching for each found item (from pre-computed ml_matches table)
+        # Add ML matching for the page's found items (one batched query)
         if include_private:  # Only include matches for dashboard/ML view
             conn2 = get_db()
             if conn2:
+                try:
+                    page_matches = load_matches(conn2, 'found', [item['id'] for item in items_list], per_item=5)
+                except Exception as e:
+                    print(f"Error reading matches for found items: {e}")
+                    page_matches = {}
                 for item in items_list:
-                    try:
-                        match_rows = conn2.execute("""
-                            SELECT m.match_score, m.score_breakdown,
-                                   l.rowid as id, l.title, l.description, l.color, l.size,
-                                   l.date_lost, l.time_lost, l.image_filename,
-                                   l.owner_name, l.user_email, l.owner_phone,
-                                   l.last_seen_location, l.owner_notes,
-                                   c.name as category_name,
-                                   loc.name as location_name
-                            FROM ml_matches m
-                            JOIN lost_items l ON m.lost_item_id = l.rowid
-                            LEFT JOIN categories c ON l.category_id = c.id
-                            LEFT JOIN locations loc ON l.location_id = loc.id
-                            WHERE m.found_item_id = ? AND m.match_score >= 0.8
-                            ORDER BY m.match_score DESC
-                            LIMIT 5
-                        """, (item['id'],)).fetchall()
-                        
-                        matches = [dict(row) for row in match_rows]
-                        item['ml_matches'] = matches
-                        item['match_count'] = len(matches)
-                    except Exception as e:
-                        print(f"Error reading matches for found item {item['id']}: {e}")
-                        item['ml_matches'] = []
-                        item['match_count'] = 0
+                    item['ml_matches'] = page_matches.get(item['id'], [])
+                    item['match_count'] = len(item['ml_matches'])
                 conn2.close()
         
         return jsonify({
             'items': items_list,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total,
-                'pages': (total + limit - 1) // limit,
-                'has_next': page * limit < total,
-                'has_prev': page > 1
-            },
+            'pagination': (cursor_pagination(limit, cursor, next_cursor, total) if cursor_mode
+                           else page_pagination(page, limit, total)),
             'filters': {
                 'category_id': category_id,
                 'location_id': location_id,
@@ -634,6 +728,8 @@ def get_found_items():
             }
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -711,8 +807,7 @@ def delete_lost_item(item_id):
         if not user_email:
             return jsonify({'error': 'User email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Verify ownership
@@ -777,22 +872,7 @@ def get_found_item(item_id):
         matches = []
         if conn2:
             try:
-                match_rows = conn2.execute("""
-                    SELECT m.match_score, m.score_breakdown,
-                           l.rowid as id, l.title, l.description, l.color, l.size,
-                           l.date_lost, l.time_lost, l.image_filename,
-                           l.owner_name, l.user_email, l.owner_phone,
-                           l.last_seen_location, l.owner_notes,
-                           c.name as category_name,
-                           loc.name as location_name
-                    FROM ml_matches m
-                    JOIN lost_items l ON m.lost_item_id = l.rowid
-                    LEFT JOIN categories c ON l.category_id = c.id
-                    LEFT JOIN locations loc ON l.location_id = loc.id
-                    WHERE m.found_item_id = ? AND m.match_score >= 0.8
-                    ORDER BY m.match_score DESC
-                    LIMIT 10
-                """, (item_id,)).fetchall()
+                match_rows = conn2.execute(FOUND_ITEM_MATCHES, (item_id,)).fetchall()
                 
                 matches = [dict(row) for row in match_rows]
                 conn2.close()
@@ -835,14 +915,7 @@ def get_security_questions(found_item_id):
         
         if days_since_posted < 3 and user_email:
             # Item is private - check if user has a matching lost item (>80% match)
-            has_match = conn.execute("""
-                SELECT COUNT(*) as count
-                FROM ml_matches m
-                JOIN lost_items l ON m.lost_item_id = l.rowid
-                WHERE m.found_item_id = ? 
-                AND l.user_email = ?
-                AND m.match_score >= 0.8
-            """, (found_item_id, user_email)).fetchone()
+            has_match = conn.execute(PRIVATE_ITEM_MATCH_COUNT, (found_item_id, user_email)).fetchone()
             
             if not has_match or has_match['count'] == 0:
                 conn.close()
@@ -1177,7 +1250,12 @@ def create_security_questions_bulk():
 
 @app.route('/api/search')
 def search_items():
-    """Universal search across lost and found items"""
+    """
+    Universal search across lost and found items
+
+    Uses the item_search FTS5 index (prefix matching, bm25 ranking and
+    highlighted snippets) when it exists, otherwise LIKE matching
+    """
     conn = get_db()
     if not conn:
         return jsonify({'error': 'Database not available'}), 500
@@ -1186,40 +1264,27 @@ def search_items():
         query = request.args.get('q', '').strip()
         item_type = request.args.get('type', 'all')  # 'lost', 'found', 'all'
         limit = min(int(request.args.get('limit', 100)), 500)  # Default 100, Max 500 items per page
+        sort = request.args.get('sort', 'relevance')  # 'relevance' or 'recent'
         
         if not query:
             return jsonify({'error': 'Search query required'}), 400
         
         results = {'lost_items': [], 'found_items': [], 'total': 0}
-        search_term = f'%{query}%'
+        
+        match_query = None
+        if search_index_available(conn):
+            match_query = build_match_query(query)
+            if match_query is None:
+                # Nothing searchable (only punctuation/operators)
+                conn.close()
+                return jsonify(results)
         
         if item_type in ['lost', 'all']:
-            lost_items = conn.execute('''
-                SELECT l.*, c.name as category_name, loc.name as location_name
-                FROM lost_items l
-                JOIN categories c ON l.category_id = c.id
-                JOIN locations loc ON l.location_id = loc.id
-                WHERE l.is_resolved = 0 
-                AND (LOWER(l.title) LIKE LOWER(?) OR LOWER(l.description) LIKE LOWER(?) 
-                     OR LOWER(c.name) LIKE LOWER(?) OR LOWER(loc.name) LIKE LOWER(?))
-                ORDER BY l.created_at DESC
-                LIMIT ?
-            ''', (search_term, search_term, search_term, search_term, limit)).fetchall()
-            
+            lost_items = _search_table(conn, 'lost', query, match_query, sort, limit)
             results['lost_items'] = [dict_from_row(item) for item in lost_items]
         
         if item_type in ['found', 'all']:
-            found_items = conn.execute('''
-                SELECT f.*, c.name as category_name, loc.name as location_name
-                FROM found_items f
-                JOIN categories c ON f.category_id = c.id
-                JOIN locations loc ON f.location_id = loc.id
-                WHERE f.is_claimed = 0
-                AND (LOWER(f.title) LIKE LOWER(?) OR LOWER(f.description) LIKE LOWER(?) 
-                     OR LOWER(c.name) LIKE LOWER(?) OR LOWER(loc.name) LIKE LOWER(?))
-                ORDER BY f.created_at DESC
-                LIMIT ?
-            ''', (search_term, search_term, search_term, search_term, limit)).fetchall()
+            found_items = _search_table(conn, 'found', query, match_query, sort, limit)
             
             # Apply privacy filtering to found items
             filtered_found = []
@@ -1229,14 +1294,26 @@ def search_items():
                 if item_dict.get('is_private'):
                     if item_dict.get('privacy_expires_at'):
                         expires_at = datetime.fromisoformat(item_dict['privacy_expires_at'].replace('Z', '+00:00'))
-                        if get_et_now() < expires_at.replace(tzinfo=None):
+                        # Stored as naive ET, so compare against naive ET now
+                        if get_et_now().replace(tzinfo=None) < expires_at.replace(tzinfo=None):
                             item_dict['description'] = 'Details hidden - verify ownership to view'
                             item_dict['finder_name'] = 'Anonymous'
+                            # The snippet may quote the hidden description
+                            if 'snippet' in item_dict:
+                                item_dict['snippet'] = item_dict['title_snippet']
                 
+                item_dict.pop('title_snippet', None)
+                if 'snippet' in item_dict:
+                    item_dict['snippet'] = highlight_snippet(item_dict['snippet'])
                 filtered_found.append(item_dict)
             
             results['found_items'] = filtered_found
         
+        for item in results['lost_items']:
+            item.pop('title_snippet', None)
+            if 'snippet' in item:
+                item['snippet'] = highlight_snippet(item['snippet'])
+        
         results['total'] = len(results['lost_items']) + len(results['found_items'])
         
         conn.close()
@@ -1245,110 +1322,77 @@ def search_items():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/stats')
-def get_stats():
-    """Get comprehensive system statistics"""
-    conn = get_db()
-    if not conn:
-        return jsonify({'error': 'Database not available'}), 500
+# item type -> (table, alias, open-items condition)
+SEARCH_SOURCES = {
+    'lost': ('lost_items', 'l', 'l.is_resolved = 0'),
+    'found': ('found_items', 'f', 'f.is_claimed = 0'),
+}
+
+def _search_table(conn, item_type, query, match_query, sort, limit):
+    """
+    Open lost or found items matching a search
+
+    Args:
+        conn: Database connection
+        item_type: 'lost' or 'found'
+        query: Raw search text (used for the LIKE fallback)
+        match_query: FTS5 MATCH expression, or None to use LIKE
+        sort: 'relevance' (bm25) or 'recent'
+        limit: Maximum rows
+
+    Returns:
+        List of rows (with snippet/title_snippet columns when using the index)
+    """
+    table, alias, open_condition = SEARCH_SOURCES[item_type]
+    
+    if match_query is None:
+        search_term = f'%{query}%'
+        return conn.execute(f'''
+            SELECT {alias}.*, c.name as category_name, loc.name as location_name
+            FROM {table} {alias}
+            JOIN categories c ON {alias}.category_id = c.id
+            JOIN locations loc ON {alias}.location_id = loc.id
+            WHERE {open_condition}
+            AND (LOWER({alias}.title) LIKE LOWER(?) OR LOWER({alias}.description) LIKE LOWER(?) 
+                 OR LOWER(c.name) LIKE LOWER(?) OR LOWER(loc.name) LIKE LOWER(?))
+            ORDER BY {alias}.created_at DESC
+            LIMIT ?
+        ''', (search_term, search_term, search_term, search_term, limit)).fetchall()
     
+    order_by = f'{alias}.created_at DESC' if sort == 'recent' else 'rank'
+    return conn.execute(f'''
+        SELECT {alias}.*, c.name as category_name, loc.name as location_name,
+               {snippet_expression()} as snippet,
+               {snippet_expression(TITLE_COLUMN)} as title_snippet,
+               {rank_expression()} as rank
+        FROM item_search s
+        JOIN {table} {alias} ON {alias}.rowid = s.item_id
+        JOIN categories c ON {alias}.category_id = c.id
+        JOIN locations loc ON {alias}.location_id = loc.id
+        WHERE item_search MATCH ? AND s.item_type = ?
+        AND {open_condition}
+        ORDER BY {order_by}
+        LIMIT ?
+    ''', (match_query, item_type, limit)).fetchall()
+
+def _compute_stats():
+    """Fresh /api/stats numbers (runs in a request or the snapshot refresh thread)"""
+    conn = get_db()
     try:
-        stats = {}
-        
-        # Calculate date 7 days ago in ET
-        from datetime import datetime, timedelta
-        seven_days_ago = (get_et_now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Total found items (including historical ones from successful_returns)
-        active_found = conn.execute('SELECT COUNT(*) as count FROM found_items').fetchone()['count']
-        finalized_found = conn.execute('SELECT COUNT(*) as count FROM successful_returns').fetchone()['count']
-        stats['total_found_items'] = active_found + finalized_found
-        
-        # Items successfully claimed (from successful_returns table)
-        stats['items_claimed'] = conn.execute(
-            'SELECT COUNT(*) as count FROM successful_returns'
-        ).fetchone()['count']
-        
-        # Active found items (not yet claimed/finalized)
-        stats['active_found_items'] = conn.execute(
-            'SELECT COUNT(*) as count FROM found_items WHERE is_claimed = 0'
-        ).fetchone()['count']
-        
-        # Found items posted this week (last 7 days) - from both active and finalized
-        recent_active = conn.execute(
-            "SELECT COUNT(*) as count FROM found_items WHERE created_at >= ?",
-            (seven_days_ago,)
-        ).fetchone()['count']
-        
-        recent_finalized = conn.execute(
-            "SELECT COUNT(*) as count FROM successful_returns WHERE finalized_at >= ?",
-            (seven_days_ago,)
-        ).fetchone()['count']
-        
-        stats['found_this_week'] = recent_active + recent_finalized
-        
-        # Legacy stats for compatibility
-        stats['active_lost_items'] = conn.execute(
-            'SELECT COUNT(*) as count FROM lost_items WHERE is_resolved = 0'
-        ).fetchone()['count']
-        
-        stats['unclaimed_found_items'] = stats['active_found_items']
-        stats['recent_found_items'] = stats['found_this_week']
-        
-        stats['total_categories'] = conn.execute(
-            'SELECT COUNT(*) as count FROM categories'
-        ).fetchone()['count']
-        
-        stats['total_locations'] = conn.execute(
-            'SELECT COUNT(*) as count FROM locations'
-        ).fetchone()['count']
-        
-        # Recent activity (last 7 days)
-        stats['recent_lost_items'] = conn.execute(
-            "SELECT COUNT(*) as count FROM lost_items WHERE created_at >= ?",
-            (seven_days_ago,)
-        ).fetchone()['count']
-        
-        # Privacy statistics
-        stats['private_found_items'] = conn.execute(
-            "SELECT COUNT(*) as count FROM found_items WHERE is_private = 1 AND datetime(privacy_expires_at) > datetime('now')"
-        ).fetchone()['count']
-        
-        # Category breakdown
-        category_stats = conn.execute('''
-            SELECT c.name, 
-                   COUNT(CASE WHEN l.id IS NOT NULL THEN 1 END) as lost_count,
-                   COUNT(CASE WHEN f.id IS NOT NULL THEN 1 END) as found_count
-            FROM categories c
-            LEFT JOIN lost_items l ON c.id = l.category_id AND l.is_resolved = 0
-            LEFT JOIN found_items f ON c.id = f.category_id AND f.is_claimed = 0
-            GROUP BY c.id, c.name
-            ORDER BY (COUNT(CASE WHEN l.id IS NOT NULL THEN 1 END) + COUNT(CASE WHEN f.id IS NOT NULL THEN 1 END)) DESC
-            LIMIT 5
-        ''').fetchall()
-        
-        stats['top_categories'] = [dict_from_row(cat) for cat in category_stats]
-        
-        # Location breakdown
-        location_stats = conn.execute('''
-            SELECT loc.name, loc.building_code,
-                   COUNT(CASE WHEN l.id IS NOT NULL THEN 1 END) as lost_count,
-                   COUNT(CASE WHEN f.id IS NOT NULL THEN 1 END) as found_count
-            FROM locations loc
-            LEFT JOIN lost_items l ON loc.id = l.location_id AND l.is_resolved = 0
-            LEFT JOIN found_items f ON loc.id = f.location_id AND f.is_claimed = 0
-            GROUP BY loc.id, loc.name, loc.building_code
-            ORDER BY (COUNT(CASE WHEN l.id IS NOT NULL THEN 1 END) + COUNT(CASE WHEN f.id IS NOT NULL THEN 1 END)) DESC
-            LIMIT 5
-        ''').fetchall()
-        
-        stats['top_locations'] = [dict_from_row(loc) for loc in location_stats]
-        
-        # Calculate totals
-        stats['total_items'] = stats['active_lost_items'] + stats['unclaimed_found_items']
-        stats['recent_total'] = stats['recent_lost_items'] + stats['recent_found_items']
-        
+        return compute_stats(conn, get_et_now())
+    finally:
         conn.close()
+
+# Shared snapshot: refreshed at most once per STATS_TTL, one computation at a time
+stats_snapshot = StatsSnapshot(_compute_stats)
+
+@app.route('/api/stats')
+def get_stats():
+    """Get comprehensive system statistics (served from the stats snapshot)"""
+    try:
+        snapshot, age = stats_snapshot.get()
+        stats = dict(snapshot)
+        stats['snapshot_age_seconds'] = round(age, 1)
         return jsonify(stats)
         
     except Exception as e:
@@ -1417,7 +1461,7 @@ def login():
                 }), 403
             else:
                 # Suspension expired, remove suspension
-                conn = sqlite3.connect(DB_PATH)
+                conn = get_db_connection(use_row_factory=False)
                 cursor = conn.cursor()
                 cursor.execute('UPDATE users SET is_suspended = 0, suspension_until = NULL WHERE email = ?', (email,))
                 conn.commit()
@@ -1562,6 +1606,7 @@ def delete_user_account(user_id):
 
         conn.commit()
         conn.close()
+        response_cache.invalidate(f'user:{user_id}', f'user-reviews:{user_id}', f"email:{user['email']}")
 
         print(f"✅ User account {user_id} and all associated data completely deleted")
         return jsonify({'success': True, 'message': 'Account and all associated data deleted successfully'}), 200
@@ -1633,11 +1678,15 @@ def register():
         
         if verification_success:
             print(f"✅ Verification email sent: {verification_message}")
+            message = 'Registration successful! Please check your email for verification code.'
         else:
+            # The account exists either way; the client retries through /api/auth/resend
             print(f"⚠️ User created but email failed: {verification_message}")
+            message = f'Registration successful, but no verification code was sent: {verification_message}'
         
         return jsonify({
-            'message': 'Registration successful! Please check your email for verification code.',
+            'message': message,
+            'verification_sent': verification_success,
             'user': {
                 'id': result['id'],
                 'email': result['email'],
@@ -1664,14 +1713,7 @@ def auth_resend():
     if not email.endswith('@kent.edu'):
         return jsonify({'error': 'Only Kent State (@kent.edu) email addresses are allowed'}), 400
     
-    # Clear old codes for this email
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM email_verifications WHERE email = ? AND is_verified = FALSE", (email,))
-    conn.commit()
-    conn.close()
-    
+    # send_verification_email replaces the old code; a rate-limited resend keeps it valid
     success, message = verification_service.send_verification_email(
         email, "Account Verification", "registration", None
     )
@@ -1856,13 +1898,7 @@ def resend_verification():
     if not email:
         return jsonify({'error': 'Email is required'}), 400
     
-    # Clear old codes for this email
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM email_verifications WHERE email = ? AND is_verified = FALSE", (email,))
-    conn.commit()
-    conn.close()
-    
+    # send_verification_email replaces the old code; a rate-limited resend keeps it valid
     success, message = verification_service.send_verification_email(email)
     
     if success:
@@ -1910,6 +1946,8 @@ def report_lost_item():
         if not conn:
             return jsonify({'error': 'Database not available'}), 500
         
+        new_lookup_tags = []  # cached lookup lists to invalidate after commit
+        
         # If category is "other", create new category
         if str(category_id).lower() == 'other':
             custom_category = data.get('custom_category', '').strip()
@@ -1927,6 +1965,7 @@ def report_lost_item():
                     (custom_category, f'Custom category: {custom_category}')
                 )
                 category_id = cursor.lastrowid
+                new_lookup_tags.append('categories')
                 print(f"🆕 Created new category: {custom_category} (ID: {category_id})")
         
         # If location is "other", create new location
@@ -1946,6 +1985,7 @@ def report_lost_item():
                     (custom_location, custom_location[:4].upper(), f'Custom location: {custom_location}')
                 )
                 location_id = cursor.lastrowid
+                new_lookup_tags.append('locations')
                 print(f"🆕 Created new location: {custom_location} (ID: {location_id})")
         
         # Lost items are always private (only visible to the person who reported)
@@ -1979,9 +2019,14 @@ def report_lost_item():
         item_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        if new_lookup_tags:
+            response_cache.invalidate(*new_lookup_tags)
         
         print(f"✅ Lost item created: ID {item_id} - {data.get('title')}")
         
+        # Score against found items in the background; ml_matches fills in within seconds
+        enqueue_match_job('lost', item_id)
+        
         return jsonify({
             'message': 'Lost item reported successfully',
             'item_id': item_id,
@@ -2034,6 +2079,8 @@ def report_found_item():
         if not conn:
             return jsonify({'error': 'Database not available'}), 500
         
+        new_lookup_tags = []  # cached lookup lists to invalidate after commit
+        
         # If category is "other", create new category
         if str(category_id).lower() == 'other':
             custom_category = data.get('custom_category', '').strip()
@@ -2051,6 +2098,7 @@ def report_found_item():
                     (custom_category, f'Custom category: {custom_category}')
                 )
                 category_id = cursor.lastrowid
+                new_lookup_tags.append('categories')
                 print(f"🆕 Created new category: {custom_category} (ID: {category_id})")
         
         # If location is "other", create new location
@@ -2070,6 +2118,7 @@ def report_found_item():
                     (custom_location, custom_location[:4].upper(), f'Custom location: {custom_location}')
                 )
                 location_id = cursor.lastrowid
+                new_lookup_tags.append('locations')
                 print(f"🆕 Created new location: {custom_location} (ID: {location_id})")
         
         # Calculate privacy expiry (3 days from now) - ET timezone
@@ -2106,22 +2155,14 @@ def report_found_item():
         item_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        if new_lookup_tags:
+            response_cache.invalidate(*new_lookup_tags)
         
         print(f"✅ Found item created with ID: {item_id}")
         
-        # AUTOMATIC ML NOTIFICATION: Notify matching lost item owners
-        try:
-            notif_service = get_notification_service()
-            if notif_service:
-                print(f"📨 Checking for matching lost items to notify...")
-                notifications_sent = notif_service.notify_matching_lost_item_owners(item_id)
-                if notifications_sent > 0:
-                    print(f"✅ Sent {notifications_sent} match notifications!")
-                else:
-                    print("ℹ️ No matching lost items found for notification")
-        except Exception as e:
-            print(f"⚠️ Error sending notifications (non-critical): {e}")
-            # Don't fail the request if notifications fail
+        # AUTOMATIC ML MATCHING: score against lost items in the background
+        # (matches >= 80% are stored and the lost item owners emailed by the worker)
+        enqueue_match_job('found', item_id)
         
         return jsonify({
             'message': 'Found item reported successfully',
@@ -2136,8 +2177,24 @@ def report_found_item():
 
 @app.route('/api/uploads/<filename>')
 def uploaded_file(filename):
-    """Serve uploaded images"""
+    """Serve uploaded images; ?w=<pixels> serves the smallest variant at least that wide"""
+    width = request.args.get('w', type=int)
     try:
+        if width and width > 0:
+            accept_webp = request.accept_mimetypes.quality('image/webp') > 0
+            variant = resolve_variant(app.config['UPLOAD_FOLDER'], filename, width, accept_webp)
+            if variant:
+                # Variant names carry the content hash, so the URL's answer never changes
+                response = send_from_directory(variant_folder(app.config['UPLOAD_FOLDER']), variant,
+                                               max_age=VARIANT_MAX_AGE)
+                response.cache_control.public = True
+                response.cache_control.immutable = True
+            else:
+                # Original as a fallback: revalidate so the variant is picked up once it exists
+                response = send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+                response.cache_control.no_cache = True
+            response.vary.add('Accept')
+            return response
         return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
     except FileNotFoundError:
         return jsonify({'error': 'Image not found'}), 404
@@ -2150,9 +2207,7 @@ def uploaded_file(filename):
 def get_reviews():
     """Get all approved reviews"""
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=20)
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         
         # Get only approved reviews, ordered by most recent first
         # Exclude email to protect user privacy
@@ -2225,12 +2280,12 @@ def create_review():
             unique_filename = f"{uuid.uuid4().hex}_review_{filename}"
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
             image.save(filepath)
+            create_variants(app.config['UPLOAD_FOLDER'], unique_filename)
             image_filename = unique_filename
             print(f"✅ Review image uploaded: {image_filename}")
         
         # Insert review into database
-        conn = sqlite3.connect(DB_PATH, timeout=20)
-        conn.execute('PRAGMA journal_mode=WAL')
+        conn = get_db_connection(use_row_factory=False)
         
         cursor = conn.execute('''
             INSERT INTO reviews (user_name, user_email, rating, review_text, item_found, image_filename, is_approved)
@@ -2257,9 +2312,7 @@ def create_review():
 def get_review(review_id):
     """Get a specific review by ID"""
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=20)
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         
         cursor = conn.execute('''
             SELECT id, user_name, user_email, rating, review_text, 
@@ -2298,7 +2351,7 @@ def is_admin(user_email):
         return False
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         cursor.execute('SELECT is_moderator FROM users WHERE email = ?', (user_email,))
         user = cursor.fetchone()
@@ -2322,7 +2375,7 @@ def report_abuse():
             if field not in data:
                 return jsonify({'error': f'Missing field: {field}'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -2370,7 +2423,7 @@ def moderation_action():
             if field not in data:
                 return jsonify({'error': f'Missing field: {field}'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Check if user is a moderator
@@ -2437,6 +2490,8 @@ def moderation_action():
         
         conn.commit()
         conn.close()
+        if target_user_email:
+            response_cache.invalidate(f'email:{target_user_email}')
         
         # Send email notification to the user (if action requires it)
         if action_message and target_user_email:
@@ -2501,8 +2556,7 @@ def get_claims():
         if not user_email:
             return jsonify({'error': 'User email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         if user_type == 'claimer':
@@ -2548,8 +2602,7 @@ def get_notifications():
         if not user_email:
             return jsonify({'error': 'User email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         
         if unread_only:
             query = """
@@ -2586,7 +2639,7 @@ def get_notifications():
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         conn.execute(
             "UPDATE notifications SET is_read = 1 WHERE notification_id = ?",
             (notification_id,)
@@ -2609,8 +2662,7 @@ def check_claim_attempt(found_item_id):
         if not user_email:
             return jsonify({'error': 'User email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check for existing attempt
@@ -2649,8 +2701,7 @@ def get_claim_attempts_for_item(found_item_id):
         if not finder_email:
             return jsonify({'error': 'Finder email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # First, verify that the requester is the finder of this item
@@ -2746,8 +2797,7 @@ def get_claim_attempts_for_item(found_item_id):
             # Generate conversation ID for this claimer-finder pair
             if attempt_dict['user_id'] and finder_user_id:
                 # Check if conversation already exists
-                temp_conn = sqlite3.connect(DB_PATH)
-                temp_conn.row_factory = sqlite3.Row
+                temp_conn = get_db()
                 temp_cursor = temp_conn.cursor()
                 
                 temp_cursor.execute('''
@@ -2819,8 +2869,7 @@ def get_my_claim_attempts():
         if not user_email:
             return jsonify({'error': 'User email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get all claim attempts by this user (LEFT JOIN to handle deleted items and successful returns)
@@ -3164,8 +3213,7 @@ def update_claim_attempt():
         if not found_item_id or not user_email:
             return jsonify({'error': 'Found item ID and user email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get found item details before updating
@@ -3281,8 +3329,7 @@ def finalize_claim():
         if len(claim_reason.strip()) < 10:
             return jsonify({'error': 'Please provide a detailed reason (at least 10 characters)'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get full item details and claim attempt details
@@ -3527,6 +3574,8 @@ def finalize_claim():
         
         conn.commit()
         conn.close()
+        # Return counts shown on both users' profiles and stats
+        response_cache.invalidate(f'email:{owner_email}', f'email:{user_email}')
         
         # Send email notifications to both finder and claimer
         try:
@@ -3624,7 +3673,7 @@ This is an automated notification. Please do not reply to this email.
                 print(f"   [EMAIL] Finalization notification sent to claimer: {user_email}")
             
             # Send emails to all unsuccessful claimers
-            cursor = sqlite3.connect(DB_PATH).cursor()
+            cursor = get_db_connection(use_row_factory=False).cursor()
             cursor.execute('''
                 SELECT DISTINCT ca.user_email, u.full_name
                 FROM claim_attempts ca
@@ -3703,8 +3752,7 @@ def get_claimed_items():
     After 3 days: No more responses accepted, item stays until owner finalizes claim
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get items that have potential claimers (success=1)
@@ -3803,7 +3851,7 @@ def update_claim(claim_id):
         data = request.get_json()
         new_status = data.get('claimed_status', 'PENDING')
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Get the item_id for this claim
@@ -3871,8 +3919,7 @@ def create_abuse_report():
         reported_by_email = data.get('reported_by_email')
         
         # Connect to database
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Fetch target item details to store owner info
@@ -4008,8 +4055,7 @@ def get_abuse_reports():
         if not admin_email:
             return jsonify({'error': 'Email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if user is a moderator
@@ -4020,9 +4066,12 @@ def get_abuse_reports():
             conn.close()
             return jsonify({'error': 'Access denied. Moderator privileges required.'}), 403
         
+        cursor_mode, page_cursor, count_mode = cursor_request_args()
+        position = ABUSE_REPORTS_KEYSET.decode(page_cursor) if cursor_mode else None
+        
         # Build query with joins to get full details
         # Use stored target user info as fallback when item is deleted
-        query = """
+        query_template = """
             SELECT 
                 ar.*,
                 COALESCE(
@@ -4051,7 +4100,7 @@ def get_abuse_reports():
                 COALESCE(li.date_lost, ar.target_item_date) as lost_date,
                 COALESCE(u_lost_owner.full_name, li.user_name, ar.target_user_name) as lost_owner_name,
                 COALESCE(u_lost_owner.email, li.user_email, ar.target_user_email) as lost_owner_email,
-                COALESCE(u_lost_owner.phone_number, ar.target_user_phone) as lost_owner_phone
+                COALESCE(u_lost_owner.phone_number, ar.target_user_phone) as lost_owner_phone{key_columns}
             FROM abuse_reports ar
             LEFT JOIN users u_reporter ON ar.reported_by_id = u_reporter.id
             LEFT JOIN found_items fi ON ar.target_id = fi.id AND ar.type IN ('ITEM', 'FOUND')
@@ -4062,17 +4111,36 @@ def get_abuse_reports():
             LEFT JOIN categories lc ON li.category_id = lc.id
             LEFT JOIN locations ll ON li.location_id = ll.id
             LEFT JOIN users u_lost_owner ON li.user_email = u_lost_owner.email
+            WHERE {where}{seek}
+            ORDER BY {order}
+            {limit}
         """
         
-        params = []
-        if status:
-            query += " WHERE ar.status = ?"
-            params.append(status.upper())
-        
-        query += " ORDER BY ar.created_at DESC"
+        filter_params = [status.upper()] if status else []
+        # Cursor mode reads one page after the cursor instead of every report
+        query, seek_params = page_sql(query_template, ABUSE_REPORTS_KEYSET, cursor_mode, position,
+                                      default_order='ar.created_at DESC',
+                                      where='ar.status = ?' if status else '1',
+                                      limit='LIMIT ?' if cursor_mode else '')
+        params = [*filter_params, *seek_params]
+        if cursor_mode:
+            limit = min(int(request.args.get('limit', 100)), 500)
+            params.append(limit + 1)
         
         cursor.execute(query, params)
         rows = cursor.fetchall()
+        
+        if cursor_mode:
+            reports, next_cursor = ABUSE_REPORTS_KEYSET.page(rows, limit)
+            total = total_count(conn, count_mode,
+                                'SELECT COUNT(*) FROM abuse_reports ar' + (' WHERE ar.status = ?' if status else ''),
+                                filter_params)
+            conn.close()
+            return jsonify({
+                'reports': reports,
+                'pagination': cursor_pagination(limit, page_cursor, next_cursor, total)
+            }), 200
+        
         conn.close()
         
         reports = []
@@ -4083,6 +4151,8 @@ def get_abuse_reports():
         print(f"✅ Retrieved {len(reports)} abuse reports with full details")
         return jsonify({'reports': reports}), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"❌ Error fetching reports: {e}")
         import traceback
@@ -4101,7 +4171,7 @@ def update_abuse_report(report_id):
         if not is_admin(admin_email):
             return jsonify({'error': 'Unauthorized. Admin access required.'}), 403
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Get admin name
@@ -4153,8 +4223,7 @@ def delete_reported_content(report_id):
         if not is_admin(admin_email):
             return jsonify({'error': 'Unauthorized. Admin access required.'}), 403
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get report details
@@ -4238,62 +4307,14 @@ def get_conversations():
         if not user_id:
             return jsonify({'error': 'User ID required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get unique conversations with last message - ONLY for conversations where user is a participant
         # Convert user_id to int for proper comparison
         user_id_int = int(user_id)
         
-        cursor.execute('''
-            SELECT 
-                c.secure_id as conversation_id,
-                c.item_id,
-                'FOUND' as item_type,
-                COALESCE(fi.title, sr.item_title, 'Item') as item_title,
-                CASE 
-                    WHEN c.user_id_1 = ? THEN c.user_id_2
-                    ELSE c.user_id_1
-                END as other_user_id,
-                CASE 
-                    WHEN c.user_id_1 = ? THEN 
-                        COALESCE(u2.full_name, 'User #' || c.user_id_2)
-                    ELSE 
-                        COALESCE(u1.full_name, 'User #' || c.user_id_1)
-                END as other_user_name,
-                CASE 
-                    WHEN c.user_id_1 = ? THEN u2.email
-                    ELSE u1.email
-                END as other_user_email,
-                '' as last_message,
-                COALESCE(last_msg.created_at, c.created_at) as last_message_time,
-                COALESCE(unread.count, 0) as unread_count
-            FROM conversations c
-            LEFT JOIN found_items fi ON c.item_id = fi.rowid
-            LEFT JOIN successful_returns sr ON c.item_id = sr.item_id
-            LEFT JOIN users u1 ON c.user_id_1 = u1.id
-            LEFT JOIN users u2 ON c.user_id_2 = u2.id
-            INNER JOIN (
-                SELECT conversation_id, created_at
-                FROM messages m1
-                WHERE created_at = (
-                    SELECT MAX(created_at) 
-                    FROM messages m2 
-                    WHERE m2.conversation_id = m1.conversation_id
-                )
-            ) last_msg ON last_msg.conversation_id = c.secure_id
-            LEFT JOIN (
-                SELECT conversation_id, COUNT(*) as count
-                FROM messages
-                WHERE receiver_id = ? AND is_read = 0
-                GROUP BY conversation_id
-            ) unread ON unread.conversation_id = c.secure_id
-            WHERE (c.user_id_1 = ? OR c.user_id_2 = ?)
-              AND c.user_id_1 > 0 AND c.user_id_2 > 0
-              AND c.user_id_1 != c.user_id_2
-            ORDER BY last_message_time DESC
-        ''', (user_id_int, user_id_int, user_id_int, user_id_int, user_id_int, user_id_int))
+        cursor.execute(USER_CONVERSATIONS, (user_id_int, user_id_int, user_id_int, user_id_int, user_id_int, user_id_int))
         
         conversations = [dict(row) for row in cursor.fetchall()]
         conn.close()
@@ -4319,8 +4340,7 @@ def get_messages():
             return jsonify({'error': 'User ID required'}), 400
         
         # Create database connection first
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Validate user is part of this conversation using secure ID
@@ -4338,32 +4358,35 @@ def get_messages():
             conn.close()
             return jsonify({'error': 'Unauthorized: You are not part of this conversation'}), 403
         
-        cursor.execute('''
-            SELECT 
-                message_id,
-                conversation_id,
-                sender_id,
-                receiver_id,
-                CASE WHEN sender_id = -1 THEN '[Deleted User]' ELSE sender_name END as sender_name,
-                CASE WHEN receiver_id = -1 THEN '[Deleted User]' ELSE receiver_name END as receiver_name,
-                CASE WHEN sender_id = -1 THEN 'deleted@traceback.local' ELSE sender_email END as sender_email,
-                CASE WHEN receiver_id = -1 THEN 'deleted@traceback.local' ELSE receiver_email END as receiver_email,
-                message_text,
-                is_read,
-                created_at,
-                item_id,
-                item_type,
-                item_title
-            FROM messages
-            WHERE conversation_id = ?
-            ORDER BY created_at ASC
-        ''', (conversation_id,))
+        # Optional cursor mode: oldest first, one page at a time
+        cursor_mode, page_cursor, count_mode = cursor_request_args()
+        position = MESSAGES_KEYSET.decode(page_cursor) if cursor_mode else None
+        messages_query, seek_params = page_sql(CONVERSATION_MESSAGES_PAGE, MESSAGES_KEYSET, cursor_mode, position,
+                                               default_order='created_at ASC',
+                                               limit='LIMIT ?' if cursor_mode else '')
+        params = [conversation_id, *seek_params]
+        if cursor_mode:
+            limit = min(int(request.args.get('limit', 100)), 500)
+            params.append(limit + 1)
+        
+        cursor.execute(messages_query, params)
+        
+        if cursor_mode:
+            messages, next_cursor = MESSAGES_KEYSET.page(cursor.fetchall(), limit)
+            total = total_count(conn, count_mode, 'SELECT COUNT(*) FROM messages WHERE conversation_id = ?', (conversation_id,))
+            conn.close()
+            return jsonify({
+                'messages': messages,
+                'pagination': cursor_pagination(limit, page_cursor, next_cursor, total)
+            }), 200
         
         messages = [dict(row) for row in cursor.fetchall()]
         conn.close()
         
         return jsonify({'messages': messages}), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"❌ Error fetching messages: {e}")
         return jsonify({'error': str(e)}), 500
@@ -4400,7 +4423,7 @@ def create_conversation():
         conversation_key = f"{user_id_1}_{user_id_2}_{item_id}"
         
         # Check if conversation already exists with retry logic
-        conn_check = sqlite3.connect(DB_PATH, timeout=10.0)
+        conn_check = get_db_connection(use_row_factory=False)
         cursor_check = conn_check.cursor()
         cursor_check.execute('''
             SELECT secure_id FROM conversations 
@@ -4425,8 +4448,7 @@ def create_conversation():
             secure_id = secure_bytes.hex()[:32]  # 32 character secure ID
         
         # Store the mapping in database with retry logic
-        conn = sqlite3.connect(DB_PATH, timeout=10.0)
-        conn.execute('PRAGMA journal_mode=WAL')  # Enable Write-Ahead Logging for better concurrency
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Create conversations table if it doesn't exist
@@ -4467,8 +4489,7 @@ def get_conversation_details():
         if not secure_id or not requester_id:
             return jsonify({'error': 'Missing parameters'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -4524,7 +4545,7 @@ def send_message():
             conversation_id = f"conv_{user_ids[0]}_{user_ids[1]}{item_ref}"
         
         # Validate sender is part of this conversation using secure ID
-        conn_check = sqlite3.connect(DB_PATH)
+        conn_check = get_db_connection(use_row_factory=False)
         cursor_check = conn_check.cursor()
         cursor_check.execute('''
             SELECT user_id_1, user_id_2 FROM conversations WHERE secure_id = ?
@@ -4539,7 +4560,7 @@ def send_message():
         if int(data['sender_id']) not in allowed_user_ids:
             return jsonify({'error': 'Unauthorized: You cannot send messages in this conversation'}), 403
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Use ET local time for message timestamp
@@ -4580,7 +4601,7 @@ def send_message():
 def mark_message_read(message_id):
     """Mark a message as read"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         cursor.execute('UPDATE messages SET is_read = 1 WHERE message_id = ?', (message_id,))
@@ -4596,8 +4617,7 @@ def mark_message_read(message_id):
 # Helper function for internal use
 def get_user_by_email(email):
     """Get user details by email (internal helper)"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -4646,8 +4666,7 @@ def api_get_user_by_email():
 def api_get_user_by_id(user_id):
     """Get user details by ID (API endpoint)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
@@ -4695,7 +4714,7 @@ def create_user_review():
         if data['review_type'] not in ['FINDER', 'CLAIMER', 'APP']:
             return jsonify({'error': 'Invalid review type'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -4715,6 +4734,7 @@ def create_user_review():
         review_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        response_cache.invalidate(f"user-reviews:{data['reviewed_user_id']}")
         
         print(f"✅ User review created: {review_id}")
         return jsonify({
@@ -4733,8 +4753,7 @@ def get_user_reviews(user_id):
     try:
         review_type = request.args.get('type')  # FINDER, CLAIMER, APP, or None for all
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Exclude email addresses to protect user privacy
@@ -4781,11 +4800,11 @@ def get_user_reviews(user_id):
 
 
 @app.route('/api/user-reviews/stats/<int:user_id>', methods=['GET'])
+@cached_response(tags=('user-reviews:{user_id}',))
 def get_user_review_stats(user_id):
     """Get review statistics for a user"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get overall stats
@@ -4848,32 +4867,19 @@ def get_user_reports_with_matches(user_id):
         user_email = user['email']
         
         # Get user's lost items
-        lost_items = conn.execute("""
-            SELECT l.rowid as id, l.*, c.name as category_name, loc.name as location_name
-            FROM lost_items l
-            LEFT JOIN categories c ON l.category_id = c.id
-            LEFT JOIN locations loc ON l.location_id = loc.id
-            WHERE l.user_email = ?
-            ORDER BY l.created_at DESC
-        """, (user_email,)).fetchall()
+        lost_items = conn.execute(USER_LOST_REPORTS, (user_email,)).fetchall()
         
         # Get user's found items (show ALL items owner uploaded until deleted from database)
         # Owner needs to see ALL their items to access "View Responses" and make decisions
-        found_items = conn.execute("""
-            SELECT f.rowid as id, f.category_id, f.location_id, f.title, f.description, 
-                   f.color, f.size, f.image_filename,
-                   f.current_location, f.finder_notes, f.is_private, f.privacy_expires_at,
-                   f.is_claimed, f.status, f.created_at, f.privacy_expires,
-                   f.finder_name, f.finder_email, f.finder_phone,
-                   c.name as category_name, c.name as category,
-                   loc.name as location_name, loc.name as location,
-                   loc.building_code, loc.description as location_description
-            FROM found_items f
-            LEFT JOIN categories c ON f.category_id = c.id
-            LEFT JOIN locations loc ON f.location_id = loc.id
-            WHERE f.finder_email = ?
-            ORDER BY f.created_at DESC
-        """, (user_email,)).fetchall()
+        found_items = conn.execute(USER_FOUND_REPORTS, (user_email,)).fetchall()
+        
+        # Pre-computed matches (>80% threshold) for all of the user's items: one query per side
+        try:
+            lost_matches = load_matches(conn, 'lost', [item['id'] for item in lost_items], per_item=10)
+            found_matches = load_matches(conn, 'found', [item['id'] for item in found_items], per_item=10)
+        except Exception as e:
+            print(f"Error reading matches for user {user_id}: {e}")
+            lost_matches, found_matches = {}, {}
         
         conn.close()
         
@@ -4897,35 +4903,7 @@ def get_user_reports_with_matches(user_id):
                 except:
                     pass
             
-            # Get pre-computed matches from ml_matches table (>80% threshold)
-            conn2 = get_db()
-            matches = []
-            if conn2:
-                try:
-                    match_rows = conn2.execute("""
-                        SELECT m.match_score, m.score_breakdown,
-                               f.rowid as id, f.title, f.description, f.color, f.size,
-                               f.image_filename,
-                               f.finder_name, f.finder_email, f.finder_phone,
-                               f.current_location, f.is_claimed, f.status,
-                               c.name as category_name,
-                               loc.name as location_name
-                        FROM ml_matches m
-                        JOIN found_items f ON m.found_item_id = f.rowid
-                        LEFT JOIN categories c ON f.category_id = c.id
-                        LEFT JOIN locations loc ON f.location_id = loc.id
-                        WHERE m.lost_item_id = ? AND m.match_score >= 0.8
-                        ORDER BY m.match_score DESC
-                        LIMIT 10
-                    """, (item_dict['id'],)).fetchall()
-                    
-                    for row in match_rows:
-                        match_dict = dict(row)
-                        matches.append(match_dict)
-                    
-                    conn2.close()
-                except Exception as e:
-                    print(f"Error reading matches for lost item {item_dict['id']}: {e}")
+            matches = lost_matches.get(item_dict['id'], [])
             
             item_dict['matches'] = matches
             item_dict['match_count'] = len(matches)
@@ -4937,48 +4915,21 @@ def get_user_reports_with_matches(user_id):
         for item in found_items:
             item_dict = dict(item)
             
-            # Get pre-computed matches from ml_matches table (>80% threshold)
-            conn2 = get_db()
-            matches = []
-            if conn2:
-                try:
-                    match_rows = conn2.execute("""
-                        SELECT m.match_score, m.score_breakdown,
-                               l.rowid as id, l.title, l.description, l.color, l.size,
-                               l.date_lost, l.time_lost, l.image_filename,
-                               l.owner_name, l.user_email, l.owner_phone,
-                               l.last_seen_location, l.owner_notes,
-                               c.name as category_name,
-                               loc.name as location_name
-                        FROM ml_matches m
-                        JOIN lost_items l ON m.lost_item_id = l.rowid
-                        LEFT JOIN categories c ON l.category_id = c.id
-                        LEFT JOIN locations loc ON l.location_id = loc.id
-                        WHERE m.found_item_id = ? AND m.match_score >= 0.8
-                        ORDER BY m.match_score DESC
-                        LIMIT 10
-                    """, (item_dict['id'],)).fetchall()
-                    
-                    for row in match_rows:
-                        match_dict = dict(row)
-                        # Format match dates
-                        if match_dict.get('date_lost'):
-                            try:
-                                date_obj = datetime.strptime(match_dict['date_lost'], '%Y-%m-%d')
-                                match_dict['date_lost'] = date_obj.strftime('%m/%d/%Y')
-                            except:
-                                pass
-                        if match_dict.get('time_lost'):
-                            try:
-                                time_obj = datetime.strptime(match_dict['time_lost'], '%H:%M:%S')
-                                match_dict['time_lost'] = time_obj.strftime('%I:%M %p')
-                            except:
-                                pass
-                        matches.append(match_dict)
-                    
-                    conn2.close()
-                except Exception as e:
-                    print(f"Error reading matches for found item {item_dict['id']}: {e}")
+            matches = found_matches.get(item_dict['id'], [])
+            for match_dict in matches:
+                # Format match dates
+                if match_dict.get('date_lost'):
+                    try:
+                        date_obj = datetime.strptime(match_dict['date_lost'], '%Y-%m-%d')
+                        match_dict['date_lost'] = date_obj.strftime('%m/%d/%Y')
+                    except:
+                        pass
+                if match_dict.get('time_lost'):
+                    try:
+                        time_obj = datetime.strptime(match_dict['time_lost'], '%H:%M:%S')
+                        match_dict['time_lost'] = time_obj.strftime('%I:%M %p')
+                    except:
+                        pass
             
             item_dict['matches'] = matches
             item_dict['match_count'] = len(matches)
@@ -5018,82 +4969,47 @@ def get_user_matches_summary(user_id):
         
         user_email = user['email']
         
-        # Get user's lost items count
-        lost_count = conn.execute(
-            "SELECT COUNT(*) as count FROM lost_items WHERE user_email = ?", 
-            (user_email,)
-        ).fetchone()['count']
-        
-        # Get user's found items count
-        found_count = conn.execute(
-            "SELECT COUNT(*) as count FROM found_items WHERE finder_email = ?", 
-            (user_email,)
-        ).fetchone()['count']
-        
-        # Get item IDs
-        lost_item_ids = [row['id'] for row in conn.execute(
-            "SELECT rowid as id FROM lost_items WHERE user_email = ?", 
-            (user_email,)
-        ).fetchall()]
-        
-        found_item_ids = [row['id'] for row in conn.execute(
-            "SELECT rowid as id FROM found_items WHERE finder_email = ?", 
-            (user_email,)
-        ).fetchall()]
-        
-        conn.close()
-        
-        # Count matches from pre-computed ml_matches table
-        total_matches = 0
-        high_confidence_matches = 0  # >=80%
-        
-        # Count matches for lost items
-        for item_id in lost_item_ids:
+        # Optional ?buckets=0.6,0.8,0.9 (score thresholds to count matches at)
+        buckets = set(SUMMARY_BUCKETS)
+        if request.args.get('buckets'):
             try:
-                match_count = conn.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM ml_matches 
-                    WHERE lost_item_id = ? AND match_score >= 0.8
-                """, (item_id,)).fetchone()['count']
-                total_matches += match_count
-                
-                high_conf_count = conn.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM ml_matches 
-                    WHERE lost_item_id = ? AND match_score >= 0.8
-                """, (item_id,)).fetchone()['count']
-                high_confidence_matches += high_conf_count
-            except:
-                pass
+                buckets = {round(float(b), 4) for b in request.args['buckets'].split(',') if b.strip()}
+            except ValueError:
+                return jsonify({'error': 'buckets must be comma-separated numbers between 0 and 1'}), 400
+            if not buckets or len(buckets) > 10 or any(b < 0 or b > 1 for b in buckets):
+                return jsonify({'error': 'buckets must be comma-separated numbers between 0 and 1'}), 400
+        buckets.add(MATCH_MIN_SCORE)  # total_matches is always the >=80% count
+        
+        # Report counts and per-bucket match counts for both sides in one grouped query
+        summary = summarize_matches(conn, user_email, buckets)
+        conn.close()
         
-        # Count matches for found items
-        for item_id in found_item_ids:
-            try:
-                match_count = conn.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM ml_matches 
-                    WHERE found_item_id = ? AND match_score >= 0.8
-                """, (item_id,)).fetchone()['count']
-                total_matches += match_count
-                
-                high_conf_count = conn.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM ml_matches 
-                    WHERE found_item_id = ? AND match_score >= 0.8
-                """, (item_id,)).fetchone()['count']
-                high_confidence_matches += high_conf_count
-            except:
-                pass
+        lost_count = summary['lost']['reports']
+        found_count = summary['found']['reports']
+        bucket_totals = {
+            b: summary['lost']['buckets'][b] + summary['found']['buckets'][b]
+            for b in sorted(buckets)
+        }
+        total_matches = bucket_totals[MATCH_MIN_SCORE]
+        high_confidence_matches = total_matches  # >=80%
         
-        return jsonify({
+        response = jsonify({
             'user_id': user_id,
             'lost_reports': lost_count,
             'found_reports': found_count,
             'total_reports': lost_count + found_count,
             'total_matches': total_matches,
             'high_confidence_matches': high_confidence_matches,
-            'has_matches': total_matches > 0
+            'has_matches': total_matches > 0,
+            'buckets': {str(b): count for b, count in bucket_totals.items()},
+            'buckets_by_type': {
+                side: {str(b): count for b, count in summary[side]['buckets'].items()}
+                for side in ('lost', 'found')
+            }
         })
+        # Polled by the header badge on every page; let the browser reuse it briefly
+        response.headers['Cache-Control'] = 'private, max-age=15'
+        return response
         
     except Exception as e:
         print(f"Error fetching user matches summary: {e}")
@@ -5247,10 +5163,8 @@ def batch_match_all():
         min_score = float(request.args.get('min_score', 0.3))
         limit = int(request.args.get('limit', 100))
         
-        matches = service.batch_match_all_items(min_score)
-        
-        # Limit results
-        matches = matches[:limit]
+        # Only the top `limit` matches are kept while scoring
+        matches = service.batch_match_all_items(min_score, limit=limit)
         
         return jsonify({
             'matches': matches,
@@ -5269,17 +5183,11 @@ def cleanup_old_claimed_items():
     These items have been successfully claimed and given to the rightful owner.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Get items to be deleted for logging
-        cursor.execute('''
-            SELECT rowid, title, claimed_date 
-            FROM found_items 
-            WHERE status = 'CLAIMED' 
-            AND claimed_date IS NOT NULL
-            AND datetime(claimed_date) <= datetime('now', '-3 days')
-        ''')
+        cursor.execute(EXPIRED_CLAIMED_ITEMS)
         items_to_delete = cursor.fetchall()
         
         if items_to_delete:
@@ -5288,12 +5196,7 @@ def cleanup_old_claimed_items():
                 print(f"   - {item[1]} (claimed on {item[2]})")
         
         # Delete the items
-        cursor.execute('''
-            DELETE FROM found_items 
-            WHERE status = 'CLAIMED' 
-            AND claimed_date IS NOT NULL
-            AND datetime(claimed_date) <= datetime('now', '-3 days')
-        ''')
+        cursor.execute(DELETE_EXPIRED_CLAIMED_ITEMS)
         
         deleted_count = cursor.rowcount
         conn.commit()
@@ -5332,8 +5235,7 @@ def api_cleanup_claimed_items():
 def verify_user_exists(user_id):
     """Verify if a user account still exists (for checking deleted accounts)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -5947,8 +5849,7 @@ def get_successful_returns():
         if not email:
             return jsonify({'error': 'Email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         results = []
@@ -6057,6 +5958,7 @@ def get_successful_returns():
 
 
 @app.route('/api/successful-returns/stats', methods=['GET'])
+@cached_response(private=True)
 def get_successful_returns_stats():
     """Get statistics about successful returns/claims"""
     try:
@@ -6064,9 +5966,9 @@ def get_successful_returns_stats():
         
         if not email:
             return jsonify({'error': 'Email required'}), 400
+        tag_response(f'email:{email}')
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Count successful returns (as owner)
@@ -6130,6 +6032,7 @@ def get_successful_returns_stats():
 
 
 @app.route('/api/public-profile/<int:user_id>', methods=['GET'])
+@cached_response(tags=('user:{user_id}',))
 def get_public_profile(user_id):
     """
     Get public profile information for a user
@@ -6137,8 +6040,7 @@ def get_public_profile(user_id):
     This is read-only and cannot be edited
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Query user profile data (excluding sensitive PII fields)
@@ -6162,6 +6064,7 @@ def get_public_profile(user_id):
         email = email_row['email'] if email_row else None
         
         if email:
+            tag_response(f'email:{email}')
             # Count successful returns (as finder/owner)
             cursor.execute('''
                 SELECT COUNT(*) as count
@@ -6239,8 +6142,7 @@ def check_moderator_access():
         if not email:
             return jsonify({'error': 'Email required', 'is_moderator': False}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute('SELECT is_moderator FROM users WHERE email = ?', (email,))
@@ -6265,8 +6167,7 @@ def get_all_successful_returns_moderation():
         if not email:
             return jsonify({'error': 'Email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if user is a moderator
@@ -6319,7 +6220,7 @@ def submit_bug_report():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Use ET timezone for created_at
@@ -6370,8 +6271,7 @@ def get_bug_reports():
         if not email:
             return jsonify({'error': 'Email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if user is a moderator
@@ -6382,24 +6282,27 @@ def get_bug_reports():
             conn.close()
             return jsonify({'error': 'Access denied. Moderator privileges required.'}), 403
         
-        cursor.execute('''
-            SELECT * FROM bug_reports
-            ORDER BY 
-                CASE status
-                    WHEN 'OPEN' THEN 1
-                    WHEN 'IN_PROGRESS' THEN 2
-                    WHEN 'RESOLVED' THEN 3
-                    ELSE 4
-                END,
-                CASE priority
-                    WHEN 'CRITICAL' THEN 1
-                    WHEN 'HIGH' THEN 2
-                    WHEN 'MEDIUM' THEN 3
-                    WHEN 'LOW' THEN 4
-                    ELSE 5
-                END,
-                created_at DESC
-        ''')
+        cursor_mode, page_cursor, count_mode = cursor_request_args()
+        position = BUG_REPORTS_KEYSET.decode(page_cursor) if cursor_mode else None
+        # Cursor mode reads one page after the cursor instead of every report
+        query, params = page_sql(BUG_REPORTS_PAGE, BUG_REPORTS_KEYSET, cursor_mode, position,
+                                 default_order=BUG_REPORTS_KEYSET.order_sql(),
+                                 limit='LIMIT ?' if cursor_mode else '')
+        if cursor_mode:
+            limit = min(int(request.args.get('limit', 100)), 500)
+            params.append(limit + 1)
+        cursor.execute(query, params)
+        
+        if cursor_mode:
+            results, next_cursor = BUG_REPORTS_KEYSET.page(cursor.fetchall(), limit)
+            total = total_count(conn, count_mode, 'SELECT COUNT(*) FROM bug_reports')
+            conn.close()
+            return jsonify({
+                'success': True,
+                'reports': results,
+                'total': total,
+                'pagination': cursor_pagination(limit, page_cursor, next_cursor, total)
+            }), 200
         
         reports = cursor.fetchall()
         results = [dict(report) for report in reports]
@@ -6412,6 +6315,8 @@ def get_bug_reports():
             'total': len(results)
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"❌ Error fetching bug reports: {e}")
         import traceback
@@ -6429,7 +6334,7 @@ def update_bug_report(report_id):
         if not moderator_email:
             return jsonify({'error': 'Moderator email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Check if user is a moderator and get their name
@@ -6499,7 +6404,7 @@ def send_bug_report_email():
         if not moderator_email:
             return jsonify({'error': 'Moderator email required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db_connection(use_row_factory=False)
         cursor = conn.cursor()
         
         # Check if user is a moderator
@@ -6566,7 +6471,7 @@ Kent State University
         
         if success:
             # Update bug report with email_sent timestamp and message (using ET timezone)
-            conn = sqlite3.connect(DB_PATH)
+            conn = get_db_connection(use_row_factory=False)
             cursor = conn.cursor()
             cursor.execute(
                 'UPDATE bug_reports SET email_sent = ?, email_message = ? WHERE report_id = ?',
@@ -6591,6 +6496,9 @@ Kent State University
         return jsonify({'error': str(e)}), 500
 
 
+# Time from the first import to a fully configured app (reported by /health)
+STARTUP_SECONDS = time.perf_counter() - _BOOT_STARTED
+
 if __name__ == '__main__':
     # Check if database exists
     if not os.path.exists(DB_PATH):
@@ -6600,6 +6508,7 @@ if __name__ == '__main__':
         exit(1)
     
     print("[INFO] Starting TrackeBack Comprehensive Backend")
+    print(f"[INFO] App loaded in {STARTUP_SECONDS:.3f}s (ML models load on first use)")
     print(f"[INFO] Database: {DB_PATH}")
     print("[INFO] Features: 100K items, Kent State locations, Security verification")
     
@@ -6620,6 +6529,10 @@ if __name__ == '__main__':
     print("[INFO] Reviews: http://localhost:5000/api/reviews")
     print("[INFO] Profile Management: http://localhost:5000/api/profile/{user_id}")
     
+    # ML_WARMUP=1 loads the ML models in the background instead of on the first ML request
+    if os.environ.get('ML_WARMUP', '').lower() in ('1', 'true', 'yes'):
+        threading.Thread(target=warm_up_ml_service, daemon=True).start()
+    
     # Get port from environment variable or use default
     port = int(os.environ.get('PORT', 5000))
     
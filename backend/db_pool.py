@@ -0,0 +1,243 @@
+"""
+SQLite Connection Pool
+Reuses tuned SQLite connections instead of opening a new one per query.
+Inside a Flask request every pooled_connect() call shares one connection
+(kept on flask.g and returned to the pool on teardown); outside a request
+pooled_connect() checks out a connection that returns to the pool on close()
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+
+from flask import g, has_request_context
+
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+BUSY_TIMEOUT = 20.0
+
+# Applied once when a connection is opened, not on every checkout
+PRAGMAS = (
+    ('journal_mode', 'WAL'),                                               # readers don't block the writer
+    ('synchronous', 'NORMAL'),                                             # safe with WAL, far fewer fsyncs
+    ('cache_size', os.environ.get('SQLITE_CACHE_SIZE', '-65536')),         # negative = KiB (64 MB)
+    ('mmap_size', os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    ('temp_store', 'MEMORY'),
+)
+
+
+class ConnectionPool:
+    """Bounded pool of idle connections to one database file"""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            size: Maximum number of idle connections kept open
+        """
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self.stats = {
+            'opened': 0,             # physical connections opened
+            'closed': 0,             # physical connections closed
+            'checkouts': 0,          # connections handed out (pooled or new)
+            'reused': 0,             # checkouts served from the idle pool
+            'in_use': 0,
+            'request_connections': 0,  # per-request connections (one per request that touched the DB)
+            'request_shares': 0,       # extra connects within a request served by its connection
+        }
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            self.stats[key] += delta
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        for name, value in PRAGMAS:
+            conn.execute(f'PRAGMA {name}={value}')
+        self._count('opened')
+        return conn
+
+    def acquire(self):
+        """Check out an idle connection, opening a new one when the pool is empty"""
+        try:
+            conn = self._idle.get_nowait()
+            self._count('reused')
+        except queue.Empty:
+            conn = self._open()
+        self._count('checkouts')
+        self._count('in_use')
+        return conn
+
+    def release(self, conn):
+        """Return a connection (uncommitted work is rolled back, like closing it would)"""
+        self._count('in_use', -1)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+            self._count('closed')
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            self._count('closed')
+
+    def metrics(self):
+        """Snapshot of the pool counters"""
+        with self._lock:
+            metrics = dict(self.stats)
+        metrics['idle'] = self._idle.qsize()
+        metrics['size'] = self.size
+        return metrics
+
+
+class PooledConnection:
+    """
+    sqlite3.Connection stand-in handed to callers
+
+    Keeps its own row_factory (so callers sharing a request connection don't
+    affect each other) and turns close() into a return to the pool
+    """
+
+    def __init__(self, pool, conn, row_factory=None, shared=False):
+        self._pool = pool
+        self._conn = conn
+        self._shared = shared
+        self._closed = False
+        self.row_factory = row_factory
+
+    def _check(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+
+    def cursor(self):
+        self._check()
+        cursor = self._conn.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        self._check()
+        self._conn.commit()
+
+    def rollback(self):
+        self._check()
+        self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    @property
+    def total_changes(self):
+        return self._conn.total_changes
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._shared:
+            if not has_request_context():
+                return  # already released by the request teardown
+            # The request connection stays open until teardown; only the last
+            # holder discards uncommitted work, as closing a connection would
+            holders = g.get('_db_holders', {})
+            holders[self._pool.db_path] = holders.get(self._pool.db_path, 1) - 1
+            if holders[self._pool.db_path] <= 0 and self._conn.in_transaction:
+                self._conn.rollback()
+        else:
+            self._pool.release(self._conn)
+
+    def __enter__(self):
+        self._check()
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """Get (or create) the process-wide pool for a database file"""
+    db_path = os.path.abspath(db_path)
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(db_path, ConnectionPool(db_path))
+    return pool
+
+
+def pooled_connect(db_path, row_factory=None):
+    """
+    Get a connection to db_path from the pool
+
+    Args:
+        db_path: Path to the SQLite database
+        row_factory: Row factory for this caller (e.g. sqlite3.Row)
+
+    Returns:
+        PooledConnection (call close() when done, as with sqlite3.connect)
+    """
+    db_path = os.path.abspath(db_path)
+    pool = get_pool(db_path)
+    if not has_request_context():
+        return PooledConnection(pool, pool.acquire(), row_factory)
+
+    connections = g.setdefault('_db_connections', {})
+    holders = g.setdefault('_db_holders', {})
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = pool.acquire()
+        connections[db_path] = conn
+        pool._count('request_connections')
+    else:
+        pool._count('request_shares')
+    holders[db_path] = holders.get(db_path, 0) + 1
+    return PooledConnection(pool, conn, row_factory, shared=True)
+
+
+def release_request_connections(exception=None):
+    """Teardown hook: return the request's connections to their pools"""
+    connections = g.pop('_db_connections', None)
+    g.pop('_db_holders', None)
+    if not connections:
+        return
+    for db_path, conn in connections.items():
+        get_pool(db_path).release(conn)
+
+
+def init_db_pool(app):
+    """Register the per-request connection teardown on a Flask app"""
+    app.teardown_appcontext(release_request_connections)
+
+
+def pool_metrics():
+    """Counters for every pool in this process, keyed by database file name"""
+    return {os.path.basename(path): pool.metrics() for path, pool in _pools.items()}
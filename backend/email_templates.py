@@ -0,0 +1,779 @@
+"""
+Email Templates
+The HTML templates for TraceBack emails, parsed once per process.
+
+Placeholders are {{field}} (value is HTML-escaped) or {{field|raw}} (value is
+inserted as-is, for fragments that are already HTML). A template is split
+into literal text and fields when it is first used, so rendering is a single
+join, with no per-call formatting of the 4-5KB of markup.
+
+Item notifications go out to thousands of users with the same item details.
+item_template() fills in the item fields once and keeps the result in an LRU
+cache. For each recipient only their own fields are rendered. The fan-out
+compiles its stored job body the same way, so each recipient costs one
+{{recipient_name}} substitution.
+
+Usage:
+    from email_templates import render, item_template
+    html = render('verification', verification_code='123456', item_paragraph='')
+    body = item_template('public_item', item_title='Black Laptop', ...).render()
+
+    python email_templates.py --bench 10000   # render cost per N recipients
+"""
+
+import html
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+TEMPLATE_CACHE_SIZE = 256
+
+_PLACEHOLDER = re.compile(r'\{\{(\w+)(\|raw)?\}\}')
+
+
+class EmailTemplate:
+    """A template split into literal text and fields"""
+
+    def __init__(self, source, fields=None, escape=True):
+        """
+        Parse a template
+
+        Args:
+            source: Template text
+            fields: Only these placeholder names are fields (others stay literal text);
+                    None accepts every placeholder
+            escape: HTML-escape values of fields without |raw (False for subject lines)
+        """
+        self.escape = escape
+        self._literals = []     # len(self._fields) + 1 text pieces around the fields
+        self._fields = []       # (name, raw)
+        pos = 0
+        text = []
+        for match in _PLACEHOLDER.finditer(source):
+            if fields is not None and match.group(1) not in fields:
+                continue
+            text.append(source[pos:match.start()])
+            self._literals.append(''.join(text))
+            self._fields.append((match.group(1), bool(match.group(2)) or not escape))
+            text = []
+            pos = match.end()
+        text.append(source[pos:])
+        self._literals.append(''.join(text))
+
+    @classmethod
+    def _from_parts(cls, literals, fields, escape):
+        template = cls.__new__(cls)
+        template.escape = escape
+        template._literals = literals
+        template._fields = fields
+        return template
+
+    @property
+    def fields(self):
+        """Names of the fields still to be rendered"""
+        return {name for name, _ in self._fields}
+
+    @staticmethod
+    def _value(value, raw):
+        value = '' if value is None else str(value)
+        return value if raw else html.escape(value)
+
+    def render(self, **values):
+        """
+        Render the template
+
+        Args:
+            **values: A value for every field
+
+        Returns:
+            Rendered text
+
+        Raises:
+            KeyError: A field has no value
+        """
+        literals = self._literals
+        if not self._fields:
+            return literals[0]
+        out = [literals[0]]
+        rendered = {}       # a field used several times is escaped once
+        for i, field in enumerate(self._fields):
+            text = rendered.get(field)
+            if text is None:
+                text = rendered[field] = self._value(values[field[0]], field[1])
+            out.append(text)
+            out.append(literals[i + 1])
+        return ''.join(out)
+
+    def partial(self, **values):
+        """
+        Fill in some fields now and leave the rest for render()
+
+        Values are never re-parsed, so text that looks like a placeholder inside
+        a value stays literal.
+
+        Returns:
+            A new EmailTemplate with only the unfilled fields
+        """
+        literals = [self._literals[0]]
+        fields = []
+        for i, (name, raw) in enumerate(self._fields):
+            if name in values:
+                literals[-1] += self._value(values[name], raw) + self._literals[i + 1]
+            else:
+                fields.append((name, raw))
+                literals.append(self._literals[i + 1])
+        return EmailTemplate._from_parts(literals, fields, self.escape)
+
+
+class _LRUCache:
+    """Small thread-safe LRU map with hit/miss counters"""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, key, factory):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = factory()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+    def info(self):
+        with self._lock:
+            return {'size': len(self._items), 'max_size': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+_item_cache = _LRUCache(TEMPLATE_CACHE_SIZE)
+_compiled_cache = _LRUCache(TEMPLATE_CACHE_SIZE)
+
+
+def get_template(name):
+    """Parsed template by name (parsed on first use)"""
+    template = _templates.get(name)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(name)
+            if template is None:
+                template = EmailTemplate(TEMPLATE_SOURCES[name])
+                _templates[name] = template
+    return template
+
+
+def render(name, **values):
+    """Render a named template with every field"""
+    return get_template(name).render(**values)
+
+
+def item_template(name, **item_values):
+    """
+    Named template with the item-level fields filled in, from the LRU cache
+
+    Args:
+        name: Key of TEMPLATE_SOURCES
+        **item_values: Fields shared by every recipient (title, category, ...)
+
+    Returns:
+        EmailTemplate whose remaining fields are per-recipient
+    """
+    key = (name, tuple(sorted((k, str(v)) for k, v in item_values.items())))
+    return _item_cache.get_or_create(key, lambda: get_template(name).partial(**item_values))
+
+
+def compile_template(source, fields=None, escape=True):
+    """
+    Parse an already-rendered body (e.g. a stored fan-out job) once per process
+
+    Args:
+        source: Text containing per-recipient placeholders
+        fields: Placeholder names to treat as fields (others stay literal)
+        escape: HTML-escape the values (False for subject lines)
+
+    Returns:
+        EmailTemplate
+    """
+    fields = frozenset(fields) if fields is not None else None
+    return _compiled_cache.get_or_create((source, fields, escape),
+                                         lambda: EmailTemplate(source, fields, escape))
+
+
+def cache_info():
+    """Hit/miss counters of the template caches"""
+    return {'item': _item_cache.info(), 'compiled': _compiled_cache.info(), 'parsed': len(_templates)}
+
+
+# Template name -> source. Fields: item_title, category, location, date_found
+# (+ claimer_count for finder_decision); verification_code, item_paragraph; body
+TEMPLATE_SOURCES = {}
+
+TEMPLATE_SOURCES['public_item'] = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 600px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+            border-radius: 10px 10px 0 0;
+        }
+        .content {
+            background: #f9fafb;
+            padding: 30px;
+            border: 1px solid #e5e7eb;
+            border-radius: 0 0 10px 10px;
+        }
+        .item-details {
+            background: white;
+            padding: 20px;
+            border-radius: 8px;
+            margin: 20px 0;
+            border-left: 4px solid #667eea;
+        }
+        .detail-row {
+            display: flex;
+            margin: 10px 0;
+            padding: 8px 0;
+            border-bottom: 1px solid #e5e7eb;
+        }
+        .detail-label {
+            font-weight: bold;
+            color: #667eea;
+            min-width: 100px;
+        }
+        .detail-value {
+            color: #374151;
+        }
+        .cta-button {
+            display: inline-block;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 15px 30px;
+            text-decoration: none;
+            border-radius: 8px;
+            font-weight: bold;
+            margin: 20px 0;
+            text-align: center;
+        }
+        .footer {
+            text-align: center;
+            padding: 20px;
+            color: #6b7280;
+            font-size: 14px;
+        }
+        .warning {
+            background: #fef3c7;
+            border-left: 4px solid #f59e0b;
+            padding: 15px;
+            margin: 20px 0;
+            border-radius: 4px;
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>🔔 New Found Item Available</h1>
+        <p>A found item has just become publicly visible</p>
+    </div>
+    
+    <div class="content">
+        <p>Hello,</p>
+        
+        <p>A <strong>found item</strong> has completed its 72-hour privacy period and is now publicly available on TraceBack. Check if this might be something you lost!</p>
+        
+        <div class="item-details">
+            <h3 style="margin-top: 0; color: #667eea;">📦 Item Details</h3>
+            
+            <div class="detail-row">
+                <span class="detail-label">Item:</span>
+                <span class="detail-value">{{item_title}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Category:</span>
+                <span class="detail-value">{{category}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Location:</span>
+                <span class="detail-value">{{location}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Date Found:</span>
+                <span class="detail-value">{{date_found}}</span>
+            </div>
+        </div>
+        
+        <p style="margin-top: 30px; color: #6b7280; font-size: 14px;">
+            <strong>How to Claim:</strong>
+        </p>
+        <ol style="color: #6b7280; font-size: 14px;">
+            <li>Visit the TraceBack Found Items page</li>
+            <li>Click "Claim This Item" if you believe it's yours</li>
+            <li>Answer the security questions (one attempt only)</li>
+            <li>Wait for the finder to review your answers</li>
+        </ol>
+        
+        <p style="margin-top: 20px; color: #6b7280; font-size: 14px;">
+            <strong>Remember:</strong> You only get <strong>ONE attempt</strong> to claim an item. Make sure you're certain before submitting your answers!
+        </p>
+        
+        <p style="margin-top: 15px; color: #9ca3af; font-size: 13px; font-style: italic;">
+            Note: If you have already attempted to claim this item, please ignore this email.
+        </p>
+    </div>
+    
+    <div class="footer">
+        <p><strong>TraceBack</strong> - Kent State University Lost & Found</p>
+        <p>Helping reunite you with your belongings</p>
+        <p style="font-size: 12px; margin-top: 20px;">
+            You received this email because you have an active account on TraceBack.<br>
+            To stop receiving these notifications, update your preferences in your dashboard.
+        </p>
+    </div>
+</body>
+</html>
+"""
+
+TEMPLATE_SOURCES['claimed_item'] = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 600px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .header {
+            background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+            border-radius: 10px 10px 0 0;
+        }
+        .content {
+            background: #f9fafb;
+            padding: 30px;
+            border: 1px solid #e5e7eb;
+            border-radius: 0 0 10px 10px;
+        }
+        .item-details {
+            background: white;
+            padding: 20px;
+            border-radius: 8px;
+            margin: 20px 0;
+            border-left: 4px solid #f59e0b;
+        }
+        .detail-row {
+            display: flex;
+            margin: 10px 0;
+            padding: 8px 0;
+            border-bottom: 1px solid #e5e7eb;
+        }
+        .detail-label {
+            font-weight: bold;
+            color: #f59e0b;
+            min-width: 100px;
+        }
+        .detail-value {
+            color: #374151;
+        }
+        .footer {
+            text-align: center;
+            padding: 20px;
+            color: #6b7280;
+            font-size: 14px;
+        }
+        .alert {
+            background: #fef3c7;
+            border-left: 4px solid #f59e0b;
+            padding: 15px;
+            margin: 20px 0;
+            border-radius: 4px;
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>⏰ Item Has Potential Claimer</h1>
+        <p>Competition window now open - 3 days remaining</p>
+    </div>
+    
+    <div class="content">
+        <p>Hello,</p>
+        
+        <p>A <strong>found item</strong> now has potential claimer(s) and has been moved to the <strong>Claimed Items</strong> section. You have <strong>3 days</strong> to compete if you think this is your item!</p>
+        
+        <div class="item-details">
+            <h3 style="margin-top: 0; color: #f59e0b;">📦 Item Details</h3>
+            
+            <div class="detail-row">
+                <span class="detail-label">Item:</span>
+                <span class="detail-value">{{item_title}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Category:</span>
+                <span class="detail-value">{{category}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Location:</span>
+                <span class="detail-value">{{location}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Date Found:</span>
+                <span class="detail-value">{{date_found}}</span>
+            </div>
+        </div>
+        
+        <div class="alert">
+            <strong>⏰ 3-Day Competition Window:</strong> This item already has potential claimer(s). You can still claim it if you believe it's yours, but you only have <strong>3 days</strong> from the first claim attempt. After that, the finder will review all claims.
+        </div>
+        
+        <p style="margin-top: 30px; color: #6b7280; font-size: 14px;">
+            <strong>How to Compete:</strong>
+        </p>
+        <ol style="color: #6b7280; font-size: 14px;">
+            <li>Visit the TraceBack Claimed Items page</li>
+            <li>Find this item in the 3-day competition window section</li>
+            <li>Click "Claim This Item" if you believe it's yours</li>
+            <li>Answer the security questions (one attempt only)</li>
+            <li>Wait for the finder to review all claims after 3 days</li>
+        </ol>
+        
+        <p style="margin-top: 20px; color: #6b7280; font-size: 14px;">
+            <strong>Remember:</strong> You only get <strong>ONE attempt</strong> to claim an item. Make sure you're certain before submitting your answers!
+        </p>
+        
+        <p style="margin-top: 15px; color: #9ca3af; font-size: 13px; font-style: italic;">
+            Note: If you have already attempted to claim this item, please ignore this email.
+        </p>
+    </div>
+    
+    <div class="footer">
+        <p><strong>TraceBack</strong> - Kent State University Lost & Found</p>
+        <p>Helping reunite you with your belongings</p>
+        <p style="font-size: 12px; margin-top: 20px;">
+            You received this email because you have an active account on TraceBack.<br>
+            To stop receiving these notifications, update your preferences in your dashboard.
+        </p>
+    </div>
+</body>
+</html>
+"""
+
+TEMPLATE_SOURCES['finder_decision'] = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 600px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .header {
+            background: linear-gradient(135deg, #dc2626 0%, #b91c1c 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+            border-radius: 10px 10px 0 0;
+        }
+        .content {
+            background: #f9fafb;
+            padding: 30px;
+            border: 1px solid #e5e7eb;
+            border-radius: 0 0 10px 10px;
+        }
+        .item-details {
+            background: white;
+            padding: 20px;
+            border-radius: 8px;
+            margin: 20px 0;
+            border-left: 4px solid #dc2626;
+        }
+        .detail-row {
+            display: flex;
+            margin: 10px 0;
+            padding: 8px 0;
+            border-bottom: 1px solid #e5e7eb;
+        }
+        .detail-label {
+            font-weight: bold;
+            color: #dc2626;
+            min-width: 100px;
+        }
+        .detail-value {
+            color: #374151;
+        }
+        .footer {
+            text-align: center;
+            padding: 20px;
+            color: #6b7280;
+            font-size: 14px;
+        }
+        .urgent {
+            background: #fee2e2;
+            border-left: 4px solid #dc2626;
+            padding: 15px;
+            margin: 20px 0;
+            border-radius: 4px;
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>⏰ Time to Make a Decision!</h1>
+        <p>3-day competition window has ended</p>
+    </div>
+    
+    <div class="content">
+        <p>Hello,</p>
+        
+        <p>The <strong>3-day competition window</strong> for your found item has ended. You now have <strong>potential claimer(s)</strong> waiting for your decision.</p>
+        
+        <div class="item-details">
+            <h3 style="margin-top: 0; color: #dc2626;">📦 Your Found Item</h3>
+            
+            <div class="detail-row">
+                <span class="detail-label">Item:</span>
+                <span class="detail-value">{{item_title}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Category:</span>
+                <span class="detail-value">{{category}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Location:</span>
+                <span class="detail-value">{{location}}</span>
+            </div>
+            
+            <div class="detail-row">
+                <span class="detail-label">Date Found:</span>
+                <span class="detail-value">{{date_found}}</span>
+            </div>
+        </div>
+        
+        <div class="urgent">
+            <strong>⚠️ It's Time to Make a Decision!</strong> The 3-day competition window has ended. You now need to review all claim attempts and choose the rightful owner for this item.
+        </div>
+        
+        <p style="margin-top: 30px; color: #6b7280; font-size: 14px;">
+            <strong>What to do now:</strong>
+        </p>
+        <ol style="color: #6b7280; font-size: 14px;">
+            <li>Log in to your TraceBack account</li>
+            <li>Go to your Found Items dashboard</li>
+            <li>Review all {{claimer_count}} claimer(s)' answers to your security questions</li>
+            <li>Select the person who provided the most accurate answers</li>
+            <li>Finalize the claim and arrange item return</li>
+        </ol>
+        
+        <p style="margin-top: 20px; color: #6b7280; font-size: 14px;">
+            <strong>Remember:</strong> Take your time to review each claim carefully. Choose the person whose answers best match your item. Once you finalize, the item will be marked as successfully returned!
+        </p>
+    </div>
+    
+    <div class="footer">
+        <p><strong>TraceBack</strong> - Kent State University Lost & Found</p>
+        <p>Thank you for helping reunite people with their belongings</p>
+        <p style="font-size: 12px; margin-top: 20px;">
+            This is an important notification about your found item.<br>
+            Please take action as soon as possible.
+        </p>
+    </div>
+</body>
+</html>
+"""
+
+TEMPLATE_SOURCES['verification'] = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background: #1a365d; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }
+                .content { background: #f7fafc; padding: 30px; border-radius: 0 0 8px 8px; }
+                .code-box { background: #e2e8f0; border: 2px solid #4299e1; padding: 20px; text-align: center; margin: 20px 0; border-radius: 8px; }
+                .verification-code { font-size: 36px; font-weight: bold; color: #2b6cb0; letter-spacing: 5px; }
+                .footer { text-align: center; margin-top: 20px; font-size: 12px; color: #666; }
+                .kent-logo { color: #ffd700; font-weight: bold; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1><span class="kent-logo">Kent State University</span></h1>
+                    <h2>TrackeBack Verification</h2>
+                </div>
+                
+                <div class="content">
+                    <h3>Email Verification Required</h3>
+                    
+                    <p>Hello,</p>
+                    
+                    <p>You're receiving this email because you need to verify your Kent State email address for TrackeBack - the campus lost and found system.</p>
+                    
+                    {{item_paragraph|raw}}
+                    
+                    <div class="code-box">
+                        <p>Your verification code is:</p>
+                        <div class="verification-code">{{verification_code}}</div>
+                    </div>
+                    
+                    <p><strong>Important:</strong></p>
+                    <ul>
+                        <li>This code expires in <strong>15 minutes</strong></li>
+                        <li>Enter this code in the TrackeBack app to verify your email</li>
+                        <li>Don't share this code with anyone</li>
+                        <li>If you didn't request this, please ignore this email</li>
+                    </ul>
+                    
+                    <p>Need help? Contact Campus Security or visit the Student Center information desk.</p>
+                    
+                    <p>Best regards,<br>
+                    <strong>TrackeBack Team</strong><br>
+                    Kent State University</p>
+                </div>
+                
+                <div class="footer">
+                    <p>This is an automated email from TrackeBack Lost & Found System</p>
+                    <p>Kent State University • 800 E Summit St, Kent, OH 44242</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+TEMPLATE_SOURCES['generic'] = """
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <style>
+                    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                    .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px 10px 0 0; }
+                    .content { background: white; padding: 30px; border-left: 3px solid #667eea; border-right: 3px solid #667eea; }
+                    .footer { background: #f7fafc; padding: 20px; text-align: center; border-radius: 0 0 10px 10px; border-top: 1px solid #e2e8f0; }
+                    pre { white-space: pre-wrap; background: #f7fafc; padding: 15px; border-radius: 5px; }
+                </style>
+            </head>
+            <body>
+                <div class="container">
+                    <div class="header">
+                        <h2 style="margin:0;">TraceBack Notification</h2>
+                    </div>
+                    <div class="content">
+                        <pre>{{body|raw}}</pre>
+                    </div>
+                    <div class="footer">
+                        <p style="margin:0; color: #718096;">This is an automated email from TrackeBack</p>
+                        <p style="margin:5px 0 0 0; color: #718096;">Kent State University</p>
+                    </div>
+                </div>
+            </body>
+            </html>
+            """
+
+def _time_per_recipient(render_one, recipients):
+    started = time.perf_counter()
+    for recipient in recipients:
+        render_one(recipient)
+    return time.perf_counter() - started
+
+
+def _bench(count):
+    """
+    Time rendering `count` personalized emails three ways: parsing the template
+    for every email, rendering every field from the parsed template, and
+    rendering only the per-recipient fields of a cached item body
+    """
+    names = [f'User {i}' for i in range(count)]
+    codes = [f'{i % 1000000:06d}' for i in range(count)]
+    item = {'item_title': 'Black Laptop <Dell>', 'category': 'Electronics',
+            'location': 'Smith Hall', 'date_found': 'November 29, 2025'}
+    body = 'Dear {{recipient_name}},\n\n<strong>Item Details:</strong>\n- Title: Black Laptop\n' * 4
+
+    def public_cached():
+        template = item_template('public_item', **item)
+        return lambda _: template.render()
+
+    def generic_cached():
+        # What the fan-out does per job: wrap the body once, then substitute the name
+        template = compile_template(render('generic', body=body), ('recipient_name',))
+        return lambda name: template.render(recipient_name=name)
+
+    def verification_cached():
+        template = item_template('verification', item_paragraph='')
+        return lambda code: template.render(verification_code=code)
+
+    cases = [
+        ('public_item (item fields)', names,
+         lambda _: EmailTemplate(TEMPLATE_SOURCES['public_item']).render(**item),
+         lambda _: render('public_item', **item),
+         public_cached),
+        ('generic (recipient_name)', names,
+         lambda name: EmailTemplate(TEMPLATE_SOURCES['generic']).render(body=body.replace('{{recipient_name}}', name)),
+         lambda name: render('generic', body=body.replace('{{recipient_name}}', name)),
+         generic_cached),
+        ('verification (code)', codes,
+         lambda code: EmailTemplate(TEMPLATE_SOURCES['verification']).render(verification_code=code, item_paragraph=''),
+         lambda code: render('verification', verification_code=code, item_paragraph=''),
+         verification_cached),
+    ]
+    print(f"Render cost per {count} recipients (ms):")
+    print(f"  {'template':<28}{'parse+render':>14}{'render':>10}{'cached':>10}")
+    for label, recipients, parse_each, render_each, prepare in cases:
+        started = time.perf_counter()
+        per_recipient = prepare()
+        setup = time.perf_counter() - started
+        timings = [_time_per_recipient(parse_each, recipients),
+                   _time_per_recipient(render_each, recipients),
+                   setup + _time_per_recipient(per_recipient, recipients)]
+        print(f"  {label:<28}" + ''.join(f"{t * 1000:>{w}.1f}" for t, w in zip(timings, (14, 10, 10))))
+    print(f"Cache: {cache_info()}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3 and sys.argv[1] == '--bench':
+        _bench(int(sys.argv[2]))
+    else:
+        print(f"[INFO] Templates: {', '.join(sorted(TEMPLATE_SOURCES))}")
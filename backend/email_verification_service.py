@@ -3,17 +3,65 @@ TrackeBack Email Verification System
 Sends verification codes to @kent.edu email addresses
 """
 
-import smtplib
+import html
 import random
 import string
 import sqlite3
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 import json
 import threading
+import time
+from collections import deque
 from flask import request, jsonify
+from mail_transport import queue_email, get_outbox, LatencyHistogram, PRIORITY_HIGH
+from email_templates import item_template, render
+
+# Pending verification emails in the outbox before new codes are refused (SMTP is down or far behind)
+VERIFICATION_MAX_BACKLOG = int(os.environ.get('VERIFICATION_MAX_BACKLOG', '500'))
+RATE_LIMIT_WINDOW = 3600
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+
+class RecipientRateLimiter:
+    """In-process sliding-window limit on verification sends per address"""
+
+    def __init__(self, limit, window=RATE_LIMIT_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._sends = {}            # email -> deque of monotonic send times
+        self._prune_at = 10000      # tracked addresses before idle ones are dropped
+        self._lock = threading.Lock()
+
+    def acquire(self, email):
+        """
+        Check the address against the limit and, when allowed, reserve a send
+        in the same locked step (so concurrent requests can't all pass the check)
+
+        Returns:
+            0 when a send was reserved, else seconds until one will be allowed
+        """
+        now = time.monotonic()
+        cutoff = now - self.window
+        with self._lock:
+            sends = self._sends.setdefault(email, deque())
+            while sends and sends[0] <= cutoff:
+                sends.popleft()
+            if len(sends) >= self.limit:
+                return int(sends[0] - cutoff) + 1
+            sends.append(now)
+            if len(self._sends) > self._prune_at:
+                self._sends = {key: times for key, times in self._sends.items() if times and times[-1] > cutoff}
+                self._prune_at = max(10000, 2 * len(self._sends))
+            return 0
+
+    def release(self, email):
+        """Give back a send reserved by acquire() that was never committed"""
+        with self._lock:
+            sends = self._sends.get(email)
+            if sends:
+                sends.pop()
+
 
 class EmailVerificationService:
     def __init__(self, db_path="traceback_100k.db"):
@@ -44,6 +92,10 @@ class EmailVerificationService:
                 'verification_valid_hours': 24
             }
         
+        self.rate_limiter = RecipientRateLimiter(self.settings['rate_limit_per_hour'])
+        self.request_latency = LatencyHistogram(REQUEST_LATENCY_BUCKETS)
+        self.stats = {'queued': 0, 'rate_limited': 0, 'backlog_refused': 0, 'db_errors': 0}
+        self._stats_lock = threading.Lock()
         self.init_verification_table()
     
     def init_verification_table(self):
@@ -76,137 +128,105 @@ class EmailVerificationService:
     
     def create_email_template(self, verification_code, item_title=None, item_type="item"):
         """Create HTML email template for verification"""
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #1a365d; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
-                .content {{ background: #f7fafc; padding: 30px; border-radius: 0 0 8px 8px; }}
-                .code-box {{ background: #e2e8f0; border: 2px solid #4299e1; padding: 20px; text-align: center; margin: 20px 0; border-radius: 8px; }}
-                .verification-code {{ font-size: 36px; font-weight: bold; color: #2b6cb0; letter-spacing: 5px; }}
-                .footer {{ text-align: center; margin-top: 20px; font-size: 12px; color: #666; }}
-                .kent-logo {{ color: #ffd700; font-weight: bold; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1><span class="kent-logo">Kent State University</span></h1>
-                    <h2>TrackeBack Verification</h2>
-                </div>
-                
-                <div class="content">
-                    <h3>Email Verification Required</h3>
-                    
-                    <p>Hello,</p>
-                    
-                    <p>You're receiving this email because you need to verify your Kent State email address for TrackeBack - the campus lost and found system.</p>
-                    
-                    {f'<p><strong>Item:</strong> {item_title}</p>' if item_title else ''}
-                    
-                    <div class="code-box">
-                        <p>Your verification code is:</p>
-                        <div class="verification-code">{verification_code}</div>
-                    </div>
-                    
-                    <p><strong>Important:</strong></p>
-                    <ul>
-                        <li>This code expires in <strong>15 minutes</strong></li>
-                        <li>Enter this code in the TrackeBack app to verify your email</li>
-                        <li>Don't share this code with anyone</li>
-                        <li>If you didn't request this, please ignore this email</li>
-                    </ul>
-                    
-                    <p>Need help? Contact Campus Security or visit the Student Center information desk.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>TrackeBack Team</strong><br>
-                    Kent State University</p>
-                </div>
-                
-                <div class="footer">
-                    <p>This is an automated email from TrackeBack Lost & Found System</p>
-                    <p>Kent State University • 800 E Summit St, Kent, OH 44242</p>
-                </div>
-            </div>
-        </body>
-        </html>
+        item_paragraph = f'<p><strong>Item:</strong> {html.escape(item_title)}</p>' if item_title else ''
+        return item_template('verification', item_paragraph=item_paragraph).render(verification_code=verification_code)
+    
+    def _queue_verification_email(self, outbox, email, verification_code, item_title, item_type, conn):
+        """
+        Put the verification email in the outbox ahead of bulk notifications,
+        in the caller's transaction so the code and its email commit together
         """
-        return html_content
+        subject = f"TraceBack Verification Code: {verification_code}"
+        html_content = self.create_email_template(verification_code, item_title, item_type)
+        outbox.enqueue(email, subject, html_content, priority=PRIORITY_HIGH, conn=conn)
     
-    def _send_email_async(self, email, verification_code, item_title, item_type):
-        """Send email in background thread"""
-        try:
-            # Create email
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"TraceBack Verification Code: {verification_code}"
-            msg['From'] = f"{self.smtp_config['from_name']} <{self.smtp_config['email']}>"
-            msg['To'] = email
-            
-            # Create HTML content
-            html_content = self.create_email_template(verification_code, item_title, item_type)
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            # Send email with timeout
-            server = smtplib.SMTP(self.smtp_config['smtp_server'], self.smtp_config['smtp_port'], timeout=10)
-            server.starttls()
-            server.login(self.smtp_config['email'], self.smtp_config['password'])
-            
-            text = msg.as_string()
-            server.sendmail(self.smtp_config['email'], email, text)
-            server.quit()
-            
-            print(f"✅ Verification email sent successfully to {email}")
-            
-        except smtplib.SMTPException as e:
-            print(f"❌ SMTP error sending email to {email}: {str(e)}")
-        except Exception as e:
-            print(f"❌ Error sending email to {email}: {str(e)}")
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
     
     def send_verification_email(self, email, item_title=None, item_type="lost", item_id=None):
-        """Send verification code to email address (non-blocking)"""
+        """
+        Send verification code to email address (non-blocking)
+        
+        The request only writes the code and an outbox row; the outbox's fixed
+        pool of mail workers does the SMTP send. Requests are refused when the
+        address is over rate_limit_per_hour or the outbox already holds
+        VERIFICATION_MAX_BACKLOG undelivered verification emails.
+        
+        Returns:
+            Tuple of (success, message)
+        """
         
         # Validate Kent State email
         if not email.lower().endswith('@kent.edu'):
             return False, "Only @kent.edu email addresses are allowed"
         
-        # Generate verification code
-        verification_code = self.generate_verification_code()
-        
-        # Store in database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        started = time.perf_counter()
+        outbox = get_outbox(self.db_path)
+        mail_enabled = outbox.start()
+        if outbox.backlog(PRIORITY_HIGH) >= VERIFICATION_MAX_BACKLOG:
+            self._count('backlog_refused')
+            print(f"⚠️  Verification email backlog full - refusing code for {email}")
+            return False, "Verification emails are delayed right now. Please try again in a few minutes."
         
-        # Clean up old codes for this email
-        cursor.execute("DELETE FROM email_verifications WHERE email = ? AND is_verified = FALSE", (email,))
+        # Reserves a send; released again below if the code can't be stored
+        retry_after = self.rate_limiter.acquire(email)
+        if retry_after:
+            self._count('rate_limited')
+            return False, f"Too many verification codes requested. Try again in {max(1, retry_after // 60)} minute(s)."
         
-        # Set expiration time (from settings)
-        expires_at = datetime.now() + timedelta(minutes=self.settings['expiry_minutes'])
-        
-        # Insert new verification code
-        cursor.execute('''
-            INSERT INTO email_verifications (email, verification_code, expires_at, item_type, item_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (email, verification_code, expires_at, item_type, item_id))
+        # Generate verification code
+        verification_code = self.generate_verification_code()
         
-        conn.commit()
-        conn.close()
+        # Store the code and queue its email in one transaction
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            cursor = conn.cursor()
+            
+            # Clean up old codes for this email
+            cursor.execute("DELETE FROM email_verifications WHERE email = ? AND is_verified = FALSE", (email,))
+            
+            # Set expiration time (from settings)
+            expires_at = datetime.now() + timedelta(minutes=self.settings['expiry_minutes'])
+            
+            # Insert new verification code
+            cursor.execute('''
+                INSERT INTO email_verifications (email, verification_code, expires_at, item_type, item_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (email, verification_code, expires_at, item_type, item_id))
+            
+            if mail_enabled:
+                self._queue_verification_email(outbox, email, verification_code, item_title, item_type, conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.rate_limiter.release(email)
+            self._count('db_errors')
+            print(f"❌ Could not store verification code for {email}: {e}")
+            return False, "Could not send a verification code right now. Please try again in a moment."
+        finally:
+            conn.close()
         
-        # Send email in background thread (non-blocking)
-        email_thread = threading.Thread(
-            target=self._send_email_async,
-            args=(email, verification_code, item_title, item_type),
-            daemon=True
-        )
-        email_thread.start()
+        if mail_enabled:
+            outbox.wake()
+            self._count('queued')
+        else:
+            print(f"📧 [DISABLED] Would send verification code to {email}")
+        self.request_latency.observe(time.perf_counter() - started)
         
         print(f"📧 Verification code generated and email queued for {email}")
         return True, f"Verification code sent to {email}"
     
+    def metrics(self):
+        """Verification send counters, request-path latency and the verification email backlog"""
+        with self._stats_lock:
+            metrics = dict(self.stats)
+        metrics['rate_limit_per_hour'] = self.rate_limiter.limit
+        metrics['max_backlog'] = VERIFICATION_MAX_BACKLOG
+        metrics['backlog'] = get_outbox(self.db_path).backlog(PRIORITY_HIGH)
+        metrics['request_seconds'] = self.request_latency.snapshot()
+        return metrics
+    
     def verify_code(self, email, code):
         """Verify the email code"""
         conn = sqlite3.connect(self.db_path)
@@ -274,65 +294,16 @@ class EmailVerificationService:
     
     def send_generic_email(self, to_email, subject, body):
         """Send a generic email (for moderation notifications, etc.)"""
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.smtp_config['from_name']} <{self.smtp_config['email']}>"
-            msg['To'] = to_email
-            
-            # Create HTML version
-            html_body = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: white; padding: 30px; border-left: 3px solid #667eea; border-right: 3px solid #667eea; }}
-                    .footer {{ background: #f7fafc; padding: 20px; text-align: center; border-radius: 0 0 10px 10px; border-top: 1px solid #e2e8f0; }}
-                    pre {{ white-space: pre-wrap; background: #f7fafc; padding: 15px; border-radius: 5px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h2 style="margin:0;">TraceBack Notification</h2>
-                    </div>
-                    <div class="content">
-                        <pre>{body}</pre>
-                    </div>
-                    <div class="footer">
-                        <p style="margin:0; color: #718096;">This is an automated email from TrackeBack</p>
-                        <p style="margin:5px 0 0 0; color: #718096;">Kent State University</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            html_part = MIMEText(html_body, 'html')
-            msg.attach(html_part)
-            
-            # Send email
-            server = smtplib.SMTP(self.smtp_config['smtp_server'], self.smtp_config['smtp_port'], timeout=10)
-            server.starttls()
-            server.login(self.smtp_config['email'], self.smtp_config['password'])
-            server.sendmail(self.smtp_config['email'], to_email, msg.as_string())
-            server.quit()
-            
-            print(f"✅ Email sent successfully to {to_email}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error sending email to {to_email}: {str(e)}")
-            return False
+        return queue_email(to_email, subject, render_generic_email(body), db_path=self.db_path)
+
+def render_generic_email(body):
+    """HTML wrapper for plain-text notification bodies (the body may contain HTML tags)"""
+    return render('generic', body=body)
 
 # Convenience function for importing
-def send_email(to_email, subject, body):
-    """Standalone function for sending emails"""
-    service = EmailVerificationService()
-    return service.send_generic_email(to_email, subject, body)
+def send_email(to_email, subject, body, conn=None):
+    """Standalone function for sending emails (queued through mail_transport, on `conn` when given)"""
+    return queue_email(to_email, subject, render_generic_email(body), conn=conn)
 
 # Flask routes to add to your comprehensive_app.py
 def add_verification_routes(app, verification_service):
@@ -0,0 +1,212 @@
+"""
+Hot Queries
+SQL of the endpoint and scheduler queries that must be served by an index.
+The code that runs a query and the EXPLAIN QUERY PLAN check in migrations.py
+share the text from here, so the check plans exactly what gets executed.
+
+Page templates have {key_columns}, {seek} and {order} slots;
+pagination.page_sql() fills them for page-number or cursor (keyset) mode.
+
+Usage:
+    from hot_queries import USER_LOST_REPORTS
+    rows = conn.execute(USER_LOST_REPORTS, (user_email,)).fetchall()
+
+    python migrations.py --check   # plan every hot query
+"""
+
+from claim_window import claim_window_filter
+from pagination import Keyset
+
+# Sort keys for cursor (keyset) pagination; the trailing rowid makes each key unique
+LOST_ITEMS_KEYSET = Keyset('lost_items', [('l.created_at', True), ('l.rowid', True)])
+FOUND_ITEMS_KEYSET = Keyset('found_items', [('f.created_at', True), ('f.rowid', True)])
+MESSAGES_KEYSET = Keyset('messages', [('created_at', False), ('rowid', False)])
+
+# Owner's unresolved lost items (dashboard)
+USER_LOST_ITEMS_PAGE = """
+    SELECT l.rowid as id, l.*, c.name as category_name, loc.name as location_name{key_columns}
+    FROM lost_items l
+    LEFT JOIN categories c ON l.category_id = c.id
+    LEFT JOIN locations loc ON l.location_id = loc.id
+    WHERE l.is_resolved = 0 AND l.user_email = ?{seek}
+    ORDER BY {order}
+    LIMIT ? OFFSET ?
+"""
+
+# Found items browse; {where} comes from found_browse_conditions() plus request filters
+FOUND_ITEMS_PAGE = """
+    SELECT f.rowid as id, f.category_id, f.location_id,
+           f.title, f.description, f.color, f.size,
+           f.image_filename as image_url, f.created_at,
+           f.current_location, f.finder_notes, f.is_private, f.privacy_expires_at,
+           f.is_claimed, f.created_at, f.privacy_expires,
+           f.finder_name, f.finder_email, f.finder_phone,
+           c.name as category_name, loc.name as location_name,
+           loc.building_code, loc.description as location_description{key_columns}
+    FROM found_items f
+    JOIN categories c ON f.category_id = c.id
+    JOIN locations loc ON f.location_id = loc.id
+    WHERE {where}{seek}
+    ORDER BY {order}
+    LIMIT ? OFFSET ?
+"""
+
+# Everything a user reported (profile page), newest first
+USER_LOST_REPORTS = """
+    SELECT l.rowid as id, l.*, c.name as category_name, loc.name as location_name
+    FROM lost_items l
+    LEFT JOIN categories c ON l.category_id = c.id
+    LEFT JOIN locations loc ON l.location_id = loc.id
+    WHERE l.user_email = ?
+    ORDER BY l.created_at DESC
+"""
+
+USER_FOUND_REPORTS = """
+    SELECT f.rowid as id, f.category_id, f.location_id, f.title, f.description,
+           f.color, f.size, f.image_filename,
+           f.current_location, f.finder_notes, f.is_private, f.privacy_expires_at,
+           f.is_claimed, f.status, f.created_at, f.privacy_expires,
+           f.finder_name, f.finder_email, f.finder_phone,
+           c.name as category_name, c.name as category,
+           loc.name as location_name, loc.name as location,
+           loc.building_code, loc.description as location_description
+    FROM found_items f
+    LEFT JOIN categories c ON f.category_id = c.id
+    LEFT JOIN locations loc ON f.location_id = loc.id
+    WHERE f.finder_email = ?
+    ORDER BY f.created_at DESC
+"""
+
+# Pre-computed matches (>80%) of one found item (item details page)
+FOUND_ITEM_MATCHES = """
+    SELECT m.match_score, m.score_breakdown,
+           l.rowid as id, l.title, l.description, l.color, l.size,
+           l.date_lost, l.time_lost, l.image_filename,
+           l.owner_name, l.user_email, l.owner_phone,
+           l.last_seen_location, l.owner_notes,
+           c.name as category_name,
+           loc.name as location_name
+    FROM ml_matches m
+    JOIN lost_items l ON m.lost_item_id = l.rowid
+    LEFT JOIN categories c ON l.category_id = c.id
+    LEFT JOIN locations loc ON l.location_id = loc.id
+    WHERE m.found_item_id = ? AND m.match_score >= 0.8
+    ORDER BY m.match_score DESC
+    LIMIT 10
+"""
+
+# Whether a user has a lost item matching a private found item (>80%)
+PRIVATE_ITEM_MATCH_COUNT = """
+    SELECT COUNT(*) as count
+    FROM ml_matches m
+    JOIN lost_items l ON m.lost_item_id = l.rowid
+    WHERE m.found_item_id = ?
+    AND l.user_email = ?
+    AND m.match_score >= 0.8
+"""
+
+# Unread message count per conversation for one receiver
+UNREAD_BY_CONVERSATION = """
+    SELECT conversation_id, COUNT(*) as count
+    FROM messages
+    WHERE receiver_id = ? AND is_read = 0
+    GROUP BY conversation_id
+"""
+
+# A user's conversations with the other participant and unread count (6 x user id)
+USER_CONVERSATIONS = f"""
+    SELECT
+        c.secure_id as conversation_id,
+        c.item_id,
+        'FOUND' as item_type,
+        COALESCE(fi.title, sr.item_title, 'Item') as item_title,
+        CASE
+            WHEN c.user_id_1 = ? THEN c.user_id_2
+            ELSE c.user_id_1
+        END as other_user_id,
+        CASE
+            WHEN c.user_id_1 = ? THEN
+                COALESCE(u2.full_name, 'User #' || c.user_id_2)
+            ELSE
+                COALESCE(u1.full_name, 'User #' || c.user_id_1)
+        END as other_user_name,
+        CASE
+            WHEN c.user_id_1 = ? THEN u2.email
+            ELSE u1.email
+        END as other_user_email,
+        '' as last_message,
+        COALESCE(last_msg.created_at, c.created_at) as last_message_time,
+        COALESCE(unread.count, 0) as unread_count
+    FROM conversations c
+    LEFT JOIN found_items fi ON c.item_id = fi.rowid
+    LEFT JOIN successful_returns sr ON c.item_id = sr.item_id
+    LEFT JOIN users u1 ON c.user_id_1 = u1.id
+    LEFT JOIN users u2 ON c.user_id_2 = u2.id
+    INNER JOIN (
+        SELECT conversation_id, created_at
+        FROM messages m1
+        WHERE created_at = (
+            SELECT MAX(created_at)
+            FROM messages m2
+            WHERE m2.conversation_id = m1.conversation_id
+        )
+    ) last_msg ON last_msg.conversation_id = c.secure_id
+    LEFT JOIN ({UNREAD_BY_CONVERSATION}) unread ON unread.conversation_id = c.secure_id
+    WHERE (c.user_id_1 = ? OR c.user_id_2 = ?)
+      AND c.user_id_1 > 0 AND c.user_id_2 > 0
+      AND c.user_id_1 != c.user_id_2
+    ORDER BY last_message_time DESC
+"""
+
+# Messages of one conversation, oldest first; {limit} is '' or 'LIMIT ?'
+CONVERSATION_MESSAGES_PAGE = """
+    SELECT
+        message_id,
+        conversation_id,
+        sender_id,
+        receiver_id,
+        CASE WHEN sender_id = -1 THEN '[Deleted User]' ELSE sender_name END as sender_name,
+        CASE WHEN receiver_id = -1 THEN '[Deleted User]' ELSE receiver_name END as receiver_name,
+        CASE WHEN sender_id = -1 THEN 'deleted@traceback.local' ELSE sender_email END as sender_email,
+        CASE WHEN receiver_id = -1 THEN 'deleted@traceback.local' ELSE receiver_email END as receiver_email,
+        message_text,
+        is_read,
+        created_at,
+        item_id,
+        item_type,
+        item_title{key_columns}
+    FROM messages
+    WHERE conversation_id = ?{seek}
+    ORDER BY {order}
+    {limit}
+"""
+
+# Claimed items handed back more than 3 days ago (cleanup schedulers)
+EXPIRED_CLAIMED_ITEMS_WHERE = """
+    status = 'CLAIMED'
+    AND claimed_date IS NOT NULL
+    AND datetime(claimed_date) <= datetime('now', '-3 days')
+"""
+EXPIRED_CLAIMED_ITEMS = f'SELECT rowid, title, claimed_date FROM found_items WHERE {EXPIRED_CLAIMED_ITEMS_WHERE}'
+DELETE_EXPIRED_CLAIMED_ITEMS = f'DELETE FROM found_items WHERE {EXPIRED_CLAIMED_ITEMS_WHERE}'
+
+
+def found_browse_conditions(conn, include_private=False):
+    """
+    Base WHERE conditions of the found items list
+
+    Claimed items and items in their claim window are never listed. Private
+    items (is_private=1) are only shown through ML matching and moderation, so
+    public browse also requires is_private = 0.
+
+    Args:
+        conn: Database connection
+        include_private: Keep private items (ML matching)
+
+    Returns:
+        List of SQL conditions
+    """
+    conditions = ["(f.status IS NULL OR f.status != 'CLAIMED')", claim_window_filter(conn)]
+    if not include_private:
+        conditions.append('f.is_private = 0')
+    return conditions
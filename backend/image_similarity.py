@@ -1,13 +1,22 @@
 # image_similarity.py
 
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
 from numpy.linalg import norm
-from PIL import Image
-import torch
-import torch.nn as nn
-import torchvision.models as models
-import torchvision.transforms as T
+from PIL import Image, ImageOps
+
+from image_variants import MATCH_SIZE, VARIANT_REVISION, match_source
+
+# torch / torchvision are imported on first use (see get_model) so that
+# importing this module stays cheap for processes that never embed images
 
 
 # -----------------------------------------
@@ -78,44 +87,308 @@ def color_similarity(img1, img2):
     return 0.4 * mean_sim + 0.6 * hist_sim
 
 
+# -----------------------------------------
+# CPU batching settings
+# -----------------------------------------
+BATCH_SIZE = int(os.environ.get("IMAGE_BATCH_SIZE", "16"))
+DECODE_THREADS = int(os.environ.get("IMAGE_DECODE_THREADS", str(min(8, os.cpu_count() or 1))))
+TORCH_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))  # 0 = torch default
+
+
+def configure(batch_size=None, decode_threads=None, torch_threads=None):
+    """Override batch size, decode thread pool size and torch intra-op threads"""
+    global BATCH_SIZE, DECODE_THREADS, TORCH_THREADS
+    if batch_size:
+        BATCH_SIZE = int(batch_size)
+    if decode_threads:
+        DECODE_THREADS = int(decode_threads)
+    if torch_threads:
+        TORCH_THREADS = int(torch_threads)
+        if _runtime is not None:
+            _runtime.torch.set_num_threads(TORCH_THREADS)
+
+
 # -----------------------------------------
 # ResNet-50 Deep Feature Similarity
+# (created on first use behind a thread-safe singleton)
 # -----------------------------------------
-class ResNetEmbed(nn.Module):
+class _ResNetRuntime:
+    """Everything that needs torch: the module, the model, its device and transform"""
+
     def __init__(self):
-        super().__init__()
-        base = models.resnet50(pretrained=True)
-        self.feat = nn.Sequential(*list(base.children())[:-1])  # remove FC
+        import torch
+        import torch.nn as nn
+        import torchvision.models as models
+        import torchvision.transforms as T
 
-    def forward(self, x):
-        x = self.feat(x)
-        return x.view(x.size(0), -1)
+        if TORCH_THREADS > 0:
+            torch.set_num_threads(TORCH_THREADS)
 
+        class ResNetEmbed(nn.Module):
+            def __init__(self):
+                super().__init__()
+                base = models.resnet50(pretrained=True)
+                self.feat = nn.Sequential(*list(base.children())[:-1])  # remove FC
 
-# initialize model on load
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-res_model = ResNetEmbed().to(device).eval()
+            def forward(self, x):
+                x = self.feat(x)
+                return x.view(x.size(0), -1)
 
-transform = T.Compose([
-    T.Resize(256),
-    T.CenterCrop(224),
-    T.ToTensor(),
-    T.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-])
+        self.torch = torch
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = ResNetEmbed().to(self.device).eval()
+        self.transform = T.Compose([
+            T.Resize(256),
+            T.CenterCrop(224),
+            T.ToTensor(),
+            T.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+        ])
 
 
-def deep_similarity(path1, path2):
-    img1 = Image.open(path1).convert("RGB")
-    img2 = Image.open(path2).convert("RGB")
+_runtime = None
+_runtime_lock = threading.Lock()
+MODEL_LOAD_SECONDS = None
+
 
-    x1 = transform(img1).unsqueeze(0).to(device)
-    x2 = transform(img2).unsqueeze(0).to(device)
+def get_model():
+    """Load ResNet-50 once per process (thread-safe) and return the runtime"""
+    global _runtime, MODEL_LOAD_SECONDS
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                start = time.perf_counter()
+                _runtime = _ResNetRuntime()
+                MODEL_LOAD_SECONDS = time.perf_counter() - start
+                print(f"[INFO] ResNet-50 loaded in {MODEL_LOAD_SECONDS:.2f}s on {_runtime.device}")
+    return _runtime
 
-    with torch.no_grad():
-        v1 = res_model(x1).cpu().numpy().flatten()
-        v2 = res_model(x2).cpu().numpy().flatten()
 
-    return cosine_sim(v1, v2)
+def is_model_loaded():
+    return _runtime is not None
+
+
+def warm_up():
+    """Optional hook: load the model ahead of the first comparison"""
+    return get_model()
+
+
+# -----------------------------------------
+# Per-image feature cache
+# (ResNet vector + foreground LAB mean/histogram)
+# -----------------------------------------
+FEATURE_CACHE_DIR = os.environ.get(
+    "IMAGE_FEATURE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_feature_cache"),
+)
+FEATURE_MEMORY_LIMIT = 4096
+
+_feature_memory = OrderedDict()  # (filename, file hash) -> features
+_digest_memory = {}              # (path, mtime, size) -> file hash
+_cache_lock = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-1 of the file contents, memoized per (path, mtime, size)"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _digest_memory.get(key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _digest_memory[key] = digest
+    return digest
+
+
+def preprocess_image(path):
+    """
+    Decode one image and do all per-image CPU work except the ResNet pass.
+    Reads the downscaled match variant when one exists, never the full upload.
+    Returns (tensor, colour features); safe to run from a thread pool.
+    """
+    source = match_source(path)
+    img = ImageOps.exif_transpose(Image.open(source)).convert("RGB")
+    x = get_model().transform(img)
+
+    img_bgr = cv2.imread(source)
+    mask = get_mask(img_bgr)
+    color = {
+        "mean_lab": mean_lab(img_bgr, mask).astype(np.float32),
+        "hist_lab": hist_lab(img_bgr, mask).astype(np.float32),
+    }
+    return x, color
+
+
+def compute_features(path):
+    """
+    Run the ResNet forward pass and colour analysis for one image.
+    Raises ValueError when the image cannot be decoded.
+    """
+    features = embed_images([path])[0]
+    if features is None:
+        raise ValueError(f"Could not decode image {path}")
+    return features
+
+
+def embed_images(paths, batch_size=None, decode_threads=None):
+    """
+    Batch-embed images on CPU.
+
+    Decoding, masking and histograms run in a thread pool; the decoded
+    tensors are stacked into batches of `batch_size` images and each batch
+    goes through a single no_grad ResNet forward pass.
+
+    Returns a list aligned with `paths`: a feature dict per image, or None
+    for images that could not be decoded.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    decode_threads = decode_threads or DECODE_THREADS
+    results = [None] * len(paths)
+    runtime = get_model()
+    torch = runtime.torch
+
+    def safe_preprocess(path):
+        try:
+            return preprocess_image(path)
+        except Exception as e:
+            print(f"[WARNING] Could not decode image {path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=decode_threads) as pool:
+        for start in range(0, len(paths), batch_size):
+            chunk = list(range(start, min(start + batch_size, len(paths))))
+            decoded = list(pool.map(safe_preprocess, [paths[i] for i in chunk]))
+
+            ok = [(i, d) for i, d in zip(chunk, decoded) if d is not None]
+            if not ok:
+                continue
+
+            x = torch.stack([d[0] for _, d in ok]).to(runtime.device)
+            with torch.no_grad():
+                deep = runtime.model(x).cpu().numpy().astype(np.float32)
+
+            for row, (i, (_, color)) in enumerate(ok):
+                results[i] = {"deep": deep[row], **color}
+
+    return results
+
+
+def _cache_file(filename, digest):
+    # Features now come from the (upright) s<MATCH_SIZE> variant; the suffix keeps
+    # them apart from entries computed on full-resolution or older variants
+    return os.path.join(FEATURE_CACHE_DIR, f"{filename}.{digest[:16]}.s{MATCH_SIZE}.r{VARIANT_REVISION}.npz")
+
+
+def _remember(key, features):
+    with _cache_lock:
+        _feature_memory[key] = features
+        _feature_memory.move_to_end(key)
+        while len(_feature_memory) > FEATURE_MEMORY_LIMIT:
+            _feature_memory.popitem(last=False)
+
+
+def load_cached_features(path):
+    """
+    Cached features for an image, or None when they have not been computed yet.
+    Looks in memory first, then in the on-disk cache (keyed by filename + file hash).
+    """
+    filename = os.path.basename(path)
+    digest = file_digest(path)
+    key = (filename, digest)
+
+    with _cache_lock:
+        features = _feature_memory.get(key)
+        if features is not None:
+            _feature_memory.move_to_end(key)
+            return features
+
+    cache_path = _cache_file(filename, digest)
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as data:
+                features = {name: data[name] for name in ("deep", "mean_lab", "hist_lab")}
+            _remember(key, features)
+            return features
+        except Exception:
+            pass  # unreadable/corrupt entry - recompute below
+    return None
+
+
+def store_features(path, features):
+    """Persist features for an image in memory and in the on-disk cache"""
+    filename = os.path.basename(path)
+    digest = file_digest(path)
+    _remember((filename, digest), features)
+
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    cache_path = _cache_file(filename, digest)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    np.savez(tmp_path, **features)
+    os.replace(tmp_path, cache_path)
+
+
+def get_features(path):
+    """
+    Features for an image, computed once and then served from the cache.
+    Undecodable images raise ValueError and are not cached, so a fixed
+    upload is picked up on the next call.
+    """
+    features = load_cached_features(path)
+    if features is None:
+        features = compute_features(path)
+        store_features(path, features)
+    return features
+
+
+def warm_feature_cache(paths, batch_size=None, decode_threads=None):
+    """
+    Make sure every image in `paths` has cached features, embedding the
+    missing ones in batches. Returns the number of images newly embedded.
+    """
+    missing = []
+    for path in dict.fromkeys(paths):
+        try:
+            if load_cached_features(path) is None:
+                missing.append(path)
+        except OSError:
+            continue  # file vanished
+
+    embedded = 0
+    step = (batch_size or BATCH_SIZE) * 8  # hand several batches to embed_images at a time
+    for start in range(0, len(missing), step):
+        chunk = missing[start:start + step]
+        for path, features in zip(chunk, embed_images(chunk, batch_size, decode_threads)):
+            if features is not None:
+                store_features(path, features)
+                embedded += 1
+    return embedded
+
+
+def backfill_upload_folder(upload_folder, batch_size=None, decode_threads=None):
+    """Embed every image already in the upload folder that is not cached yet"""
+    exts = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+    paths = [
+        os.path.join(upload_folder, name)
+        for name in sorted(os.listdir(upload_folder))
+        if name.lower().endswith(exts) and os.path.isfile(os.path.join(upload_folder, name))
+    ]
+    return warm_feature_cache(paths, batch_size, decode_threads)
+
+
+def features_similarity(f1, f2, deep_w=0.7, color_w=0.3):
+    """Combined score from two cached feature sets (same weights as image_similarity)"""
+    deep_sim = cosine_sim(f1["deep"], f2["deep"])
+
+    # Equal weights for mean + hist
+    col_sim = 0.4 * cosine_sim(f1["mean_lab"], f2["mean_lab"]) + 0.6 * cosine_sim(f1["hist_lab"], f2["hist_lab"])
+
+    return float(deep_w * deep_sim + color_w * col_sim)
+
+
+def deep_similarity(path1, path2):
+    return cosine_sim(get_features(path1)["deep"], get_features(path2)["deep"])
 
 
 # -----------------------------------------
@@ -127,19 +400,18 @@ def image_similarity(path1, path2):
     Using fixed weights:
         deep = 0.7
         color = 0.3
+    Both images' features come from the per-image cache, so a pair
+    costs two cosine similarities once each image has been seen.
     """
-
-    deep_w = 0.7
-    color_w = 0.3
-
-    # Deep features similarity
-    deep_sim = deep_similarity(path1, path2)
-
-    # Color similarity (foreground LAB)
-    img1 = cv2.imread(path1)
-    img2 = cv2.imread(path2)
-    col_sim = color_similarity(img1, img2)
-
-    # Combined score
-    final_score = deep_w * deep_sim + color_w * col_sim
-    return float(final_score)
+    return features_similarity(get_features(path1), get_features(path2))
+
+
+if __name__ == "__main__":
+    # Backfill the feature cache for existing uploads:
+    #   python image_similarity.py [upload_folder]
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
+    start = time.perf_counter()
+    count = backfill_upload_folder(folder)
+    print(f"Embedded {count} images in {time.perf_counter() - start:.1f}s "
+          f"(batch={BATCH_SIZE}, decode_threads={DECODE_THREADS}, "
+          f"torch_threads={get_model().torch.get_num_threads()}, model_load={MODEL_LOAD_SECONDS or 0:.1f}s)")
@@ -0,0 +1,231 @@
+"""
+Image Variants
+Downscaled copies of item uploads, generated once when the image is saved.
+
+Browse cards ask for /api/uploads/<filename>?w=<width> and get the smallest
+WebP (or JPEG) variant at least that wide instead of the full upload. Variant
+names carry a hash of the original's contents (plus VARIANT_REVISION), so they
+can be cached by the browser forever. Variants are stored upright: the EXIF
+orientation of phone photos is applied before resizing. The matcher decodes the "match" variant (shortest side
+MATCH_SIZE, the ResNet resize target) instead of the full-resolution image.
+
+Variants live in <upload folder>/variants/ and are created lazily for
+uploads that predate this module.
+
+Usage:
+    python image_variants.py [upload_folder]   # generate variants for existing uploads
+"""
+
+import hashlib
+import os
+import sys
+import threading
+
+from PIL import Image, ImageOps, features
+
+VARIANT_WIDTHS = (320, 640, 1280)
+MATCH_SIZE = 256            # image_similarity resizes the shortest side to 256 before cropping
+VARIANT_DIR = 'variants'
+VARIANT_QUALITY = 82
+VARIANT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+VARIANT_REVISION = 2        # bump when the rendering changes so old variants are not served
+
+WEBP_AVAILABLE = features.check('webp')
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+_digests = {}               # (path, mtime, size) -> content hash
+
+
+def content_hash(path):
+    """Short SHA-1 of the file contents, memoized per (path, mtime, size)"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()[:12]
+        _digests[key] = digest
+    return digest
+
+
+def variant_name(filename, digest, label, fmt):
+    """e.g. 'abc_watch.w640.1f2e3d4c5b6a.r2.webp'"""
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}.{label}.{digest}.r{VARIANT_REVISION}.{FORMATS[fmt][1]}"
+
+
+def variant_folder(upload_folder):
+    return os.path.join(upload_folder, VARIANT_DIR)
+
+
+def _open_source(path, max_side=None):
+    """Open an image for downscaling; JPEGs are decoded at reduced scale when possible"""
+    img = Image.open(path)
+    if max_side and img.format == 'JPEG':
+        img.draft('RGB', (max_side, max_side))
+    return img
+
+
+def _flatten(img, fmt):
+    """Convert to a mode the target format can store"""
+    if fmt == 'jpeg' or img.mode not in ('RGB', 'RGBA'):
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        if fmt == 'webp' and has_alpha:
+            return img.convert('RGBA')
+        if has_alpha:
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img.convert('RGBA'), mask=img.convert('RGBA').split()[-1])
+            return background
+        return img.convert('RGB')
+    return img
+
+
+def _save(img, path, fmt):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    img.save(tmp_path, FORMATS[fmt][0], quality=VARIANT_QUALITY, optimize=fmt == 'jpeg', method=4)
+    os.replace(tmp_path, path)
+
+
+def _formats():
+    return ('webp', 'jpeg') if WEBP_AVAILABLE else ('jpeg',)
+
+
+def generate_variants(upload_folder, filename):
+    """
+    Write the width variants (WebP and JPEG) and the match variant for one upload
+
+    Widths wider than the original are skipped (clients get the original instead).
+    Animated images are left alone.
+
+    Args:
+        upload_folder: Folder holding the original upload
+        filename: Upload filename
+
+    Returns:
+        Number of variant files written
+    """
+    path = os.path.join(upload_folder, filename)
+    digest = content_hash(path)
+    out_dir = variant_folder(upload_folder)
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+
+    with _open_source(path, max(VARIANT_WIDTHS)) as source:
+        if getattr(source, 'is_animated', False):
+            return 0
+        img = ImageOps.exif_transpose(source)
+        width, height = img.size
+
+        for target in VARIANT_WIDTHS:
+            if target >= width:
+                break
+            resized = img.resize((target, max(1, round(height * target / width))), Image.Resampling.LANCZOS)
+            for fmt in _formats():
+                out_path = os.path.join(out_dir, variant_name(filename, digest, f'w{target}', fmt))
+                if not os.path.exists(out_path):
+                    _save(_flatten(resized, fmt), out_path, fmt)
+                    written += 1
+
+        if min(width, height) > MATCH_SIZE:
+            out_path = os.path.join(out_dir, variant_name(filename, digest, f's{MATCH_SIZE}', 'jpeg'))
+            if not os.path.exists(out_path):
+                scale = MATCH_SIZE / min(width, height)
+                match = img.resize((round(width * scale), round(height * scale)), Image.Resampling.LANCZOS)
+                _save(_flatten(match, 'jpeg'), out_path, 'jpeg')
+                written += 1
+
+    return written
+
+
+def _ensure_variants(upload_folder, filename):
+    """
+    Generate variants for an upload unless done before (a marker file records it,
+    so images too small for any variant are not re-decoded). Concurrent callers
+    may both generate; writes are atomic, so the result is the same.
+    """
+    digest = content_hash(os.path.join(upload_folder, filename))
+    marker = os.path.join(variant_folder(upload_folder), f"{filename}.{digest}.r{VARIANT_REVISION}.done")
+    if os.path.exists(marker):
+        return
+    try:
+        generate_variants(upload_folder, filename)
+    except Exception as e:
+        print(f"[WARNING] Could not generate variants for {filename}: {e}")
+    os.makedirs(variant_folder(upload_folder), exist_ok=True)
+    with open(marker, 'w'):
+        pass
+
+
+def create_variants(upload_folder, filename):
+    """Upload-time hook: generate variants now and record that they exist"""
+    _ensure_variants(upload_folder, filename)
+
+
+def resolve_variant(upload_folder, filename, width, accept_webp=True):
+    """
+    Smallest variant at least `width` pixels wide
+
+    Args:
+        upload_folder: Folder holding the original upload
+        filename: Upload filename
+        width: Requested display width in pixels
+        accept_webp: Client accepts image/webp
+
+    Returns:
+        Variant filename inside variant_folder(), or None to serve the original
+    """
+    if not filename.lower().endswith(VARIANT_EXTENSIONS):
+        return None
+    path = os.path.join(upload_folder, filename)
+    if not os.path.isfile(path):
+        return None
+
+    _ensure_variants(upload_folder, filename)
+    digest = content_hash(path)
+    fmt = 'webp' if accept_webp and WEBP_AVAILABLE else 'jpeg'
+    for target in VARIANT_WIDTHS:
+        if target < width:
+            continue
+        name = variant_name(filename, digest, f'w{target}', fmt)
+        if os.path.exists(os.path.join(variant_folder(upload_folder), name)):
+            return name
+        # Narrower original than this width: no larger variant exists either
+        return None
+    return None
+
+
+def match_source(path):
+    """
+    Path the matcher should decode for an image: the match variant when the
+    original is larger than the ResNet input needs, else the original
+    """
+    upload_folder, filename = os.path.split(path)
+    try:
+        name = variant_name(filename, content_hash(path), f's{MATCH_SIZE}', 'jpeg')
+        variant_path = os.path.join(variant_folder(upload_folder), name)
+        if not os.path.exists(variant_path):
+            _ensure_variants(upload_folder, filename)
+        if os.path.exists(variant_path):
+            return variant_path
+    except OSError:
+        pass
+    return path
+
+
+def backfill_variants(upload_folder):
+    """Generate variants for every upload in the folder that has none yet"""
+    count = 0
+    for name in sorted(os.listdir(upload_folder)):
+        if name.lower().endswith(VARIANT_EXTENSIONS) and os.path.isfile(os.path.join(upload_folder, name)):
+            _ensure_variants(upload_folder, name)
+            count += 1
+    return count
+
+
+if __name__ == '__main__':
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    count = backfill_variants(folder)
+    print(f"[INFO] Checked variants for {count} uploads in {folder} (webp={'yes' if WEBP_AVAILABLE else 'no'})")
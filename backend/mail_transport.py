@@ -0,0 +1,617 @@
+"""
+Mail Transport
+One outbound mail path for every email sender. Messages are written to the
+email_outbox table and drained by worker threads that share a small pool of
+authenticated SMTP sessions, so a burst of emails costs one connect +
+STARTTLS + login per pooled session instead of one per message.
+
+The outbox is durable: messages survive a restart, failed sends are retried
+with backoff, and rows left 'sending' by a crashed process are picked up
+again (counting as an attempt, so a message that kills its worker ends up
+'failed'). Any process may enqueue; every process that calls start() drains
+and purges old sent and failed rows once an hour.
+metrics() reports throughput, queue depth, SMTP session reuse and latency
+histograms: SMTP send time, and enqueue-to-sent time for high and normal
+priority.
+
+SMTP settings come from email_config.EMAIL_CONFIG, or from the environment
+for a local debugging server:
+    python -m aiosmtpd -n -l localhost:1025      (or smtpd DebuggingServer)
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=0 python comprehensive_app.py
+
+Usage:
+    python mail_transport.py                     # outbox status
+    python mail_transport.py --bench N to@addr   # send N test messages, report throughput
+"""
+
+import bisect
+import calendar
+import os
+import smtplib
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traceback_100k.db')
+
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '3'))
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', '10'))
+SMTP_IDLE_SECONDS = 120            # servers drop idle sessions; reconnect instead of reusing a stale one
+SMTP_MESSAGES_PER_SESSION = 100    # Gmail limits messages per connection
+MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS', str(SMTP_POOL_SIZE)))
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_SECONDS = 30            # doubled after every failed attempt
+MAIL_POLL_SECONDS = 5              # picks up rows enqueued by other processes
+MAIL_CLAIM_BATCH = 10
+MAIL_SENDING_TIMEOUT = 600         # 'sending' rows older than this belonged to a dead worker
+MAIL_RETENTION_DAYS = 7
+MAIL_FAILED_RETENTION_DAYS = 30    # failed rows are kept longer for debugging
+MAIL_PURGE_SECONDS = 3600
+THROUGHPUT_WINDOW = 60
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)   # seconds
+LATENCY_SAMPLES = 1000             # recent observations kept for percentiles
+
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 10                 # verification codes go ahead of bulk notifications
+
+# Errors after which the session is discarded and the message retried on a new one
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def load_smtp_config():
+    """
+    SMTP settings, loaded once per process
+
+    Returns:
+        Dictionary with host, port, starttls, user, password, sender, from_name;
+        None when no configuration is available (sending disabled)
+    """
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                if os.environ.get('SMTP_HOST'):
+                    _config = {
+                        'host': os.environ['SMTP_HOST'],
+                        'port': int(os.environ.get('SMTP_PORT', '25')),
+                        'starttls': os.environ.get('SMTP_STARTTLS', '1') == '1',
+                        'user': os.environ.get('SMTP_USER') or None,
+                        'password': os.environ.get('SMTP_PASSWORD') or None,
+                        'sender': os.environ.get('SMTP_FROM', 'traceback@localhost'),
+                        'from_name': os.environ.get('SMTP_FROM_NAME', 'TraceBack'),
+                    }
+                else:
+                    try:
+                        from email_config import EMAIL_CONFIG
+                    except ImportError:
+                        print("⚠️  email_config.py not found! Outgoing email disabled.")
+                        _config = {}
+                    else:
+                        _config = {
+                            'host': EMAIL_CONFIG['smtp_server'],
+                            'port': EMAIL_CONFIG['smtp_port'],
+                            'starttls': True,
+                            'user': EMAIL_CONFIG['email'],
+                            'password': EMAIL_CONFIG['password'],
+                            'sender': EMAIL_CONFIG['email'],
+                            'from_name': EMAIL_CONFIG['from_name'],
+                        }
+    return _config or None
+
+
+def build_message(config, to_email, subject, html_body):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{config['from_name']} <{config['sender']}>"
+    msg['To'] = to_email
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg.as_string()
+
+
+class SMTPPool:
+    """Authenticated SMTP sessions reused across messages, at most `size` at a time"""
+
+    def __init__(self, config, size=SMTP_POOL_SIZE):
+        """
+        Args:
+            config: Dictionary from load_smtp_config()
+            size: Maximum number of open sessions
+        """
+        self.config = config
+        self.size = size
+        self._idle = []                       # [(smtp, last_used, messages_sent)]
+        self._slots = threading.Semaphore(size)
+        self._lock = threading.Lock()
+        self.stats = {'connects': 0, 'reconnects': 0, 'reused': 0, 'sent': 0}
+
+    def _connect(self):
+        server = smtplib.SMTP(self.config['host'], self.config['port'], timeout=SMTP_TIMEOUT)
+        if self.config['starttls']:
+            server.starttls()
+        if self.config['password']:
+            server.login(self.config['user'], self.config['password'])
+        with self._lock:
+            self.stats['connects'] += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _acquire(self):
+        """A usable session (reused when fresh enough) and its message count"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used, sent = self._idle.pop()
+                if time.monotonic() - last_used < SMTP_IDLE_SECONDS and sent < SMTP_MESSAGES_PER_SESSION:
+                    self.stats['reused'] += 1
+                    return server, sent
+            self._close(server)
+        return self._connect(), 0
+
+    def _release(self, server, sent):
+        with self._lock:
+            self._idle.append((server, time.monotonic(), sent))
+
+    def send(self, to_email, message):
+        """
+        Send one message, reconnecting once when the pooled session turns out to be dead
+
+        Raises:
+            smtplib.SMTPException / OSError: The send failed (the caller decides on retries)
+        """
+        with self._slots:
+            server, sent = self._acquire()
+            try:
+                try:
+                    server.sendmail(self.config['sender'], [to_email], message)
+                except CONNECTION_ERRORS:
+                    self._close(server)
+                    with self._lock:
+                        self.stats['reconnects'] += 1
+                    server, sent = self._connect(), 0
+                    server.sendmail(self.config['sender'], [to_email], message)
+            except smtplib.SMTPRecipientsRefused:
+                # The session itself is fine
+                self._release(server, sent)
+                raise
+            except Exception:
+                self._close(server)
+                raise
+            self._release(server, sent + 1)
+            with self._lock:
+                self.stats['sent'] += 1
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _, _ in idle:
+            self._close(server)
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, idle_sessions=len(self._idle), size=self.size)
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus percentiles over the most recent observations"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, samples=LATENCY_SAMPLES):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._recent = deque(maxlen=samples)
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        seconds = max(0.0, seconds)
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._total += seconds
+            self._recent.append(seconds)
+
+    def snapshot(self):
+        """
+        Returns:
+            Dictionary with count, mean, p50/p95/p99/max of recent observations
+            and the number of observations per bucket ('<=1': n, ..., '+Inf': n)
+        """
+        with self._lock:
+            counts = list(self._counts)
+            recent = sorted(self._recent)
+            total = self._total
+        count = sum(counts)
+        labels = [f'<={bound:g}' for bound in self.buckets] + ['+Inf']
+
+        def percentile(q):
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))], 4) if recent else None
+
+        return {
+            'count': count,
+            'mean': round(total / count, 4) if count else None,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': round(recent[-1], 4) if recent else None,
+            'buckets': dict(zip(labels, counts)),
+        }
+
+
+class Outbox:
+    """Durable email_outbox table drained by worker threads through an SMTPPool"""
+
+    def __init__(self, db_path=DB_PATH, workers=MAIL_WORKERS):
+        """
+        Args:
+            db_path: Path to the SQLite database holding email_outbox
+            workers: Number of sending threads
+        """
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.pool = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sent_times = deque()          # monotonic times of recent sends (throughput)
+        self._purge_due = 0                 # monotonic time of the next purge()
+        self.stats = {'enqueued': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        self.smtp_latency = LatencyHistogram()  # pool.send() duration
+        self.delivery_latency = {'high': LatencyHistogram(), 'normal': LatencyHistogram()}  # enqueue -> sent
+        self.init_outbox_table()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+
+    def init_outbox_table(self):
+        """Create the outbox table if it doesn't exist"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS email_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    to_email TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    html_body TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    claimed_at REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    sent_at TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_email_outbox_status_priority
+                ON email_outbox(status, priority DESC, id)
+            ''')
+        finally:
+            conn.close()
+
+    def enqueue(self, to_email, subject, html_body, priority=PRIORITY_NORMAL, conn=None):
+        """
+        Queue one message
+
+        Args:
+            to_email: Recipient address
+            subject: Subject line
+            html_body: HTML body
+            priority: PRIORITY_HIGH messages are sent before PRIORITY_NORMAL ones
+            conn: Optional open connection, so the message commits with the caller's transaction
+
+        Returns:
+            Outbox row id
+        """
+        own = conn is None
+        if own:
+            conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO email_outbox (to_email, subject, html_body, priority) VALUES (?, ?, ?, ?)',
+                (to_email, subject, html_body, priority)
+            )
+            message_id = cursor.lastrowid
+        finally:
+            if own:
+                conn.close()
+        with self._lock:
+            self.stats['enqueued'] += 1
+        self._wake.set()
+        return message_id
+
+    def enqueue_many(self, messages, conn, priority=PRIORITY_NORMAL):
+        """
+        Queue a batch of messages inside the caller's transaction (no commit here)
+
+        Args:
+            messages: Iterable of (to_email, subject, html_body)
+            conn: Open connection; the rows become visible when the caller commits
+            priority: Priority for every message in the batch
+
+        Returns:
+            Number of messages queued
+        """
+        rows = [(to_email, subject, html_body, priority) for to_email, subject, html_body in messages]
+        conn.executemany(
+            'INSERT INTO email_outbox (to_email, subject, html_body, priority) VALUES (?, ?, ?, ?)', rows
+        )
+        with self._lock:
+            self.stats['enqueued'] += len(rows)
+        return len(rows)
+
+    def wake(self):
+        """Tell idle workers that new rows were committed"""
+        self._wake.set()
+
+    def start(self):
+        """Start the sending threads (idempotent); returns False when email is not configured"""
+        config = load_smtp_config()
+        if config is None:
+            return False
+        with self._lock:
+            if self._threads:
+                return True
+            self.pool = SMTPPool(config, min(SMTP_POOL_SIZE, self.workers))
+            for i in range(self.workers):
+                worker = threading.Thread(target=self._worker, name=f'mail-worker-{i}', daemon=True)
+                worker.start()
+                self._threads.append(worker)
+        print(f"[INFO] Mail outbox started with {self.workers} worker(s), {self.pool.size} SMTP session(s)")
+        return True
+
+    def _claim(self, conn):
+        """
+        Mark up to MAIL_CLAIM_BATCH due rows as 'sending' and return them
+
+        A stale 'sending' row is one whose worker died mid-send; reclaiming it
+        counts as an attempt, and at MAIL_MAX_ATTEMPTS it is marked 'failed'
+        instead of being sent again.
+        """
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute('''
+                SELECT id, to_email, subject, html_body, attempts, priority, created_at, status FROM email_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_at < ?)
+                ORDER BY priority DESC, id
+                LIMIT ?
+            ''', (now, now - MAIL_SENDING_TIMEOUT, MAIL_CLAIM_BATCH)).fetchall()
+            claimed, abandoned = [], []
+            for *row, status in rows:
+                if status == 'sending':
+                    row[4] += 1
+                    if row[4] >= MAIL_MAX_ATTEMPTS:
+                        abandoned.append((row[4], row[0]))
+                        continue
+                claimed.append(row)
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sending', claimed_at = ?, attempts = ? WHERE id = ?",
+                [(now, row[4], row[0]) for row in claimed]
+            )
+            conn.executemany('''
+                UPDATE email_outbox SET status = 'failed', attempts = ?,
+                       last_error = 'Worker stopped while sending (too many attempts)'
+                WHERE id = ?
+            ''', abandoned)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if abandoned:
+            with self._lock:
+                self.stats['failed'] += len(abandoned)
+            print(f"[WARNING] Gave up on {len(abandoned)} email(s) whose worker stopped mid-send")
+        return [tuple(row) for row in claimed]
+
+    def _worker(self):
+        conn = self._connect()
+        while True:
+            try:
+                self._maybe_purge()
+                rows = self._claim(conn)
+                if len(rows) == MAIL_CLAIM_BATCH:
+                    self._wake.set()  # more may be waiting; let idle workers claim too
+                for row in rows:
+                    self._deliver(conn, *row)
+            except sqlite3.Error as e:
+                # Claimed rows stay 'sending' and are retried after MAIL_SENDING_TIMEOUT
+                print(f"[WARNING] Mail outbox worker error: {e}")
+                rows = []
+            if not rows:
+                self._wake.wait(MAIL_POLL_SECONDS)
+                self._wake.clear()
+
+    def _deliver(self, conn, message_id, to_email, subject, html_body, attempts, priority, created_at):
+        started = time.perf_counter()
+        try:
+            self.pool.send(to_email, build_message(self.pool.config, to_email, subject, html_body))
+        except Exception as e:
+            attempts += 1
+            permanent = isinstance(e, smtplib.SMTPRecipientsRefused) or attempts >= MAIL_MAX_ATTEMPTS
+            conn.execute('''
+                UPDATE email_outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?
+                WHERE id = ?
+            ''', ('failed' if permanent else 'pending', attempts, str(e)[:500],
+                  time.time() + MAIL_RETRY_SECONDS * 2 ** (attempts - 1), message_id))
+            with self._lock:
+                self.stats['failed' if permanent else 'retried'] += 1
+            print(f"❌ Failed to send email to {to_email} (attempt {attempts}): {e}")
+            return
+
+        conn.execute('''
+            UPDATE email_outbox SET status = 'sent', attempts = ?, sent_at = CURRENT_TIMESTAMP, last_error = NULL
+            WHERE id = ?
+        ''', (attempts + 1, message_id))
+        with self._lock:
+            self.stats['sent'] += 1
+            self._sent_times.append(time.monotonic())
+        self.smtp_latency.observe(time.perf_counter() - started)
+        self._observe_delivery(priority, created_at)
+        print(f"✅ Sent email to {to_email}: {subject}")
+
+    def _observe_delivery(self, priority, created_at):
+        """Record enqueue-to-sent time (created_at is CURRENT_TIMESTAMP: UTC, whole seconds)"""
+        try:
+            enqueued = calendar.timegm(time.strptime(created_at, '%Y-%m-%d %H:%M:%S'))
+        except (TypeError, ValueError):
+            return
+        label = 'high' if priority >= PRIORITY_HIGH else 'normal'
+        self.delivery_latency[label].observe(time.time() - enqueued)
+
+    def _maybe_purge(self):
+        """purge() at most once per MAIL_PURGE_SECONDS, from whichever worker gets here first"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._purge_due:
+                return
+            self._purge_due = now + MAIL_PURGE_SECONDS
+        self.purge()
+
+    def purge(self, days=MAIL_RETENTION_DAYS, failed_days=MAIL_FAILED_RETENTION_DAYS):
+        """Delete sent messages older than `days` and failed ones older than `failed_days`"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < datetime('now', ?)",
+                (f'-{int(days)} days',)
+            )
+            conn.execute(
+                "DELETE FROM email_outbox WHERE status = 'failed' AND created_at < datetime('now', ?)",
+                (f'-{int(failed_days)} days',)
+            )
+        finally:
+            conn.close()
+
+    def depth(self):
+        """Counts of queued messages by status"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT status, COUNT(*) FROM email_outbox
+                WHERE status IN ('pending', 'sending', 'failed') GROUP BY status
+            ''').fetchall()
+        finally:
+            conn.close()
+        depth = {'pending': 0, 'sending': 0, 'failed': 0}
+        depth.update(dict(rows))
+        return depth
+
+    def backlog(self, min_priority=PRIORITY_NORMAL):
+        """Number of pending messages at or above a priority (uses the status/priority index)"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM email_outbox WHERE status = 'pending' AND priority >= ?",
+                (min_priority,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def flush(self, timeout=60):
+        """Wait until no message is pending or sending (e.g. before a script exits)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            depth = self.depth()
+            if not depth['pending'] and not depth['sending']:
+                return True
+            self._wake.set()
+            time.sleep(0.1)
+        return False
+
+    def throughput(self):
+        """Messages per second sent by this process over the last THROUGHPUT_WINDOW seconds"""
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW
+        with self._lock:
+            while self._sent_times and self._sent_times[0] < cutoff:
+                self._sent_times.popleft()
+            return round(len(self._sent_times) / THROUGHPUT_WINDOW, 3)
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['workers'] = len(self._threads)
+        metrics['messages_per_second'] = self.throughput()
+        metrics['queue'] = self.depth()
+        metrics['smtp'] = self.pool.metrics() if self.pool is not None else None
+        metrics['latency'] = {
+            'smtp_send_seconds': self.smtp_latency.snapshot(),
+            'delivery_seconds': {label: histogram.snapshot() for label, histogram in self.delivery_latency.items()},
+        }
+        return metrics
+
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox(db_path=DB_PATH):
+    """Shared Outbox for a database (one per process)"""
+    key = os.path.abspath(db_path)
+    outbox = _outboxes.get(key)
+    if outbox is None:
+        with _outboxes_lock:
+            outbox = _outboxes.get(key)
+            if outbox is None:
+                outbox = _outboxes[key] = Outbox(db_path)
+    return outbox
+
+
+def queue_email(to_email, subject, html_body, priority=PRIORITY_NORMAL, db_path=DB_PATH, conn=None):
+    """
+    Queue an email for delivery and make sure this process is draining the outbox
+
+    Args:
+        conn: Optional open connection. Callers in the middle of a write transaction
+              must pass it: a second connection would wait on their own lock.
+
+    Returns:
+        True when the message was queued, False when email is not configured
+    """
+    try:
+        outbox = get_outbox(db_path)
+        if not outbox.start():
+            print(f"📧 [DISABLED] Would send email to {to_email}: {subject}")
+            return False
+        outbox.enqueue(to_email, subject, html_body, priority, conn=conn)
+        return True
+    except Exception as e:
+        print(f"❌ Failed to queue email to {to_email}: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    db_path = os.environ.get('TRACEBACK_DB', DB_PATH)
+    outbox = get_outbox(db_path)
+
+    if len(sys.argv) >= 4 and sys.argv[1] == '--bench':
+        count, to_email = int(sys.argv[2]), sys.argv[3]
+        if not outbox.start():
+            sys.exit(1)
+        started = time.perf_counter()
+        for i in range(count):
+            outbox.enqueue(to_email, f"TraceBack mail transport test {i + 1}/{count}", f"<p>Test message {i + 1}</p>")
+        outbox.flush(timeout=max(60, count))
+        elapsed = time.perf_counter() - started
+        print(f"Sent {outbox.stats['sent']}/{count} in {elapsed:.2f}s ({outbox.stats['sent'] / elapsed:.1f} msg/s)")
+        print(f"SMTP: {outbox.pool.metrics()}")
+        print(f"Send latency: {outbox.smtp_latency.snapshot()}")
+    else:
+        print(f"Queue: {outbox.depth()}")
@@ -0,0 +1,194 @@
+"""
+ML Match Change Log
+Records which lost/found items were created, edited or deleted (via SQLite triggers) so the
+hourly matcher only rescores new arrivals instead of the whole database
+"""
+
+from datetime import datetime, timedelta
+
+# Columns that feed the match score; editing any of them requeues the item
+TRACKED_COLUMNS = {
+    'lost': ('lost_items', ['title', 'description', 'category_id', 'location_id', 'color', 'date_lost', 'image_filename']),
+    'found': ('found_items', ['title', 'description', 'category_id', 'location_id', 'color', 'date_found', 'image_filename', 'status']),
+}
+
+
+def init_change_log(conn):
+    """
+    Create the change log, per-consumer watermarks and the capture triggers
+
+    Args:
+        conn: Open SQLite connection (committed by this function)
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ml_match_changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_type TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ml_match_watermarks (
+            consumer TEXT PRIMARY KEY,
+            last_change_id INTEGER NOT NULL DEFAULT 0,
+            last_full_rebuild TIMESTAMP
+        )
+    ''')
+
+    for item_type, (table, columns) in TRACKED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if not existing:
+            continue  # table not created yet
+        watched = ', '.join(col for col in columns if col in existing)
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_ml_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO ml_match_changes (item_type, item_id) VALUES ('{item_type}', NEW.rowid);
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_ml_update
+            AFTER UPDATE OF {watched} ON {table}
+            BEGIN
+                INSERT INTO ml_match_changes (item_type, item_id) VALUES ('{item_type}', NEW.rowid);
+            END
+        ''')
+        # Deletes are logged too, so in-memory candidate sets can drop the item
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_ml_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO ml_match_changes (item_type, item_id) VALUES ('{item_type}', OLD.rowid);
+            END
+        ''')
+
+    conn.commit()
+
+
+def pending_changes(conn, consumer):
+    """
+    Items changed since the consumer's watermark
+
+    Args:
+        conn: Open SQLite connection
+        consumer: Name of the process consuming the log (each has its own watermark)
+
+    Returns:
+        Tuple of (max_change_id, lost_ids, found_ids); max_change_id is None when
+        there is nothing new
+    """
+    row = conn.execute(
+        'SELECT last_change_id FROM ml_match_watermarks WHERE consumer = ?', (consumer,)
+    ).fetchone()
+    last_change_id = row[0] if row else 0
+
+    rows = conn.execute('''
+        SELECT item_type, item_id, MAX(change_id)
+        FROM ml_match_changes
+        WHERE change_id > ?
+        GROUP BY item_type, item_id
+    ''', (last_change_id,)).fetchall()
+
+    if not rows:
+        return None, [], []
+
+    max_change_id = max(r[2] for r in rows)
+    lost_ids = sorted(r[1] for r in rows if r[0] == 'lost')
+    found_ids = sorted(r[1] for r in rows if r[0] == 'found')
+    return max_change_id, lost_ids, found_ids
+
+
+def log_position(conn):
+    """
+    Highest change id ever issued, including rows already trimmed (None without a log)
+    """
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ml_match_changes'"
+    ).fetchone():
+        return None
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ml_match_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def changes_since(conn, change_id):
+    """
+    Items changed after change_id, for in-memory readers that keep no watermark row
+
+    Args:
+        conn: Open SQLite connection
+        change_id: Highest change id the reader has already applied
+
+    Returns:
+        Tuple of (latest change id, {'lost': ids, 'found': ids}), or None when the
+        log cannot tell (no log yet, or rows after change_id were already trimmed)
+    """
+    latest = log_position(conn)
+    if latest is None or latest < change_id:
+        return None
+    # AUTOINCREMENT ids have no gaps (a rolled-back insert also rolls back
+    # sqlite_sequence), so a missing id means mark_consumed() trimmed it
+    rows = conn.execute(
+        'SELECT item_type, item_id FROM ml_match_changes WHERE change_id > ? AND change_id <= ?',
+        (change_id, latest)
+    ).fetchall()
+    if len(rows) != latest - change_id:
+        return None
+
+    changed = {'lost': set(), 'found': set()}
+    for item_type, item_id in rows:
+        changed.setdefault(item_type, set()).add(item_id)
+    return latest, changed
+
+
+def latest_change_id(conn):
+    """Highest change id recorded so far (0 when the log is empty)"""
+    return conn.execute('SELECT COALESCE(MAX(change_id), 0) FROM ml_match_changes').fetchone()[0]
+
+
+def needs_full_rebuild(conn, consumer, max_age_hours=None):
+    """
+    Whether the consumer has never done a full rebuild, or its last one is too old
+
+    Args:
+        conn: Open SQLite connection
+        consumer: Consumer name
+        max_age_hours: Rebuild again after this many hours (None = only the first time)
+    """
+    row = conn.execute(
+        'SELECT last_full_rebuild FROM ml_match_watermarks WHERE consumer = ?', (consumer,)
+    ).fetchone()
+    if not row or not row[0]:
+        return True
+    if max_age_hours is None:
+        return False
+    last = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+    return datetime.now() - last >= timedelta(hours=max_age_hours)
+
+
+def mark_consumed(conn, consumer, change_id, full_rebuild=False):
+    """
+    Advance the consumer's watermark and drop log rows every consumer has seen
+
+    Args:
+        conn: Open SQLite connection (committed by this function)
+        consumer: Consumer name
+        change_id: Highest change id that was processed
+        full_rebuild: Record this run as a full rebuild
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.execute('''
+        INSERT INTO ml_match_watermarks (consumer, last_change_id, last_full_rebuild)
+        VALUES (?, ?, ?)
+        ON CONFLICT(consumer) DO UPDATE SET
+            last_change_id = MAX(last_change_id, excluded.last_change_id),
+            last_full_rebuild = COALESCE(excluded.last_full_rebuild, last_full_rebuild)
+    ''', (consumer, change_id or 0, now if full_rebuild else None))
+
+    conn.execute('''
+        DELETE FROM ml_match_changes
+        WHERE change_id <= (SELECT MIN(last_change_id) FROM ml_match_watermarks)
+    ''')
+    conn.commit()
@@ -0,0 +1,622 @@
+"""
+Vectorized Matching Engine
+Scores one lost/found item against every candidate of the other type with NumPy
+array operations instead of a per-pair Python loop
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from match_changes import changes_since, log_position
+
+# Base weights for each field (same model as MLMatchingService.calculate_match_score)
+DESC_WEIGHT = 35
+IMG_WEIGHT = 35
+LOC_WEIGHT = 13
+CAT_WEIGHT = 7
+COLOR_WEIGHT = 5
+DATE_WEIGHT = 5
+DATE_WINDOW_DAYS = 14
+
+WEIGHTS_WITH_IMAGE = DESC_WEIGHT + IMG_WEIGHT + LOC_WEIGHT + CAT_WEIGHT + COLOR_WEIGHT + DATE_WEIGHT
+WEIGHTS_WITHOUT_IMAGE = DESC_WEIGHT + LOC_WEIGHT + CAT_WEIGHT + COLOR_WEIGHT + DATE_WEIGHT
+
+CANDIDATE_QUERIES = {
+    # Candidates for a lost item query (found items that are not claimed)
+    'found': """
+        SELECT f.rowid as id, f.*, c.name as category, loc.name as location
+        FROM found_items f
+        LEFT JOIN categories c ON f.category_id = c.id
+        LEFT JOIN locations loc ON f.location_id = loc.id
+        WHERE f.status != 'CLAIMED'
+    """,
+    # Candidates for a found item query (all lost items)
+    'lost': """
+        SELECT l.rowid as id, l.*, c.name as category, loc.name as location
+        FROM lost_items l
+        LEFT JOIN categories c ON l.category_id = c.id
+        LEFT JOIN locations loc ON l.location_id = loc.id
+        WHERE 1 = 1
+    """,
+}
+
+# Appended to CANDIDATE_QUERIES to reload only some rows
+CANDIDATE_ID_FILTERS = {'found': ' AND f.rowid IN ({})', 'lost': ' AND l.rowid IN ({})'}
+
+DATE_FIELDS = {'lost': 'date_lost', 'found': 'date_found'}
+
+# Tile edge for the all-pairs matcher (tile = BLOCK_SIZE lost x BLOCK_SIZE found)
+BLOCK_SIZE = 1024
+
+# ANN candidate retrieval: used once a candidate set has ANN_MIN_ITEMS items, and
+# only when min_score makes a minimum description similarity necessary
+ANN_ENABLED = os.environ.get('ANN_ENABLED', '1') != '0'
+ANN_MIN_ITEMS = int(os.environ.get('ANN_MIN_ITEMS', '5000'))
+ANN_CANDIDATES = int(os.environ.get('ANN_CANDIDATES', '2048'))
+
+
+def parse_day_ordinal(value):
+    """
+    Convert a date value to a day ordinal the way date_similarity_linear parses it
+
+    Returns:
+        Day ordinal as float, or NaN when the value is missing or unparseable
+    """
+    if not value:
+        return np.nan
+    try:
+        if isinstance(value, str):
+            value = datetime.strptime(value.split()[0], '%Y-%m-%d')
+        return float(value.toordinal())
+    except Exception:
+        return np.nan
+
+
+class FeatureVocabulary:
+    """Maps normalized categorical strings (category, location, color) to integer codes"""
+
+    def __init__(self):
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        """Integer code for a value, -1 when missing (matches the binary similarity rules)"""
+        if not value:
+            return -1
+        key = str(value).strip().lower()
+        code = self._codes.get(key)
+        if code is None:
+            with self._lock:
+                code = self._codes.setdefault(key, len(self._codes))
+        return code
+
+
+class ItemFeatureMatrix:
+    """Column-oriented feature arrays for a set of lost or found items"""
+
+    def __init__(self, item_type, rows, embeddings, vocab, dim):
+        """
+        Args:
+            item_type: 'lost' or 'found'
+            rows: sqlite3.Row results (kept to build response dictionaries)
+            embeddings: Dictionary of item_id -> normalized vector (or None)
+            vocab: Shared FeatureVocabulary
+            dim: Embedding dimension
+        """
+        self.item_type = item_type
+        self.rows = rows
+        n = len(rows)
+        date_field = DATE_FIELDS[item_type]
+
+        self.ids = np.empty(n, dtype=np.int64)
+        self.embeddings = np.zeros((n, dim), dtype=np.float32)
+        self.category = np.empty(n, dtype=np.int32)
+        self.location = np.empty(n, dtype=np.int32)
+        self.color = np.empty(n, dtype=np.int32)
+        self.day = np.empty(n, dtype=np.float64)
+        self.has_image = np.zeros(n, dtype=bool)
+        self.images = []
+
+        for i, row in enumerate(rows):
+            item_id = row['id']
+            self.ids[i] = item_id
+            vector = embeddings.get(item_id)
+            if vector is not None:
+                self.embeddings[i] = vector
+            self.category[i] = vocab.code(row['category'])
+            self.location[i] = vocab.code(row['location'])
+            self.color[i] = vocab.code(_row_get(row, 'color'))
+            self.day[i] = parse_day_ordinal(_row_get(row, date_field))
+            image = _row_get(row, 'image_filename') or ''
+            self.images.append(image)
+            self.has_image[i] = bool(image)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def merge(self, keep_positions, other):
+        """
+        Rows at keep_positions plus every row of `other`, in id order like a fresh load
+
+        Args:
+            keep_positions: Row positions of this matrix to keep
+            other: ItemFeatureMatrix of new or edited rows
+
+        Returns:
+            New ItemFeatureMatrix
+        """
+        kept = self.take(keep_positions)
+        merged = ItemFeatureMatrix.__new__(ItemFeatureMatrix)
+        merged.item_type = self.item_type
+        merged.rows = kept.rows + other.rows
+        for name in ('ids', 'embeddings', 'category', 'location', 'color', 'day', 'has_image'):
+            setattr(merged, name, np.concatenate([getattr(kept, name), getattr(other, name)]))
+        merged.images = kept.images + other.images
+        return merged.take(np.argsort(merged.ids, kind='stable'))
+
+    def take(self, positions):
+        """
+        Sub-matrix holding only the given row positions (kept in ascending order)
+
+        Args:
+            positions: Sorted array of row positions
+
+        Returns:
+            ItemFeatureMatrix view over those rows
+        """
+        sub = ItemFeatureMatrix.__new__(ItemFeatureMatrix)
+        sub.item_type = self.item_type
+        sub.rows = [self.rows[i] for i in positions]
+        sub.ids = self.ids[positions]
+        sub.embeddings = self.embeddings[positions]
+        sub.category = self.category[positions]
+        sub.location = self.location[positions]
+        sub.color = self.color[positions]
+        sub.day = self.day[positions]
+        sub.has_image = self.has_image[positions]
+        sub.images = [self.images[i] for i in positions]
+        return sub
+
+
+def _row_get(row, key):
+    """sqlite3.Row / dict lookup that tolerates missing columns"""
+    try:
+        return row[key]
+    except (IndexError, KeyError):
+        return None
+
+
+class VectorizedMatcher:
+    def __init__(self, ml_service, use_ann=ANN_ENABLED, ann_min_items=ANN_MIN_ITEMS):
+        """
+        Initialize vectorized engine on top of an MLMatchingService
+
+        Args:
+            ml_service: MLMatchingService providing the embedding store and image similarity
+            use_ann: Shortlist candidates with an IVF index over description embeddings
+            ann_min_items: Smallest candidate set worth indexing
+        """
+        self.ml_service = ml_service
+        self.vocab = FeatureVocabulary()
+        self.use_ann = use_ann
+        self.ann_min_items = ann_min_items
+        self._matrices = {}
+        self._indexes = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+        # Long-lived connection only used to read PRAGMA data_version, which
+        # changes whenever another connection commits to the database
+        self._version_conn = sqlite3.connect(ml_service.db_path, check_same_thread=False)
+
+    def _data_version(self):
+        with self._lock:
+            return self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def candidates(self, item_type):
+        """
+        Get the candidate feature matrix for an item type
+
+        After the database changed, only the items listed in the ml_match_changes
+        log since the last load are re-read; the whole set is loaded the first
+        time, or when the log cannot say what changed.
+
+        Args:
+            item_type: 'lost' or 'found'
+
+        Returns:
+            ItemFeatureMatrix
+        """
+        version = self._data_version()
+        cached = self._matrices.get(item_type)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        conn = self.ml_service.get_db_connection()
+        try:
+            changes = changes_since(conn, cached[2]) if cached is not None and cached[2] is not None else None
+            if changes is not None:
+                change_id, changed = changes
+                matrix = self._apply_changes(conn, cached[1], changed.get(item_type, set()))
+            else:
+                change_id = log_position(conn)
+                rows = conn.execute(CANDIDATE_QUERIES[item_type]).fetchall()
+                matrix = self._build_matrix(item_type, rows)
+        finally:
+            conn.close()
+
+        # Stamp with the version read before loading: a commit made during the load
+        # (including the embedding store's own writes) triggers one more, cheap,
+        # change-log check on the next call instead of being missed
+        self._matrices[item_type] = (version, matrix, change_id)
+        if self.use_ann and len(matrix) >= self.ann_min_items:
+            self._sync_index(item_type, matrix)
+        return matrix
+
+    def _build_matrix(self, item_type, rows):
+        embeddings = self.ml_service.embedding_store.get_many(
+            item_type, [(row['id'], _row_get(row, 'description')) for row in rows]
+        )
+        return ItemFeatureMatrix(item_type, rows, embeddings, self.vocab, self._embedding_dim(embeddings))
+
+    def _apply_changes(self, conn, matrix, changed_ids):
+        """
+        Replace the rows of changed items (dropping deleted or no longer eligible ones)
+
+        Args:
+            conn: Open connection
+            matrix: Current ItemFeatureMatrix
+            changed_ids: Ids created, edited or deleted since the matrix was loaded
+
+        Returns:
+            Updated ItemFeatureMatrix (the same object when nothing changed)
+        """
+        if not changed_ids:
+            return matrix
+        item_type = matrix.item_type
+        ids = sorted(changed_ids)
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            query = CANDIDATE_QUERIES[item_type] + CANDIDATE_ID_FILTERS[item_type].format(','.join('?' * len(chunk)))
+            rows.extend(conn.execute(query, chunk).fetchall())
+
+        keep = np.flatnonzero(~np.isin(matrix.ids, np.array(ids, dtype=np.int64)))
+        return matrix.merge(keep, self._build_matrix(item_type, rows))
+
+    def index(self, item_type):
+        """ANN index for an item type (None until the candidate set is large enough)"""
+        return self._indexes.get(item_type)
+
+    def _sync_index(self, item_type, matrix):
+        """Apply inserts/deletes/edits since the last snapshot to the item type's ANN index"""
+        from ann_index import IVFIndex
+
+        with self._index_lock:
+            index = self._indexes.get(item_type)
+            if index is None:
+                index = IVFIndex(matrix.embeddings.shape[1])
+                self._indexes[item_type] = index
+            added, removed, updated = index.sync(matrix.ids, matrix.embeddings)
+            self._positions[item_type] = (matrix, {item_id: i for i, item_id in enumerate(matrix.ids.tolist())})
+        if added or removed or updated:
+            print(f"[INFO] ANN index ({item_type}): +{added} -{removed} ~{updated} ({len(index)} items)")
+
+    def _shortlist(self, query_type, query_item, matrix, min_score):
+        """
+        Row positions of the ANN text candidates for a query, or None to scan everything
+
+        Only used when min_score is unreachable below some description similarity
+        (the other fields cannot make up the difference), so text retrieval is a sound filter
+        """
+        candidate_type = matrix.item_type
+        index = self._indexes.get(candidate_type)
+        snapshot = self._positions.get(candidate_type)
+        if index is None or snapshot is None or snapshot[0] is not matrix:
+            return None
+
+        if query_item.get('image_filename') and matrix.has_image.any():
+            other_max = WEIGHTS_WITH_IMAGE - DESC_WEIGHT
+            desc_floor = (min_score * WEIGHTS_WITH_IMAGE - other_max) / DESC_WEIGHT
+        else:
+            other_max = WEIGHTS_WITHOUT_IMAGE - DESC_WEIGHT
+            desc_floor = (min_score * WEIGHTS_WITHOUT_IMAGE - other_max) / DESC_WEIGHT
+        if desc_floor <= 0:
+            return None
+
+        query_vec = self.ml_service.item_embedding(query_type, query_item)
+        if query_vec is None:
+            return np.zeros(0, dtype=np.int64)
+
+        ids, _ = index.search(query_vec, ANN_CANDIDATES, min_score=desc_floor - 1e-3)
+        positions_by_id = snapshot[1]
+        positions = [positions_by_id[item_id] for item_id in ids.tolist() if item_id in positions_by_id]
+        return np.array(sorted(positions), dtype=np.int64)
+
+    def _embedding_dim(self, embeddings):
+        for vector in embeddings.values():
+            if vector is not None:
+                return vector.shape[0]
+        return self.ml_service.text_model.get_sentence_embedding_dimension()
+
+    def score(self, query_type, query_item, matrix):
+        """
+        Compute every component similarity and the weighted score of one item against a matrix
+
+        Args:
+            query_type: 'lost' or 'found' (type of query_item)
+            query_item: Item feature dictionary
+            matrix: ItemFeatureMatrix of the other item type
+
+        Returns:
+            Dictionary of component arrays, the image-less 'weighted' sum and 'has_image_comparison'
+        """
+        n = len(matrix)
+
+        query_vec = self.ml_service.item_embedding(query_type, query_item)
+        if query_vec is None or n == 0:
+            desc_sim = np.zeros(n, dtype=np.float64)
+        else:
+            desc_sim = np.clip(matrix.embeddings @ query_vec, 0.0, 1.0).astype(np.float64)
+
+        loc_sim = _equal_codes(matrix.location, self.vocab.code(query_item.get('location', '')))
+        cat_sim = _equal_codes(matrix.category, self.vocab.code(query_item.get('category', '')))
+        color_sim = _equal_codes(matrix.color, self.vocab.code(query_item.get('color', '')))
+
+        query_day = parse_day_ordinal(query_item.get(DATE_FIELDS[query_type], ''))
+        date_sim = _date_similarity(matrix.day, query_day)
+
+        weighted = (
+            DESC_WEIGHT * desc_sim +
+            LOC_WEIGHT * loc_sim +
+            CAT_WEIGHT * cat_sim +
+            COLOR_WEIGHT * color_sim +
+            DATE_WEIGHT * date_sim
+        )
+
+        query_image = query_item.get('image_filename', '')
+        has_both_images = matrix.has_image & bool(query_image)
+        img_sim = np.zeros(n, dtype=np.float64)
+
+        return {
+            'weighted': weighted,
+            'description_similarity': desc_sim,
+            'image_similarity': img_sim,
+            'location_similarity': loc_sim,
+            'category_similarity': cat_sim,
+            'color_similarity': color_sim,
+            'date_similarity': date_sim,
+            'has_image_comparison': has_both_images,
+            'query_image': query_image,
+        }
+
+    def top_matches(self, query_type, query_item, min_score=0.8, top_k=10):
+        """
+        Find the best candidates of the other item type for one item
+
+        Image similarity is only computed for pairs whose score could still reach
+        min_score with a perfect image match, so results equal the per-pair scorer.
+        Large candidate sets are first narrowed to the ANN description shortlist
+        (approximate: a true match outside the probed buckets can be missed)
+
+        Args:
+            query_type: 'lost' or 'found'
+            query_item: Item feature dictionary (as read by the matcher queries)
+            min_score: Minimum match score threshold
+            top_k: Number of top matches to return
+
+        Returns:
+            List of (row, score_data) tuples sorted by match score
+        """
+        candidate_type = 'found' if query_type == 'lost' else 'lost'
+        matrix = self.candidates(candidate_type)
+        if self.use_ann:
+            shortlist = self._shortlist(query_type, query_item, matrix, min_score)
+            if shortlist is not None:
+                matrix = matrix.take(shortlist)
+        parts = self.score(query_type, query_item, matrix)
+
+        weighted = parts['weighted']
+        has_both = parts['has_image_comparison']
+        img_sim = parts['image_similarity']
+
+        match_score = weighted / WEIGHTS_WITHOUT_IMAGE
+        if has_both.any():
+            # Upper bound assumes a perfect image match; only those that can pass get scored
+            upper = (weighted + IMG_WEIGHT) / WEIGHTS_WITH_IMAGE
+            for i in np.flatnonzero(has_both & (np.round(upper, 4) >= min_score)):
+                if query_type == 'lost':
+                    img_sim[i] = self.ml_service.image_sim(parts['query_image'], matrix.images[i])
+                else:
+                    img_sim[i] = self.ml_service.image_sim(matrix.images[i], parts['query_image'])
+            match_score = np.where(
+                has_both,
+                (weighted + IMG_WEIGHT * img_sim) / WEIGHTS_WITH_IMAGE,
+                match_score
+            )
+
+        rounded = np.round(match_score, 4)
+        passing = np.flatnonzero(rounded >= min_score)
+        # Sort by score, then candidate order for ties (like the stable list.sort did)
+        passing = passing[np.lexsort((passing, -rounded[passing]))][:top_k]
+
+        results = []
+        for i in passing:
+            results.append((matrix.rows[i], {
+                'match_score': float(rounded[i]),
+                'description_similarity': round(float(parts['description_similarity'][i]), 4),
+                'image_similarity': round(float(img_sim[i]), 4),
+                'location_similarity': round(float(parts['location_similarity'][i]), 4),
+                'category_similarity': round(float(parts['category_similarity'][i]), 4),
+                'color_similarity': round(float(parts['color_similarity'][i]), 4),
+                'date_similarity': round(float(parts['date_similarity'][i]), 4),
+                'has_image_comparison': bool(has_both[i])
+            }))
+        return results
+
+
+    def all_pairs(self, min_score=0.8, limit=None, block_size=BLOCK_SIZE):
+        """
+        Score every lost item against every unclaimed found item in bounded-memory tiles
+
+        Each tile is one matrix multiply of a lost embedding block by a found
+        embedding block, with categorical and date terms broadcast over it.
+        Results are kept in a bounded min-heap, so only the best `limit` pairs
+        are ever held; once the heap is full its minimum raises the threshold
+        and image similarity is skipped for pairs that can no longer enter it.
+
+        Args:
+            min_score: Minimum match score threshold
+            limit: Maximum number of pairs to keep (None keeps every passing pair)
+            block_size: Tile edge length (rows and columns per tile)
+
+        Returns:
+            List of (lost_row, found_row, score_data) tuples sorted by match score
+        """
+        lost = self.candidates('lost')
+        found = self.candidates('found')
+        n_found = len(found)
+
+        # Heap entries: (match_score, -pair_order, lost_index, found_index, img_sim)
+        heap = []
+
+        def threshold():
+            if limit is not None and len(heap) >= limit:
+                return max(min_score, heap[0][0])
+            return min_score
+
+        def offer(score, order, i, j, img):
+            entry = (score, -order, i, j, img)
+            if limit is None or len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        for lo in range(0, len(lost), block_size):
+            l_slice = slice(lo, lo + block_size)
+            for fo in range(0, n_found, block_size):
+                f_slice = slice(fo, fo + block_size)
+
+                weighted, has_both = self._tile_weighted(lost, l_slice, found, f_slice)
+                score = np.where(
+                    has_both,
+                    (weighted + IMG_WEIGHT) / WEIGHTS_WITH_IMAGE,  # upper bound for image pairs
+                    weighted / WEIGHTS_WITHOUT_IMAGE
+                )
+                rounded_upper = np.round(score, 4)
+
+                rows, cols = np.nonzero(rounded_upper >= threshold())
+                if rows.size == 0:
+                    continue
+
+                # Best candidates first so the heap threshold rises as early as possible
+                order = np.argsort(-rounded_upper[rows, cols], kind='stable')
+                for k in order:
+                    r, c = rows[k], cols[k]
+                    if rounded_upper[r, c] < threshold():
+                        break
+                    i, j = lo + r, fo + c
+                    img = 0.0
+                    final = rounded_upper[r, c]
+                    if has_both[r, c]:
+                        img = self.ml_service.image_sim(lost.images[i], found.images[j])
+                        final = round((weighted[r, c] + IMG_WEIGHT * img) / WEIGHTS_WITH_IMAGE, 4)
+                        if final < threshold():
+                            continue
+                    offer(float(final), i * n_found + j, i, j, img)
+
+        results = []
+        for score, _, i, j, img in sorted(heap, reverse=True):
+            results.append((lost.rows[i], found.rows[j], self._pair_score_data(lost, i, found, j, score, img)))
+        return results
+
+    def _tile_weighted(self, lost, l_slice, found, f_slice):
+        """Image-less weighted sum and both-images mask for one lost x found tile"""
+        desc_sim = np.clip(lost.embeddings[l_slice] @ found.embeddings[f_slice].T, 0.0, 1.0).astype(np.float64)
+
+        weighted = DESC_WEIGHT * desc_sim
+        weighted += LOC_WEIGHT * _equal_code_grid(lost.location[l_slice], found.location[f_slice])
+        weighted += CAT_WEIGHT * _equal_code_grid(lost.category[l_slice], found.category[f_slice])
+        weighted += COLOR_WEIGHT * _equal_code_grid(lost.color[l_slice], found.color[f_slice])
+        weighted += DATE_WEIGHT * _date_similarity(lost.day[l_slice][:, None], found.day[f_slice][None, :])
+
+        has_both = lost.has_image[l_slice][:, None] & found.has_image[f_slice][None, :]
+        return weighted, has_both
+
+    def _pair_score_data(self, lost, i, found, j, match_score, img_sim):
+        """Component breakdown for one selected pair, in calculate_match_score format"""
+        desc_sim = float(np.clip(np.dot(lost.embeddings[i], found.embeddings[j]), 0.0, 1.0))
+        return {
+            'match_score': match_score,
+            'description_similarity': round(desc_sim, 4),
+            'image_similarity': round(float(img_sim), 4),
+            'location_similarity': float(lost.location[i] >= 0 and lost.location[i] == found.location[j]),
+            'category_similarity': float(lost.category[i] >= 0 and lost.category[i] == found.category[j]),
+            'color_similarity': float(lost.color[i] >= 0 and lost.color[i] == found.color[j]),
+            'date_similarity': round(float(_date_similarity(lost.day[i], found.day[j])), 4),
+            'has_image_comparison': bool(lost.has_image[i] and found.has_image[j])
+        }
+
+
+def _date_similarity(days_a, days_b):
+    """Linear-decay date similarity over (broadcast) day ordinals, 0.0 where either is missing"""
+    with np.errstate(invalid='ignore'):
+        date_sim = np.maximum(0.0, 1.0 - np.abs(np.subtract(days_a, days_b)) / DATE_WINDOW_DAYS)
+    return np.nan_to_num(date_sim, nan=0.0)
+
+
+def _equal_code_grid(codes_a, codes_b):
+    """Binary similarity grid between two code vectors (missing codes never match)"""
+    return ((codes_a[:, None] == codes_b[None, :]) & (codes_a[:, None] >= 0)).astype(np.float64)
+
+
+def _equal_codes(codes, query_code):
+    """Binary similarity array: 1.0 where codes equal the (present) query code"""
+    if query_code < 0:
+        return np.zeros(codes.shape[0], dtype=np.float64)
+    return (codes == query_code).astype(np.float64)
+
+
+if __name__ == '__main__':
+    # Compare the vectorized engine against the per-pair scorer on the local database
+    import os
+    import sys
+    from ml_matching_service import MLMatchingService
+
+    db_path = os.path.join(os.path.dirname(__file__), 'traceback_100k.db')
+    found_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+    service = MLMatchingService(db_path)
+    service.embedding_store.refresh_all()
+
+    start = time.perf_counter()
+    service.find_matches_for_found_item(found_id, min_score=0.0, top_k=10)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = service.find_matches_for_found_item(found_id, min_score=0.0, top_k=50)
+    warm = time.perf_counter() - start
+    print(f"Vectorized query: cold {cold * 1000:.1f} ms, warm {warm * 1000:.1f} ms")
+
+    conn = service.get_db_connection()
+    found_row = dict(conn.execute("""
+        SELECT f.rowid as id, f.*, c.name as category, loc.name as location
+        FROM found_items f
+        LEFT JOIN categories c ON f.category_id = c.id
+        LEFT JOIN locations loc ON f.location_id = loc.id
+        WHERE f.rowid = ?
+    """, (found_id,)).fetchone())
+    conn.close()
+
+    max_diff = 0.0
+    for match in fast:
+        pair = service.calculate_match_score(match['lost_item'], found_row)
+        max_diff = max(max_diff, abs(pair['match_score'] - match['match_score']))
+    print(f"Max score difference vs per-pair scorer over {len(fast)} matches: {max_diff:.6f}")
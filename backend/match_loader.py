@@ -0,0 +1,144 @@
+"""
+Batched ML Match Loader
+Fetches the top pre-computed ml_matches for a whole page of lost or found items
+in one windowed query, instead of one JOIN query per item, and summarizes a
+user's match counts in one grouped query
+"""
+
+MATCH_MIN_SCORE = 0.8
+# Default confidence buckets for the matches summary badge
+SUMMARY_BUCKETS = (0.6, 0.8, 0.9)
+# SQLite's default limit on bound parameters is 999
+ID_CHUNK_SIZE = 500
+
+# Columns of the matched item returned for each side (item type of the ids -> other side)
+MATCH_QUERIES = {
+    # Lost item ids -> matching found items
+    'lost': """
+        SELECT m.lost_item_id AS match_key, m.match_score, m.score_breakdown,
+               f.rowid as id, f.title, f.description, f.color, f.size,
+               f.created_at, f.image_filename,
+               f.finder_name, f.finder_email, f.finder_phone,
+               f.current_location, f.is_claimed, f.status,
+               c.name as category_name,
+               loc.name as location_name,
+               ROW_NUMBER() OVER (
+                   PARTITION BY m.lost_item_id ORDER BY m.match_score DESC, m.rowid
+               ) AS match_rank
+        FROM ml_matches m
+        JOIN found_items f ON m.found_item_id = f.rowid
+        LEFT JOIN categories c ON f.category_id = c.id
+        LEFT JOIN locations loc ON f.location_id = loc.id
+        WHERE m.lost_item_id IN ({placeholders}) AND m.match_score >= ?
+    """,
+    # Found item ids -> matching lost items
+    'found': """
+        SELECT m.found_item_id AS match_key, m.match_score, m.score_breakdown,
+               l.rowid as id, l.title, l.description, l.color, l.size,
+               l.date_lost, l.time_lost, l.image_filename,
+               l.owner_name, l.user_email, l.owner_phone,
+               l.last_seen_location, l.owner_notes,
+               c.name as category_name,
+               loc.name as location_name,
+               ROW_NUMBER() OVER (
+                   PARTITION BY m.found_item_id ORDER BY m.match_score DESC, m.rowid
+               ) AS match_rank
+        FROM ml_matches m
+        JOIN lost_items l ON m.lost_item_id = l.rowid
+        LEFT JOIN categories c ON l.category_id = c.id
+        LEFT JOIN locations loc ON l.location_id = loc.id
+        WHERE m.found_item_id IN ({placeholders}) AND m.match_score >= ?
+    """,
+}
+
+
+def match_query(item_type, id_count):
+    """
+    Top-N matches query for id_count item ids
+
+    Parameters: (*item_ids, min_score, per_item)
+    """
+    return f"""
+        SELECT * FROM ({MATCH_QUERIES[item_type].format(placeholders=','.join('?' * id_count))})
+        WHERE match_rank <= ?
+        ORDER BY match_key, match_rank
+    """
+
+
+def summary_query(bucket_count):
+    """
+    Report and bucket counts query of summarize_matches()
+
+    Parameters: (*buckets, user_email, user_email)
+    """
+    bucket_columns = ', '.join(
+        f'COALESCE(SUM(score >= ?), 0) AS bucket_{i}' for i in range(bucket_count)
+    )
+    return f"""
+        SELECT side, COUNT(DISTINCT item_id) AS reports, {bucket_columns}
+        FROM (
+            SELECT 'lost' AS side, l.rowid AS item_id, m.match_score AS score
+            FROM lost_items l
+            LEFT JOIN ml_matches m ON m.lost_item_id = l.rowid
+            WHERE l.user_email = ?
+            UNION ALL
+            SELECT 'found', f.rowid, m.match_score
+            FROM found_items f
+            LEFT JOIN ml_matches m ON m.found_item_id = f.rowid
+            WHERE f.finder_email = ?
+        )
+        GROUP BY side
+    """
+
+
+def load_matches(conn, item_type, item_ids, per_item=5, min_score=MATCH_MIN_SCORE):
+    """
+    Top matches for many items at once
+
+    Args:
+        conn: Open connection with sqlite3.Row row factory
+        item_type: 'lost' or 'found' (type of item_ids; matches are of the other type)
+        item_ids: Item rowids (e.g. one page of results)
+        per_item: Maximum matches kept per item
+        min_score: Minimum match score
+
+    Returns:
+        Dictionary of item_id -> list of match dictionaries, best first
+        (every requested id is present, with [] when it has no matches)
+    """
+    matches = {item_id: [] for item_id in item_ids}
+    ids = list(matches)
+
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        for row in conn.execute(match_query(item_type, len(chunk)), (*chunk, min_score, per_item)).fetchall():
+            match = dict(row)
+            key = match.pop('match_key')
+            match.pop('match_rank')
+            matches[key].append(match)
+
+    return matches
+
+
+def summarize_matches(conn, user_email, buckets=SUMMARY_BUCKETS):
+    """
+    Report and match counts for everything a user reported, in one grouped query
+
+    Args:
+        conn: Open connection with sqlite3.Row row factory
+        user_email: Owner email (lost_items.user_email / found_items.finder_email)
+        buckets: Score thresholds; each gets a count of matches scoring >= it
+
+    Returns:
+        Dictionary of 'lost'/'found' -> {'reports': n, 'buckets': {threshold: count}}
+    """
+    buckets = sorted(set(buckets))
+    rows = conn.execute(summary_query(len(buckets)), (*buckets, user_email, user_email)).fetchall()
+
+    summary = {side: {'reports': 0, 'buckets': {b: 0 for b in buckets}} for side in ('lost', 'found')}
+    for row in rows:
+        summary[row['side']] = {
+            'reports': row['reports'],
+            'buckets': {b: row[f'bucket_{i}'] for i, b in enumerate(buckets)},
+        }
+    return summary
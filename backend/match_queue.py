@@ -0,0 +1,307 @@
+"""
+ML Match Job Queue
+Background worker pool that computes matches for a newly reported lost or found
+item and merges them into ml_matches, so /api/report-lost and /api/report-found
+can return immediately instead of scoring inside the request
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from notification_digest import defer_to_digest
+from mail_transport import get_outbox
+
+MATCH_WORKERS = int(os.environ.get('MATCH_WORKERS', '2'))
+MATCH_MIN_SCORE = 0.8  # same threshold as the hourly scheduler
+MATCH_TOP_K = 10
+
+
+def _defer_match_to_digest(cursor, found_id, lost_id, match):
+    """
+    Put the match in the lost item reporter's digest when they don't take immediate
+    emails, and mark it emailed
+
+    Returns:
+        True when the match went to the digest
+    """
+    reporter = cursor.execute('SELECT user_email FROM lost_items WHERE rowid = ?', (lost_id,)).fetchone()
+    if not reporter or not reporter[0]:
+        return False
+    if not defer_to_digest(cursor, reporter[0], 'match', found_id, lost_id, match['match_score']):
+        return False
+    cursor.execute('''
+        UPDATE ml_matches SET email_sent = 1
+        WHERE found_item_id = ? AND lost_item_id = ?
+    ''', (found_id, lost_id))
+    return True
+
+
+def _queue_match_email(cursor, found_id, lost_id, match):
+    """
+    Queue the "potential match" email to the lost item reporter and mark the match emailed
+
+    Returns:
+        Reporter email when the message was queued, otherwise None
+    """
+    lost_item_data = cursor.execute('''
+        SELECT l.title, l.user_name, l.user_email, l.date_lost,
+               c.name as category, loc.name as location
+        FROM lost_items l
+        LEFT JOIN categories c ON l.category_id = c.id
+        LEFT JOIN locations loc ON l.location_id = loc.id
+        WHERE l.rowid = ?
+    ''', (lost_id,)).fetchone()
+    found_item_data = cursor.execute('''
+        SELECT f.title, f.date_found,
+               c.name as category, loc.name as location
+        FROM found_items f
+        LEFT JOIN categories c ON f.category_id = c.id
+        LEFT JOIN locations loc ON f.location_id = loc.id
+        WHERE f.rowid = ?
+    ''', (found_id,)).fetchone()
+    if not lost_item_data or not lost_item_data[2] or not found_item_data:
+        return None
+    
+    from email_verification_service import send_email
+    
+    reporter_name = lost_item_data[1]
+    reporter_email = lost_item_data[2]
+    
+    # Lost item details
+    lost_title = lost_item_data[0]
+    lost_date = lost_item_data[3]
+    lost_category = lost_item_data[4] or 'N/A'
+    lost_location = lost_item_data[5] or 'N/A'
+    
+    # Found item details
+    found_title = found_item_data[0]
+    found_date = found_item_data[1]
+    found_category = found_item_data[2] or 'N/A'
+    found_location = found_item_data[3] or 'N/A'
+    
+    match_score_pct = int(match['match_score'] * 100)
+    
+    subject = "Potential Match Found for Your Lost Item - TraceBack"
+    body = f"""Hello {reporter_name},
+
+Good news! We found a potential match for your lost item report!
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+YOUR LOST ITEM:
+• Name: {lost_title}
+• Category: {lost_category}
+• Location: {lost_location}
+• Date Lost: {lost_date}
+
+MATCHED FOUND ITEM:
+• Name: {found_title}
+• Category: {found_category}
+• Location: {found_location}
+• Date Found: {found_date}
+
+MATCH CONFIDENCE: {match_score_pct}%
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+NEXT STEPS:
+
+1. Log in to TraceBack and go to your Dashboard
+2. In your Dashboard, you will see the matched found item for your lost item
+3. Review the full match details and if this looks like your item, submit a claim
+4. Provide accurate verification details - you have ONE claim attempt only
+5. The finder will review your answers to validate ownership
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Best regards,
+TraceBack Team
+Kent State University
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+This is an automated notification. Please do not reply to this email.
+    """
+    
+    # Queue inside the caller's transaction; mark sent only once it's in the outbox
+    if not send_email(reporter_email, subject, body, conn=cursor.connection):
+        return None
+    cursor.execute('''
+        UPDATE ml_matches SET email_sent = 1
+        WHERE found_item_id = ? AND lost_item_id = ?
+    ''', (found_id, lost_id))
+    return reporter_email
+
+
+def store_match(cursor, found_id, lost_id, match):
+    """
+    Upsert one >= 80% match into ml_matches (preserving email_sent) and notify the
+    lost item reporter the first time the match is seen
+    
+    Returns:
+        True when the match was stored
+    """
+    if match['match_score'] < MATCH_MIN_SCORE:
+        return False
+    try:
+        score_breakdown = json.dumps({
+            'description': match.get('description_similarity', 0),
+            'image': match.get('image_similarity', 0),
+            'location': match.get('location_similarity', 0),
+            'category': match.get('category_similarity', 0),
+            'color': match.get('color_similarity', 0),
+            'date': match.get('date_similarity', 0)
+        })
+        existing = cursor.execute('''
+            SELECT email_sent FROM ml_matches
+            WHERE found_item_id = ? AND lost_item_id = ?
+        ''', (found_id, lost_id)).fetchone()
+        email_sent = bool(existing and existing[0])
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO ml_matches 
+            (found_item_id, lost_item_id, match_score, score_breakdown, computed_at, email_sent)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+        ''', (found_id, lost_id, match['match_score'], score_breakdown, int(email_sent)))
+        print(f"   [HIGH CONFIDENCE] Match: Found #{found_id} <-> Lost #{lost_id} ({match['match_score'] * 100:.1f}%)")
+    except Exception as e:
+        print(f"   ⚠️  Error storing match: {e}")
+        return False
+    
+    if email_sent:
+        return True
+    try:
+        if _defer_match_to_digest(cursor, found_id, lost_id, match):
+            print("      [DIGEST] Match queued for the reporter's digest")
+        else:
+            reporter_email = _queue_match_email(cursor, found_id, lost_id, match)
+            if reporter_email:
+                print(f"      [EMAIL] Notification queued for {reporter_email}")
+    except Exception as email_error:
+        print(f"      ⚠️  Could not send email notification: {email_error}")
+    return True
+
+
+class MatchJobQueue:
+    """In-process queue of ('lost' | 'found', item_id) match jobs served by daemon workers"""
+    
+    def __init__(self, db_path, service_factory, workers=MATCH_WORKERS):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            service_factory: Zero-argument callable returning the shared MLMatchingService (or None)
+            workers: Number of worker threads
+        """
+        self.db_path = db_path
+        self.service_factory = service_factory
+        self.workers = max(1, workers)
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.stats = {'enqueued': 0, 'completed': 0, 'failed': 0, 'stored': 0, 'last_job_seconds': None}
+    
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                worker = threading.Thread(target=self._worker, name=f'match-worker-{i}', daemon=True)
+                worker.start()
+                self._threads.append(worker)
+        print(f"[INFO] Match job queue started with {self.workers} worker(s)")
+    
+    def enqueue(self, item_type, item_id):
+        """
+        Queue a match job; a job already waiting for the same item is not duplicated
+        
+        Args:
+            item_type: 'lost' or 'found'
+            item_id: rowid of the reported item
+        
+        Returns:
+            True if a new job was queued
+        """
+        if item_type not in ('lost', 'found'):
+            raise ValueError(f"Unknown item type: {item_type}")
+        self.start()
+        key = (item_type, item_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            self.stats['enqueued'] += 1
+        self._queue.put(key)
+        return True
+    
+    def pending_count(self):
+        """Number of jobs waiting or running"""
+        with self._lock:
+            return len(self._pending)
+    
+    def join(self):
+        """Block until every queued job has been processed"""
+        self._queue.join()
+    
+    def _worker(self):
+        while True:
+            item_type, item_id = self._queue.get()
+            try:
+                self.run_job(item_type, item_id)
+            finally:
+                with self._lock:
+                    self._pending.discard((item_type, item_id))
+                self._queue.task_done()
+    
+    def run_job(self, item_type, item_id):
+        """
+        Score one item against the opposite table and merge results into ml_matches
+        
+        Returns:
+            Number of matches stored
+        """
+        started = time.perf_counter()
+        try:
+            ml_service = self.service_factory()
+            if ml_service is None:
+                print(f"[WARNING] ML service unavailable, {item_type} item #{item_id} left for the hourly run")
+                with self._lock:
+                    self.stats['failed'] += 1
+                return 0
+            
+            if item_type == 'found':
+                matches = ml_service.find_matches_for_found_item(
+                    found_item_id=item_id, min_score=MATCH_MIN_SCORE, top_k=MATCH_TOP_K
+                )
+                pairs = [(item_id, m['lost_item_id'], m) for m in matches]
+            else:
+                matches = ml_service.find_matches_for_lost_item(
+                    lost_item_id=item_id, min_score=MATCH_MIN_SCORE, top_k=MATCH_TOP_K
+                )
+                pairs = [(m['found_item_id'], item_id, m) for m in matches]
+            
+            get_outbox()  # creates email_outbox before store_match() queues inside the transaction
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            cursor = conn.cursor()
+            stored = sum(1 for found_id, lost_id, match in pairs if store_match(cursor, found_id, lost_id, match))
+            conn.commit()
+            conn.close()
+            
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stats['completed'] += 1
+                self.stats['stored'] += stored
+                self.stats['last_job_seconds'] = round(elapsed, 3)
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 🤖 Match job {item_type} #{item_id}: {stored} match(es) stored in {elapsed:.2f}s")
+            return stored
+        
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += 1
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ❌ Match job {item_type} #{item_id} failed: {e}")
+            return 0
@@ -0,0 +1,393 @@
+"""
+Schema Migrations
+Versioned schema changes applied at startup. Each migration runs once, in its
+own transaction, and is recorded in schema_migrations; steps are idempotent
+(IF NOT EXISTS, or a callable that checks first) so a migration whose tables
+don't exist yet, or that failed, is retried on the next start. Migrations
+needing an optional SQLite feature (FTS5) are skipped on builds without it.
+
+Usage:
+    python migrations.py           # apply pending migrations
+    python migrations.py --check   # EXPLAIN QUERY PLAN check of the hot queries (read-only)
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traceback_100k.db')
+
+
+def fts5_available(conn):
+    """Whether this SQLite build has the FTS5 extension (probed with a temporary table)"""
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _fts_steps():
+    """
+    FTS5 index over lost/found items (see search_index.py)
+
+    The FTS rowid encodes the item: lost = rowid * 2, found = rowid * 2 + 1,
+    so triggers can update one entry without scanning the index
+    """
+    steps = [('lost_items', """
+        CREATE VIRTUAL TABLE IF NOT EXISTS item_search USING fts5(
+            item_type UNINDEXED, item_id UNINDEXED,
+            title, description, color, category, location,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)]
+
+    for item_type, table, offset in (('lost', 'lost_items', 0), ('found', 'found_items', 1)):
+        insert_new = f"""
+                INSERT INTO item_search (rowid, item_type, item_id, title, description, color, category, location)
+                VALUES (NEW.rowid * 2 + {offset}, '{item_type}', NEW.rowid, NEW.title, NEW.description, NEW.color,
+                        (SELECT name FROM categories WHERE id = NEW.category_id),
+                        (SELECT name FROM locations WHERE id = NEW.location_id));"""
+        steps += [
+            (table, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_search_insert AFTER INSERT ON {table}
+            BEGIN{insert_new}
+            END
+            """),
+            (table, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_search_update
+            AFTER UPDATE OF title, description, color, category_id, location_id ON {table}
+            BEGIN
+                DELETE FROM item_search WHERE rowid = OLD.rowid * 2 + {offset};{insert_new}
+            END
+            """),
+            (table, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_search_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM item_search WHERE rowid = OLD.rowid * 2 + {offset};
+            END
+            """),
+        ]
+
+    # Renaming a category/location updates the denormalized names
+    for lookup, column, key in (('categories', 'category', 'category_id'), ('locations', 'location', 'location_id')):
+        steps.append((lookup, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{lookup}_search_rename AFTER UPDATE OF name ON {lookup}
+            BEGIN
+                UPDATE item_search SET {column} = NEW.name
+                WHERE rowid IN (
+                    SELECT rowid * 2 FROM lost_items WHERE {key} = NEW.id
+                    UNION ALL
+                    SELECT rowid * 2 + 1 FROM found_items WHERE {key} = NEW.id
+                );
+            END
+        """))
+
+    # Initial build (also repairs a partially applied run)
+    steps += [
+        ('lost_items', 'DELETE FROM item_search'),
+        ('lost_items', """
+            INSERT INTO item_search (rowid, item_type, item_id, title, description, color, category, location)
+            SELECT l.rowid * 2, 'lost', l.rowid, l.title, l.description, l.color, c.name, loc.name
+            FROM lost_items l
+            LEFT JOIN categories c ON l.category_id = c.id
+            LEFT JOIN locations loc ON l.location_id = loc.id
+        """),
+        ('found_items', """
+            INSERT INTO item_search (rowid, item_type, item_id, title, description, color, category, location)
+            SELECT f.rowid * 2 + 1, 'found', f.rowid, f.title, f.description, f.color, c.name, loc.name
+            FROM found_items f
+            LEFT JOIN categories c ON f.category_id = c.id
+            LEFT JOIN locations loc ON f.location_id = loc.id
+        """),
+    ]
+    return steps
+
+
+def _add_column(table, column, definition):
+    """Step adding a column unless it already exists (ALTER TABLE has no IF NOT EXISTS)"""
+    def step(conn):
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()}
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+
+def _claim_window_steps():
+    """found_items.in_claim_window, kept in sync from claim_attempts (see claim_window.py)"""
+    refresh = """
+                UPDATE found_items SET in_claim_window = EXISTS (
+                    SELECT 1 FROM claim_attempts
+                    WHERE found_item_id = {ref}.found_item_id AND success = 1 AND marked_as_potential_at IS NOT NULL
+                )
+                WHERE rowid = {ref}.found_item_id;"""
+    return [
+        ('found_items', _add_column('found_items', 'in_claim_window', 'INTEGER NOT NULL DEFAULT 0')),
+        ('found_items', 'CREATE INDEX IF NOT EXISTS idx_found_items_claim_window_private_created ON found_items(in_claim_window, is_private, created_at)'),
+        ('claim_attempts', f"""
+            CREATE TRIGGER IF NOT EXISTS trg_claim_attempts_window_insert AFTER INSERT ON claim_attempts
+            WHEN NEW.success = 1 AND NEW.marked_as_potential_at IS NOT NULL
+            BEGIN{refresh.format(ref='NEW')}
+            END
+        """),
+        ('claim_attempts', f"""
+            CREATE TRIGGER IF NOT EXISTS trg_claim_attempts_window_update
+            AFTER UPDATE OF success, marked_as_potential_at, found_item_id ON claim_attempts
+            BEGIN{refresh.format(ref='OLD')}{refresh.format(ref='NEW')}
+            END
+        """),
+        ('claim_attempts', f"""
+            CREATE TRIGGER IF NOT EXISTS trg_claim_attempts_window_delete AFTER DELETE ON claim_attempts
+            WHEN OLD.success = 1 AND OLD.marked_as_potential_at IS NOT NULL
+            BEGIN{refresh.format(ref='OLD')}
+            END
+        """),
+        ('claim_attempts', """
+            UPDATE found_items SET in_claim_window = (rowid IN (
+                SELECT found_item_id FROM claim_attempts
+                WHERE success = 1 AND marked_as_potential_at IS NOT NULL
+            ))
+        """),
+    ]
+
+
+# (version, name, [(table, statement or callable(conn)), ...])
+MIGRATIONS = [
+    (1, 'hot_query_indexes', [
+        ('lost_items', 'CREATE INDEX IF NOT EXISTS idx_lost_items_user_email ON lost_items(user_email)'),
+        ('found_items', 'CREATE INDEX IF NOT EXISTS idx_found_items_finder_email ON found_items(finder_email)'),
+        ('found_items', 'CREATE INDEX IF NOT EXISTS idx_found_items_status_private_created ON found_items(status, is_private, created_at)'),
+        ('ml_matches', 'CREATE INDEX IF NOT EXISTS idx_ml_matches_lost_score ON ml_matches(lost_item_id, match_score)'),
+        ('ml_matches', 'CREATE INDEX IF NOT EXISTS idx_ml_matches_found_score ON ml_matches(found_item_id, match_score)'),
+        ('claim_attempts', 'CREATE INDEX IF NOT EXISTS idx_claim_attempts_item_success ON claim_attempts(found_item_id, success, marked_as_potential_at)'),
+        ('messages', 'CREATE INDEX IF NOT EXISTS idx_messages_conversation_created ON messages(conversation_id, created_at)'),
+        ('messages', 'CREATE INDEX IF NOT EXISTS idx_messages_receiver_read ON messages(receiver_id, is_read)'),
+        ('email_notifications', 'CREATE INDEX IF NOT EXISTS idx_email_notifications_item_user_type ON email_notifications(found_item_id, user_email, notification_type)'),
+    ]),
+    (2, 'item_search_fts', _fts_steps()),
+    (3, 'keyset_pagination_indexes', [
+        ('lost_items', 'CREATE INDEX IF NOT EXISTS idx_lost_items_user_resolved_created ON lost_items(user_email, is_resolved, created_at)'),
+        ('found_items', 'CREATE INDEX IF NOT EXISTS idx_found_items_created ON found_items(created_at)'),
+        ('abuse_reports', 'CREATE INDEX IF NOT EXISTS idx_abuse_reports_status_created ON abuse_reports(status, created_at)'),
+        ('abuse_reports', 'CREATE INDEX IF NOT EXISTS idx_abuse_reports_created ON abuse_reports(created_at)'),
+    ]),
+    (4, 'found_items_claim_window_flag', _claim_window_steps()),
+    (5, 'notification_digests', [
+        ('users', _add_column('users', 'digest_window', 'TEXT')),
+        ('users', """
+            CREATE TABLE IF NOT EXISTS notification_digest_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_email TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                related_id INTEGER NOT NULL DEFAULT 0,
+                score REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_email, event_type, item_id, related_id)
+            )
+        """),
+    ]),
+]
+
+# Migrations that need an optional SQLite feature: version -> (feature, probe(conn)).
+# Without it the migration is skipped and left unrecorded, so it applies once
+# the feature is available; search falls back to LIKE meanwhile.
+REQUIREMENTS = {
+    2: ('FTS5', fts5_available),
+}
+
+
+def hot_queries(conn):
+    """
+    Hot endpoint/scheduler queries that must be served by an index
+
+    The SQL is the text the endpoints and schedulers execute (hot_queries.py,
+    match_loader.py, notification_fanout.py), filled with sample parameters.
+
+    Returns:
+        List of (name, sql, params)
+    """
+    from hot_queries import (LOST_ITEMS_KEYSET, FOUND_ITEMS_KEYSET, MESSAGES_KEYSET, USER_LOST_ITEMS_PAGE,
+                             FOUND_ITEMS_PAGE, USER_LOST_REPORTS, USER_FOUND_REPORTS, FOUND_ITEM_MATCHES,
+                             PRIVATE_ITEM_MATCH_COUNT, UNREAD_BY_CONVERSATION, CONVERSATION_MESSAGES_PAGE,
+                             EXPIRED_CLAIMED_ITEMS, found_browse_conditions)
+    from pagination import page_sql
+    from match_loader import match_query, summary_query, MATCH_MIN_SCORE, SUMMARY_BUCKETS
+    from notification_fanout import recipients_query
+
+    email = 'user@kent.edu'
+    lost_page, lost_seek = page_sql(USER_LOST_ITEMS_PAGE, LOST_ITEMS_KEYSET, True, ['2025-11-01 00:00:00', 1000])
+    browse_page, browse_seek = page_sql(FOUND_ITEMS_PAGE, FOUND_ITEMS_KEYSET, True, ['2025-11-01 00:00:00', 1000],
+                                        where=' AND '.join(found_browse_conditions(conn)))
+    messages_page, messages_seek = page_sql(CONVERSATION_MESSAGES_PAGE, MESSAGES_KEYSET, True,
+                                            ['2025-11-01 00:00:00', 1], limit='LIMIT ?')
+    return [
+        ('user lost reports', USER_LOST_REPORTS, (email,)),
+        ('user lost items cursor page', lost_page, (email, *lost_seek, 101, 0)),
+        ('user found reports', USER_FOUND_REPORTS, (email,)),
+        ('claimed items cleanup', EXPIRED_CLAIMED_ITEMS, ()),
+        ('matches for lost items', match_query('lost', 1), (1, MATCH_MIN_SCORE, 10)),
+        ('matches for found items', match_query('found', 1), (1, MATCH_MIN_SCORE, 10)),
+        ('found item matches', FOUND_ITEM_MATCHES, (1,)),
+        ('private item match check', PRIVATE_ITEM_MATCH_COUNT, (1, email)),
+        ('matches summary', summary_query(len(SUMMARY_BUCKETS)), (*SUMMARY_BUCKETS, email, email)),
+        ('public browse cursor page', browse_page, (*browse_seek, 101, 0)),
+        ('conversation messages cursor page', messages_page, ('abc', *messages_seek, 101)),
+        ('unread messages', UNREAD_BY_CONVERSATION, (1,)),
+        ('notification fan-out recipients', recipients_query(conn, 'verified'),
+         (email, '', 1, 'public_item', 500)),
+    ]
+
+
+def ensure_migrations_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+
+def current_version(conn):
+    """Highest applied migration version (0 for a fresh database)"""
+    ensure_migrations_table(conn)
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+
+def _existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def apply_migrations(db_path=DB_PATH):
+    """
+    Apply every migration that has not been recorded yet
+
+    A migration that fails is rolled back and reported; the ones after it
+    still run.
+
+    Args:
+        db_path: Path to the SQLite database
+
+    Returns:
+        List of versions applied in this call
+    """
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        ensure_migrations_table(conn)
+        applied = {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+        tables = _existing_tables(conn)
+        newly_applied = []
+
+        for version, name, steps in MIGRATIONS:
+            if version in applied:
+                continue
+            feature, probe = REQUIREMENTS.get(version, (None, None))
+            if probe and not probe(conn):
+                print(f"[WARNING] Skipping migration {version} ({name}): SQLite has no {feature} support")
+                continue
+
+            # One transaction per migration: a failing migration is rolled back and
+            # retried on the next start, later migrations still apply
+            missing = sorted({table for table, _ in steps if table not in tables})
+            try:
+                conn.execute('BEGIN')
+                for table, statement in steps:
+                    if table in tables:
+                        if callable(statement):
+                            statement(conn)
+                        else:
+                            conn.execute(statement)
+                if not missing:
+                    conn.execute(
+                        'INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                        (version, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                    )
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"[ERROR] Migration {version} ({name}) failed: {e}")
+                continue
+
+            if missing:
+                # Left unrecorded so the remaining steps run once the tables exist
+                print(f"[WARNING] Migration {version} ({name}) partially applied, missing tables: {', '.join(missing)}")
+                continue
+
+            newly_applied.append(version)
+            print(f"[INFO] Applied migration {version}: {name}")
+
+        if newly_applied:
+            conn.execute('PRAGMA optimize')  # refresh planner statistics for the new indexes
+        return newly_applied
+    finally:
+        conn.close()
+
+
+def full_scans(conn, sql, params=()):
+    """
+    Tables a query reads with a full table scan, according to EXPLAIN QUERY PLAN
+
+    Scans of subqueries and CTEs are not counted; a scan through an index still is
+    """
+    scans = []
+    for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall():
+        detail = row[-1]
+        if not detail.startswith('SCAN '):
+            continue
+        target = detail[len('SCAN '):].split()[0]
+        if target.startswith('(') or target in ('CONSTANT', 'SUBQUERY'):
+            continue
+        scans.append(detail)
+    return scans
+
+
+def check_query_plans(db_path=DB_PATH):
+    """
+    Run EXPLAIN QUERY PLAN over hot_queries(), without writing to the database
+
+    Returns:
+        Dictionary of query name -> list of problems: full-scan plan lines, or the
+        error of a query that could not be planned (e.g. a missing table or column).
+        An empty list means the query is indexed.
+    """
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        results = {}
+        for name, sql, params in hot_queries(conn):
+            try:
+                results[name] = full_scans(conn, sql, params)
+            except sqlite3.Error as e:
+                results[name] = [f'ERROR: {e}']
+        return results
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    db_path = os.environ.get('TRACEBACK_DB', DB_PATH)
+    if not os.path.exists(db_path):
+        print(f"[ERROR] Database not found: {db_path}")
+        sys.exit(1)
+
+    if '--check' in sys.argv:
+        # Read-only: plans the schema as it is, pending migrations are not applied
+        failures = 0
+        for name, problems in check_query_plans(db_path).items():
+            if problems:
+                failures += 1
+                print(f"   [FAIL] {name}: {'; '.join(problems)}")
+            else:
+                print(f"   [OK]   {name}")
+        if failures:
+            print(f"[ERROR] {failures} hot queries fall back to a full table scan or failed to plan")
+            sys.exit(1)
+        print("[INFO] All hot queries use an index")
+        sys.exit(0)
+
+    applied = apply_migrations(db_path)
+    conn = sqlite3.connect(db_path)
+    print(f"[INFO] Schema version: {current_version(conn)} ({len(applied)} applied now)")
+    conn.close()
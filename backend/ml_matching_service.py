@@ -4,15 +4,18 @@ Implements multi-modal similarity scoring using semantic embeddings and feature
 """
 
 import os
+import time
 import numpy as np
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
 import sqlite3
+import threading
 from pathlib import Path
+from text_embedding_store import TextEmbeddingStore
+from match_engine import VectorizedMatcher
 
 # Conditional import for image feature extraction module
 try:
-    from image_similarity import image_similarity
+    from image_similarity import image_similarity, warm_feature_cache
     IMAGE_SIMILARITY_AVAILABLE = True
 except ImportError:
     IMAGE_SIMILARITY_AVAILABLE = False
@@ -34,13 +37,27 @@ class MLMatchingService:
         if model_path is None:
             model_path = os.path.join(os.path.dirname(__file__), 'traceback_text_similarity_model')
         
+        # Imported here so that importing this module does not pull in torch
+        start = time.perf_counter()
+        from sentence_transformers import SentenceTransformer
         self.text_model = SentenceTransformer(model_path)
+        self.load_seconds = time.perf_counter() - start
+        
+        # Persistent description embeddings (encoded once, reused by every matcher)
+        self.embedding_store = TextEmbeddingStore(
+            db_path,
+            encoder=lambda texts: self.text_model.encode(texts, show_progress_bar=False),
+            model_key=os.path.basename(os.path.normpath(model_path))
+        )
         
         # Set upload folder
         if upload_folder is None:
             self.upload_folder = os.path.join(os.path.dirname(__file__), 'uploads')
         else:
             self.upload_folder = upload_folder
+        
+        # Batched one-vs-all scorer used by find_matches_for_*
+        self.engine = VectorizedMatcher(self)
     
     def get_db_connection(self):
         """Get database connection"""
@@ -62,17 +79,47 @@ class MLMatchingService:
         if not desc1 or not desc2:
             return 0.0
         
-        # Encode text into dense vector representations
-        embeddings = self.text_model.encode([desc1, desc2])
-        
-        # Compute cosine similarity between embedding vectors
-        similarity = np.dot(embeddings[0], embeddings[1]) / (
-            np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
+        # Encode text into dense vector representations (cached by content hash)
+        return self.embedding_similarity(
+            self.embedding_store.embed_text(desc1),
+            self.embedding_store.embed_text(desc2)
         )
+    
+    def embedding_similarity(self, emb1, emb2):
+        """
+        Cosine similarity between two normalized embeddings, clipped to [0.0, 1.0]
+        """
+        if emb1 is None or emb2 is None:
+            return 0.0
+        
+        similarity = np.dot(emb1, emb2)
         
         # Ensure the result is between 0 and 1
         return float(max(0.0, min(1.0, similarity)))
     
+    def item_embedding(self, item_type, item):
+        """
+        Get the description embedding for a lost/found item dictionary
+        
+        Items read from the database (with an 'id') go through the persistent
+        store; ad-hoc items are embedded by content hash only
+        
+        Args:
+            item_type: 'lost' or 'found'
+            item: Item feature dictionary
+            
+        Returns:
+            Normalized embedding vector, or None when there is no description
+        """
+        description = item.get('description', '')
+        if not description:
+            return None
+        
+        item_id = item.get('id')
+        if item_id is None:
+            return self.embedding_store.embed_text(description)
+        return self.embedding_store.get(item_type, item_id, description)
+    
     def image_sim(self, img1_path, img2_path):
         """
         Compute visual similarity using deep learning feature extraction
@@ -103,6 +150,48 @@ class MLMatchingService:
         except Exception as e:
             return 0.0
     
+    def warm_image_features(self, lost_ids=None, found_ids=None):
+        """
+        Batch-embed item images that have no cached features yet
+        
+        Args:
+            lost_ids: Only these lost items (None with found_ids None = every unmatched item)
+            found_ids: Only these found items
+        
+        Returns:
+            Number of images newly embedded
+        """
+        if not IMAGE_SIMILARITY_AVAILABLE:
+            return 0
+        
+        conn = self.get_db_connection()
+        if lost_ids is None and found_ids is None:
+            rows = conn.execute("""
+                SELECT image_filename FROM lost_items WHERE image_filename IS NOT NULL AND image_filename != ''
+                UNION
+                SELECT image_filename FROM found_items
+                WHERE image_filename IS NOT NULL AND image_filename != '' AND status != 'CLAIMED'
+            """).fetchall()
+        else:
+            rows = []
+            for table, ids in (('lost_items', list(lost_ids or [])), ('found_items', list(found_ids or []))):
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    rows.extend(conn.execute(f"""
+                        SELECT image_filename FROM {table}
+                        WHERE image_filename IS NOT NULL AND image_filename != ''
+                          AND rowid IN ({','.join('?' * len(chunk))})
+                    """, chunk).fetchall())
+        conn.close()
+        
+        paths = []
+        for row in rows:
+            path = row[0] if os.path.isabs(row[0]) else os.path.join(self.upload_folder, row[0])
+            if os.path.exists(path):
+                paths.append(path)
+        
+        return warm_feature_cache(paths)
+    
     def location_similarity(self, loc1, loc2):
         """
         Binary matching for categorical location data
@@ -197,9 +286,9 @@ class MLMatchingService:
             Dictionary containing aggregate score and component similarities
         """
         # Compute similarity across all feature dimensions
-        desc_sim = self.text_similarity(
-            lost_item.get('description', ''),
-            found_item.get('description', '')
+        desc_sim = self.embedding_similarity(
+            self.item_embedding('lost', lost_item),
+            self.item_embedding('found', found_item)
         )
         
         # Determine if visual comparison is possible
@@ -304,37 +393,19 @@ class MLMatchingService:
         
         lost_item = dict(lost_item)
         
-        # Get all found items (not claimed - check status field)
-        found_items = cursor.execute("""
-            SELECT f.rowid as id, f.*, c.name as category, loc.name as location
-            FROM found_items f
-            LEFT JOIN categories c ON f.category_id = c.id
-            LEFT JOIN locations loc ON f.location_id = loc.id
-            WHERE f.status != 'CLAIMED'
-        """).fetchall()
-        
         conn.close()
         
+        # Score against every unclaimed found item in one vectorized pass
         matches = []
-        for found_item in found_items:
+        for found_item, score_data in self.engine.top_matches('lost', lost_item, min_score, top_k):
             found_item = dict(found_item)
-            
-            # Calculate match score
-            score_data = self.calculate_match_score(lost_item, found_item)
-            
-            # Only include if above threshold
-            if score_data['match_score'] >= min_score:
-                matches.append({
-                    'found_item_id': found_item['id'],
-                    'found_item': found_item,
-                    **score_data
-                })
-        
-        # Sort by match score (descending)
-        matches.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        # Return top K matches
-        return matches[:top_k]
+            matches.append({
+                'found_item_id': found_item['id'],
+                'found_item': found_item,
+                **score_data
+            })
+        
+        return matches
     
     def find_matches_for_found_item(self, found_item_id, min_score=0.8, top_k=10):
         """
@@ -366,93 +437,70 @@ class MLMatchingService:
         
         found_item = dict(found_item)
         
-        # Get all lost items
-        lost_items = cursor.execute("""
-            SELECT l.rowid as id, l.*, c.name as category, loc.name as location
-            FROM lost_items l
-            LEFT JOIN categories c ON l.category_id = c.id
-            LEFT JOIN locations loc ON l.location_id = loc.id
-        """).fetchall()
-        
         conn.close()
         
+        # Score against every lost item in one vectorized pass
         matches = []
-        for lost_item in lost_items:
+        for lost_item, score_data in self.engine.top_matches('found', found_item, min_score, top_k):
             lost_item = dict(lost_item)
-            
-            # Calculate match score
-            score_data = self.calculate_match_score(lost_item, found_item)
-            
-            # Only include if above threshold
-            if score_data['match_score'] >= min_score:
-                matches.append({
-                    'lost_item_id': lost_item['id'],
-                    'lost_item': lost_item,
-                    **score_data
-                })
-        
-        # Sort by match score (descending)
-        matches.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        # Return top K matches
-        return matches[:top_k]
+            matches.append({
+                'lost_item_id': lost_item['id'],
+                'lost_item': lost_item,
+                **score_data
+            })
+        
+        return matches
     
-    def batch_match_all_items(self, min_score=0.8):
+    def batch_match_all_items(self, min_score=0.8, limit=None):
         """
         Find all potential matches between lost and found items
         
         Args:
             min_score: Minimum match score threshold (default 0.8 = 80%)
+            limit: Keep only the best N matches (default None = all matches)
             
         Returns:
-            List of all matches above threshold
+            List of all matches above threshold, sorted by match score
         """
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get all lost items
-        lost_items = cursor.execute("""
-            SELECT l.rowid as id, l.*, c.name as category, loc.name as location
-            FROM lost_items l
-            LEFT JOIN categories c ON l.category_id = c.id
-            LEFT JOIN locations loc ON l.location_id = loc.id
-        """).fetchall()
-        
-        # Get all found items (not claimed - check status field)
-        found_items = cursor.execute("""
-            SELECT f.rowid as id, f.*, c.name as category, loc.name as location
-            FROM found_items f
-            LEFT JOIN categories c ON f.category_id = c.id
-            LEFT JOIN locations loc ON f.location_id = loc.id
-            WHERE f.status != 'CLAIMED'
-        """).fetchall()
-        
-        conn.close()
-        
         all_matches = []
         
-        for lost_item in lost_items:
-            lost_item = dict(lost_item)
-            
-            for found_item in found_items:
-                found_item = dict(found_item)
-                
-                # Calculate match score
-                score_data = self.calculate_match_score(lost_item, found_item)
-                
-                # Only include if above threshold
-                if score_data['match_score'] >= min_score:
-                    all_matches.append({
-                        'lost_item_id': lost_item['id'],
-                        'found_item_id': found_item['id'],
-                        'lost_item_title': lost_item.get('title', ''),
-                        'found_item_title': found_item.get('title', ''),
-                        **score_data
-                    })
-        
-        # Sort by match score (descending)
-        all_matches.sort(key=lambda x: x['match_score'], reverse=True)
+        # Blocked lost x found matrix products with a bounded top-N heap
+        for lost_item, found_item, score_data in self.engine.all_pairs(min_score, limit):
+            all_matches.append({
+                'lost_item_id': lost_item['id'],
+                'found_item_id': found_item['id'],
+                'lost_item_title': lost_item['title'] or '',
+                'found_item_title': found_item['title'] or '',
+                **score_data
+            })
         
         return all_matches
 
 
+# Process-wide service instances, so long-running processes (schedulers)
+# load the sentence transformer once instead of on every run
+_shared_services = {}
+_shared_services_lock = threading.Lock()
+
+
+def get_shared_ml_service(db_path, model_path=None, upload_folder=None):
+    """
+    Get a long-lived MLMatchingService for this process, creating it on first use
+    
+    Args:
+        db_path: SQLite database file path
+        model_path: Pre-trained sentence transformer model directory
+        upload_folder: Directory containing uploaded item images
+        
+    Returns:
+        Tuple of (service, load_seconds) where load_seconds is 0.0 when the
+        warm instance was reused
+    """
+    key = (db_path, model_path, upload_folder)
+    with _shared_services_lock:
+        service = _shared_services.get(key)
+        if service is not None:
+            return service, 0.0
+        service = MLMatchingService(db_path, model_path=model_path, upload_folder=upload_folder)
+        _shared_services[key] = service
+        return service, service.load_seconds
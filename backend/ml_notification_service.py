@@ -5,7 +5,8 @@ Sends notifications to lost item owners when matching found items are reported
 
 import sqlite3
 from datetime import datetime
-from email_config import send_email
+from email_verification_service import send_email
+from mail_transport import get_outbox
 
 class MLNotificationService:
     def __init__(self, db_path, ml_service):
@@ -40,6 +41,7 @@ class MLNotificationService:
                 return 0
             
             # Get found item details
+            get_outbox()  # creates email_outbox before the emails below are queued on this connection
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
             
@@ -118,10 +120,13 @@ Best regards,
 TraceBack Team
 """
                     
-                    send_email(
+                    # Queue on this connection: it holds the write lock from the
+                    # previous match's notification row until the commit below
+                    email_queued = send_email(
                         to_email=owner_email,
                         subject=subject,
-                        body=body
+                        body=body,
+                        conn=conn
                     )
                     
                     # Log notification
@@ -140,7 +145,10 @@ TraceBack Team
                     ))
                     
                     notifications_sent += 1
-                    print(f"✅ Notification sent to {owner_email} for item {found_item_id} (match score: {match_score}%)")
+                    if email_queued:
+                        print(f"✅ Notification sent to {owner_email} for item {found_item_id} (match score: {match_score}%)")
+                    else:
+                        print(f"⚠️ Notification saved for {owner_email} but email was not queued (item {found_item_id})")
                     
                 except Exception as e:
                     print(f"❌ Error sending notification: {e}")
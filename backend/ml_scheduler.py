@@ -9,11 +9,19 @@ import os
 import time
 from datetime import datetime, timedelta
 import schedule
-from ml_matching_service import MLMatchingService
+from ml_matching_service import get_shared_ml_service
+from match_queue import store_match
+from match_changes import init_change_log, pending_changes, latest_change_id, needs_full_rebuild, mark_consumed
+from claim_window import repair_claim_window_drift
 from finder_decision_notification_scheduler import check_and_notify_finders, load_already_notified_finders
+from notification_fanout import create_fanout, run_fanout_jobs, template_literal, RECIPIENT_NAME
+from notification_digest import send_due_digests
+from email_verification_service import render_generic_email
+from mail_transport import get_outbox
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'traceback_100k.db')
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
+CHANGE_LOG_CONSUMER = 'ml_scheduler'
 
 def update_expired_privacy():
     """
@@ -28,7 +36,7 @@ def update_expired_privacy():
         
         # Get items where privacy period has expired (before updating)
         cursor.execute("""
-            SELECT rowid, title, category_id, location_id, finder_email, finder_name
+            SELECT rowid AS item_id, title, category_id, location_id, finder_email, finder_name
             FROM found_items 
             WHERE is_private = 1 
             AND datetime(privacy_expires_at) < datetime('now', 'localtime')
@@ -65,9 +73,12 @@ def send_public_item_notifications(items, conn):
     """
     Send email notifications to ALL users (except finder) when found items become public
     Only sends once per user per item (duplicate prevention)
+    
+    Each item becomes one fan-out job: recipients come from a single anti-join
+    against email_notifications and are queued in chunked transactions
+    (see notification_fanout.py)
     """
     try:
-        from email_verification_service import send_email
         cursor = conn.cursor()
         
         for item in items:
@@ -80,40 +91,18 @@ def send_public_item_notifications(items, conn):
             location = cursor.fetchone()
             location_name = location[0] if location else 'Unknown'
             
-            # Get ALL users except the finder
-            cursor.execute("""
-                SELECT email, full_name 
-                FROM users 
-                WHERE email != ? 
-                AND email IS NOT NULL
-            """, (item['finder_email'],))
-            
-            all_users = cursor.fetchall()
-            
-            for user in all_users:
-                # Check if notification already sent to this user for this item
-                cursor.execute("""
-                    SELECT notification_id 
-                    FROM email_notifications 
-                    WHERE found_item_id = ? 
-                    AND user_email = ? 
-                    AND notification_type = 'public_item'
-                """, (item['rowid'], user[0]))
-                
-                already_sent = cursor.fetchone()
-                if already_sent:
-                    continue  # Skip if already notified
-                
-                subject = f"🔔 New Public Found Item: {item['title']}"
-                body = f"""
-Dear {user[1] or 'User'},
+            # Item values are stored in the job, which is re-parsed for RECIPIENT_NAME
+            title = template_literal(item['title'])
+            subject = f"🔔 New Public Found Item: {template_literal(item['title'], html=False)}"
+            body = f"""
+Dear {RECIPIENT_NAME},
 
 A new found item is now publicly available on TraceBack!
 
 <strong>Item Details:</strong>
-- Title: {item['title']}
-- Category: {category_name}
-- Location: {location_name}
+- Title: {title}
+- Category: {template_literal(category_name)}
+- Location: {template_literal(location_name)}
 
 This item is now available for everyone to view and claim if it's yours.
 
@@ -127,58 +116,99 @@ This item is now available for everyone to view and claim if it's yours.
 Best regards,
 The TraceBack Team
                 """
-                
-                try:
-                    send_email(user[0], subject, body)
-                    
-                    # Record notification to prevent duplicates
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO email_notifications 
-                        (found_item_id, user_email, notification_type) 
-                        VALUES (?, ?, 'public_item')
-                    """, (item['rowid'], user[0]))
-                    conn.commit()
-                    
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 📧 Sent public item notification to {user[0]}")
-                except Exception as e:
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ❌ Failed to send email to {user[0]}: {e}")
+            
+            create_fanout(DB_PATH, item['item_id'], 'public_item', subject, render_generic_email(body),
+                          exclude_email=item['finder_email'], audience='all')
+        
+        queued = run_fanout_jobs(DB_PATH)
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 📧 Queued {queued} public item notification(s)")
                     
     except Exception as e:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [ERROR] Failed to send public item notifications: {e}")
 
-def run_ml_matching():
+
+def _filter_ids(cursor, query, ids):
+    """Keep only the ids that still satisfy query (which has one IN ({}) slot)"""
+    kept = []
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        kept.extend(row[0] for row in cursor.execute(query.format(placeholders), chunk).fetchall())
+    return kept
+
+
+def run_ml_matching(full_rebuild=False):
     """
-    Run ML matching for all unclaimed found items against all lost items
+    Run ML matching for items created or edited since the last run
+    (read from the ml_match_changes log). The first run, and the nightly
+    full_rebuild=True run, rescore every unclaimed found item against all lost items.
     Stores matches with scores >= 80% in ml_matches table for fast dashboard loading
+    
+    Args:
+        full_rebuild: Ignore the change log and rescore everything
     """
     try:
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         print(f"\n[{timestamp}] Starting ML Matching Process...")
         
-        # Initialize ML service
-        ml_service = MLMatchingService(
+        # Reuse the warm ML service held by this scheduler process
+        ml_service, load_seconds = get_shared_ml_service(
             db_path=DB_PATH,
             upload_folder=UPLOAD_FOLDER
         )
+        if load_seconds:
+            print(f"[{timestamp}] Model load time: {load_seconds:.2f}s (first run in this process)")
+        else:
+            print(f"[{timestamp}] Model load time: 0.00s (reusing warm model)")
+        match_started = time.perf_counter()
         
-        # Get all unclaimed found items
+        get_outbox(DB_PATH)  # creates email_outbox before store_match() queues inside the transaction
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
+        init_change_log(conn)
         
-        found_items = cursor.execute("""
-            SELECT rowid as id FROM found_items 
-            WHERE (status IS NULL OR status != 'CLAIMED')
-        """).fetchall()
+        if full_rebuild or needs_full_rebuild(conn, CHANGE_LOG_CONSUMER):
+            # Full rebuild: every unclaimed found item against all lost items
+            full_rebuild = True
+            watermark = latest_change_id(conn)
+            found_ids = [row[0] for row in cursor.execute("""
+                SELECT rowid FROM found_items 
+                WHERE (status IS NULL OR status != 'CLAIMED')
+            """).fetchall()]
+            lost_ids = []
+        else:
+            # Incremental: only items created/edited since the last run
+            watermark, changed_lost, changed_found = pending_changes(conn, CHANGE_LOG_CONSUMER)
+            found_ids = _filter_ids(cursor, """
+                SELECT rowid FROM found_items
+                WHERE (status IS NULL OR status != 'CLAIMED') AND rowid IN ({})
+            """, changed_found)
+            lost_ids = _filter_ids(cursor, """
+                SELECT rowid FROM lost_items
+                WHERE is_resolved = 0 AND rowid IN ({})
+            """, changed_lost)
         
-        lost_items = cursor.execute("""
-            SELECT rowid as id FROM lost_items
-            WHERE is_resolved = 0
-        """).fetchall()
+        # Embed new or edited descriptions and images once up front. Incremental runs
+        # only touch the changed items; the full rebuild re-checks (and prunes) everything
+        store = ml_service.embedding_store
+        if full_rebuild:
+            pruned = store.prune()
+            encoded = store.refresh_all()
+            images_embedded = ml_service.warm_image_features()
+        else:
+            pruned = 0
+            encoded = store.refresh_items('found', found_ids) + store.refresh_items('lost', lost_ids)
+            images_embedded = ml_service.warm_image_features(lost_ids=lost_ids, found_ids=found_ids)
+        print(f"[{timestamp}] Text embeddings refreshed: {encoded} encoded, {pruned} pruned")
+        print(f"[{timestamp}] Image features cached: {images_embedded} newly embedded")
         
-        found_count = len(found_items)
-        lost_count = len(lost_items)
+        found_count = len(found_ids)
+        lost_count = len(lost_ids)
         
-        print(f"[{timestamp}] Processing {found_count} found items against {lost_count} lost items...")
+        if full_rebuild:
+            print(f"[{timestamp}] Full rebuild: processing {found_count} found items against all lost items...")
+        else:
+            print(f"[{timestamp}] Incremental run: {found_count} changed found items, {lost_count} changed lost items")
         
         # Clean up orphaned matches (where items no longer exist)
         # This handles cases where lost items expired (3 days) or found items were claimed
@@ -199,10 +229,8 @@ def run_ml_matching():
         high_confidence = 0  # >= 80%
         stored_matches = 0
         
-        import json
-        
-        for found_item in found_items:
-            found_id = found_item[0]
+        # Changed/new found items x all lost items
+        for found_id in found_ids:
             try:
                 matches = ml_service.find_matches_for_found_item(
                     found_item_id=found_id,
@@ -210,169 +238,46 @@ def run_ml_matching():
                     top_k=10
                 )
                 
-                if matches:
-                    total_matches += len(matches)
-                    high_confidence += len([m for m in matches if m['match_score'] >= 0.8])
-                    
-                    # Store matches in database (only 80%+ matches are returned)
-                    for match in matches:
-                        try:
-                            # Additional verification: only store matches >= 80%
-                            if match['match_score'] >= 0.8:
-                                score_breakdown = json.dumps({
-                                    'description': match.get('description_similarity', 0),
-                                    'image': match.get('image_similarity', 0),
-                                    'location': match.get('location_similarity', 0),
-                                    'category': match.get('category_similarity', 0),
-                                    'color': match.get('color_similarity', 0),
-                                    'date': match.get('date_similarity', 0)
-                                })
-                                
-                                # Check if this match already exists and has email_sent = 1
-                                existing = cursor.execute('''
-                                    SELECT email_sent FROM ml_matches
-                                    WHERE found_item_id = ? AND lost_item_id = ?
-                                ''', (found_id, match['lost_item_id'])).fetchone()
-                                
-                                email_sent_value = existing[0] if existing and existing[0] else 0
-                                
-                                # Update match while preserving email_sent flag
-                                cursor.execute('''
-                                    INSERT OR REPLACE INTO ml_matches 
-                                    (found_item_id, lost_item_id, match_score, score_breakdown, computed_at, email_sent)
-                                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
-                                ''', (found_id, match['lost_item_id'], match['match_score'], score_breakdown, email_sent_value))
-                                
-                                stored_matches += 1
-                                
-                                # Log all matches above 70%
-                                score_pct = match['match_score'] * 100
-                                if match['match_score'] >= 0.8:
-                                    print(f"   [HIGH CONFIDENCE] Match: Found #{found_id} <-> Lost #{match['lost_item_id']} ({score_pct:.1f}%)")
-                                else:
-                                    print(f"   [MATCH] Found #{found_id} <-> Lost #{match['lost_item_id']} ({score_pct:.1f}%)")
-                            
-                            # Send email notification to lost item reporter (only once per match and only for 80%+ matches)
-                            try:
-                                # Only send email for matches >= 80%
-                                if match['match_score'] >= 0.8:
-                                    # Check if email was already sent for this match
-                                    email_sent = cursor.execute('''
-                                        SELECT email_sent FROM ml_matches
-                                        WHERE found_item_id = ? AND lost_item_id = ?
-                                    ''', (found_id, match['lost_item_id'])).fetchone()
-                                    
-                                    # Only send email if not already sent
-                                    if not email_sent or not email_sent[0]:
-                                        # Get lost item details with category and location
-                                        lost_item_data = cursor.execute('''
-                                            SELECT l.title, l.user_name, l.user_email, l.date_lost,
-                                                   c.name as category, loc.name as location
-                                            FROM lost_items l
-                                            LEFT JOIN categories c ON l.category_id = c.id
-                                            LEFT JOIN locations loc ON l.location_id = loc.id
-                                            WHERE l.id = ?
-                                        ''', (match['lost_item_id'],)).fetchone()
-                                        
-                                        # Get found item details
-                                        found_item_data = cursor.execute('''
-                                            SELECT f.title, f.date_found,
-                                                   c.name as category, loc.name as location
-                                            FROM found_items f
-                                            LEFT JOIN categories c ON f.category_id = c.id
-                                            LEFT JOIN locations loc ON f.location_id = loc.id
-                                            WHERE f.id = ?
-                                        ''', (found_id,)).fetchone()
-                                        
-                                        if lost_item_data and lost_item_data[2] and found_item_data:  # Has email
-                                            from email_verification_service import send_email
-                                            
-                                            reporter_name = lost_item_data[1]
-                                            reporter_email = lost_item_data[2]
-                                            
-                                            # Lost item details
-                                            lost_title = lost_item_data[0]
-                                            lost_date = lost_item_data[3]
-                                            lost_category = lost_item_data[4] or 'N/A'
-                                            lost_location = lost_item_data[5] or 'N/A'
-                                            
-                                            # Found item details
-                                            found_title = found_item_data[0]
-                                            found_date = found_item_data[1]
-                                            found_category = found_item_data[2] or 'N/A'
-                                            found_location = found_item_data[3] or 'N/A'
-                                            
-                                            match_score_pct = int(match['match_score'] * 100)
-                                            
-                                            subject = f"Potential Match Found for Your Lost Item - TraceBack"
-                                            body = f"""Hello {reporter_name},
-
-Good news! We found a potential match for your lost item report!
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-YOUR LOST ITEM:
-• Name: {lost_title}
-• Category: {lost_category}
-• Location: {lost_location}
-• Date Lost: {lost_date}
-
-MATCHED FOUND ITEM:
-• Name: {found_title}
-• Category: {found_category}
-• Location: {found_location}
-• Date Found: {found_date}
-
-MATCH CONFIDENCE: {match_score_pct}%
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-NEXT STEPS:
-
-1. Log in to TraceBack and go to your Dashboard
-2. In your Dashboard, you will see the matched found item for your lost item
-3. Review the full match details and if this looks like your item, submit a claim
-4. Provide accurate verification details - you have ONE claim attempt only
-5. The finder will review your answers to validate ownership
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Best regards,
-TraceBack Team
-Kent State University
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-This is an automated notification. Please do not reply to this email.
-                                            """
-                                            
-                                            send_email(reporter_email, subject, body)
-                                            
-                                            # Mark email as sent
-                                            cursor.execute('''
-                                                UPDATE ml_matches 
-                                                SET email_sent = 1
-                                                WHERE found_item_id = ? AND lost_item_id = ?
-                                            ''', (found_id, match['lost_item_id']))
-                                            
-                                            print(f"      [EMAIL] Notification sent to {reporter_email}")
-                            
-                            except Exception as email_error:
-                                print(f"      ⚠️  Could not send email notification: {email_error}")
-                        
-                        except Exception as e:
-                            print(f"   ⚠️  Error storing match: {e}")
+                total_matches += len(matches)
+                high_confidence += len([m for m in matches if m['match_score'] >= 0.8])
+                
+                # Store matches in database (only 80%+ matches are returned)
+                for match in matches:
+                    if store_match(cursor, found_id, match['lost_item_id'], match):
+                        stored_matches += 1
                 
             except Exception as e:
                 print(f"   ⚠️  Error matching found item #{found_id}: {e}")
         
+        # Changed/new lost items x all found items (incremental runs only)
+        for lost_id in lost_ids:
+            try:
+                matches = ml_service.find_matches_for_lost_item(
+                    lost_item_id=lost_id,
+                    min_score=0.8,
+                    top_k=10
+                )
+                
+                total_matches += len(matches)
+                high_confidence += len([m for m in matches if m['match_score'] >= 0.8])
+                
+                for match in matches:
+                    if store_match(cursor, match['found_item_id'], lost_id, match):
+                        stored_matches += 1
+                
+            except Exception as e:
+                print(f"   ⚠️  Error matching lost item #{lost_id}: {e}")
+        
         conn.commit()
+        mark_consumed(conn, CHANGE_LOG_CONSUMER, watermark, full_rebuild=full_rebuild)
         conn.close()
         
         print(f"[{timestamp}] ML Matching Complete!")
         print(f"   Total matches found (>=70%): {total_matches}")
         print(f"   Matches stored in database: {stored_matches}")
         print(f"   High confidence matches (>=80%): {high_confidence}")
-        print(f"   Average matches per found item: {total_matches/found_count if found_count > 0 else 0:.2f}")
+        print(f"   Items rescored: {found_count} found, {lost_count} lost")
+        print(f"   Matching time: {time.perf_counter() - match_started:.2f}s")
         
         return total_matches
         
@@ -438,26 +343,59 @@ def run_hourly_tasks():
     # First, update expired privacy items
     update_expired_privacy()
     
+    # Fix any drift in the precomputed claim window flag browse filters on
+    try:
+        repair_claim_window_drift(DB_PATH)
+    except Exception as e:
+        print(f"[WARNING] Claim window consistency check failed: {e}")
+    
     # Then run ML matching
     run_ml_matching()
     
     # Finally, check for finder decision notifications
     check_and_notify_finders()
     
+    # Events from this run go out in the digests of users due now
+    run_digests()
+    
+    # Pick up fan-outs a crashed process left half done
+    resume_fanouts()
+    
     print("="*60)
     print("HOURLY TASKS COMPLETED")
     print("="*60 + "\n")
 
+def run_digests():
+    """Send the notification digests whose window has elapsed"""
+    try:
+        send_due_digests(DB_PATH)
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [ERROR] Digest sending failed: {e}")
+
+def resume_fanouts():
+    """Finish fan-out jobs that are pending or were interrupted (stale 'running' jobs)"""
+    try:
+        queued = run_fanout_jobs(DB_PATH)
+        if queued:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 📧 Resumed fan-outs queued {queued} notification(s)")
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [ERROR] Resuming fan-out jobs failed: {e}")
+
 def run_scheduler():
     """Run the ML matching scheduler"""
     print("Starting ML Matching Scheduler for TrackeBack")
     print("Tasks will run:")
     print("  HOURLY:")
-    print("    1. Update expired privacy items (make public)")
-    print("    2. Run ML matching (>=80% confidence)")
+    print("    1. Update expired privacy items (make public), repair claim window flags")
+    print("    2. Run ML matching (>=80% confidence, new/edited items only)")
     print("    3. Notify finders when 3-day decision period ends")
+    print("  EVERY 15 MINUTES:")
+    print("    Send due notification digests (hourly/daily users)")
+    print("    Resume interrupted notification fan-outs")
     print("  DAILY (2:00 AM):")
     print("    4. Delete lost items older than 30 days")
+    print("  DAILY (3:00 AM):")
+    print("    5. Full ML matching rebuild (all items)")
     print("Press Ctrl+C to stop the scheduler\n")
     
     # Load already notified finders to avoid duplicate notifications
@@ -466,9 +404,18 @@ def run_scheduler():
     # Schedule hourly tasks
     schedule.every().hour.do(run_hourly_tasks)
     
+    # Digest windows are hourly or daily; check often so they go out on time
+    schedule.every(15).minutes.do(run_digests)
+    
+    # A fan-out whose process died is reclaimed once its heartbeat is FANOUT_STALE_SECONDS old
+    schedule.every(15).minutes.do(resume_fanouts)
+    
     # Schedule daily cleanup at 2:00 AM
     schedule.every().day.at("02:00").do(cleanup_old_lost_items)
     
+    # Nightly full rebuild catches anything the change log can't see (e.g. lookup table edits)
+    schedule.every().day.at("03:00").do(run_ml_matching, full_rebuild=True)
+    
     # Run tasks immediately on start
     print("Running initial tasks...")
     run_hourly_tasks()
@@ -0,0 +1,279 @@
+"""
+Notification Digests
+Users can get their match, public-item, claimed-item and decision-time
+notifications as one digest email per window instead of one email per event.
+users.digest_window picks the window: 'immediate', 'hourly' or 'daily'. NULL
+means DIGEST_DEFAULT_WINDOW ('immediate' unless configured), so nobody is moved
+to digests without opting in.
+
+Senders call defer_to_digest() (or split a batch with digest_windows()).
+For digest users the event is stored in notification_digest_events, and the
+caller records the usual dedup row as if the email had gone out.
+send_due_digests() runs from the scheduler. For every user whose oldest
+pending event is older than their window, it renders one email and queues it
+in the mail outbox. The events are deleted in the same transaction. Item
+details are read once per digest batch, not once per event.
+
+Usage:
+    python notification_digest.py          # send the digests that are due now
+    python notification_digest.py --all    # send every pending digest regardless of window
+"""
+
+import html
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from mail_transport import get_outbox
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traceback_100k.db')
+
+# Window name -> seconds events wait before the digest goes out
+DIGEST_WINDOWS = {'immediate': 0, 'hourly': 3600, 'daily': 86400}
+DIGEST_DEFAULT_WINDOW = os.environ.get('DIGEST_DEFAULT_WINDOW', 'immediate')
+if DIGEST_DEFAULT_WINDOW not in DIGEST_WINDOWS:
+    DIGEST_DEFAULT_WINDOW = 'immediate'
+DIGEST_USER_BATCH = 200
+
+EVENT_HEADINGS = {
+    'match': 'Potential matches for your lost items',
+    'decision_time': 'Items waiting for your decision',
+    'claimed': 'Items with a claimer (3 days left to compete)',
+    'public': 'Found items that are now public',
+    'public_item': 'Found items that are now public',
+}
+
+_digest_available = False
+
+
+def digest_available(conn):
+    """Whether users.digest_window and the events table exist (migration 5 applied)"""
+    global _digest_available
+    if not _digest_available:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(users)').fetchall()}
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'notification_digest_events'"
+        ).fetchall()}
+        _digest_available = 'digest_window' in columns and bool(tables)
+    return _digest_available
+
+
+def window_sql(column='u.digest_window'):
+    """SQL expression for a user's effective window"""
+    return f"COALESCE({column}, '{DIGEST_DEFAULT_WINDOW}')"
+
+
+def digest_windows(conn, emails):
+    """
+    Effective window per address (addresses without a user row get the default)
+
+    Returns:
+        Dictionary of email -> window name
+    """
+    windows = dict.fromkeys(emails, DIGEST_DEFAULT_WINDOW)
+    if not digest_available(conn):
+        return dict.fromkeys(emails, 'immediate')
+    emails = list(windows)
+    for start in range(0, len(emails), 500):
+        chunk = emails[start:start + 500]
+        rows = conn.execute(
+            f"SELECT email, {window_sql('digest_window')} FROM users WHERE email IN ({','.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+        windows.update(dict(rows))
+    return windows
+
+
+def add_events(conn, events):
+    """
+    Store digest events in the caller's transaction
+
+    Args:
+        conn: Connection or cursor
+        events: Iterable of (user_email, event_type, item_id, related_id, score)
+    """
+    events = list(events)
+    if not events:
+        return
+    conn.executemany('''
+        INSERT OR IGNORE INTO notification_digest_events
+        (user_email, event_type, item_id, related_id, score)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(email, event_type, item_id, related_id or 0, score) for email, event_type, item_id, related_id, score in events])
+
+
+def defer_to_digest(conn, user_email, event_type, item_id, related_id=None, score=None):
+    """
+    Store the event for the user's digest unless they get immediate emails
+
+    Args:
+        conn: Connection or cursor (the event commits with the caller's transaction)
+        user_email: Recipient
+        event_type: Key of EVENT_HEADINGS
+        item_id: Found item id
+        related_id: Lost item id for matches
+        score: Match score for matches
+
+    Returns:
+        True when the event went to the digest (the caller must not email now)
+    """
+    if digest_windows(conn, [user_email])[user_email] == 'immediate':
+        return False
+    add_events(conn, [(user_email, event_type, item_id, related_id, score)])
+    return True
+
+
+def _format_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%B %d, %Y')
+    except (TypeError, ValueError):
+        return value or 'N/A'
+
+
+def _item_details(conn, table, ids):
+    """Title/category/location/date of many items in one query per 500 ids"""
+    date_column = 'date_found' if table == 'found_items' else 'date_lost'
+    details = {}
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = conn.execute(f"""
+            SELECT i.rowid, i.title, c.name, l.name, i.{date_column}
+            FROM {table} i
+            LEFT JOIN categories c ON i.category_id = c.id
+            LEFT JOIN locations l ON i.location_id = l.id
+            WHERE i.rowid IN ({','.join('?' * len(chunk))})
+        """, chunk).fetchall()
+        for item_id, title, category, location, date in rows:
+            details[item_id] = {'title': title, 'category': category or 'N/A',
+                                'location': location or 'N/A', 'date': _format_date(date)}
+    return details
+
+
+def render_digest(name, events, found, lost):
+    """
+    Subject and HTML body of one user's digest
+
+    Args:
+        name: Recipient's display name
+        events: The user's event rows (event_type, item_id, related_id, score)
+        found: found_items details by id
+        lost: lost_items details by id
+    """
+    sections = []
+    for event_type, heading in EVENT_HEADINGS.items():
+        lines = []
+        for kind, item_id, related_id, score in events:
+            if kind != event_type or item_id not in found:
+                continue
+            item = found[item_id]
+            line = f"{html.escape(item['title'])} ({html.escape(item['category'])}, {html.escape(item['location'])}, found {html.escape(item['date'])})"
+            if kind == 'match' and related_id in lost:
+                line = (f"{line} matches your lost item {html.escape(lost[related_id]['title'])}"
+                        f" - {int((score or 0) * 100)}% match")
+            lines.append(f"<li>{line}</li>")
+        if lines:
+            sections.append(f"<h3>{heading}</h3><ul>{''.join(lines)}</ul>")
+
+    count = sum(1 for kind, item_id, _, _ in events if item_id in found)
+    subject = f"TraceBack digest: {count} update{'s' if count != 1 else ''}"
+    body = f"""<!DOCTYPE html>
+<html>
+<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <h2 style="color: #1a365d;">Your TraceBack updates</h2>
+    <p>Hello {html.escape(name or 'User')},</p>
+    {''.join(sections)}
+    <p>Log in to TraceBack to review matches, claim items or make decisions.</p>
+    <p style="color: #718096; font-size: 12px;">You receive these updates as a digest. Change how often in your profile settings.</p>
+</body>
+</html>"""
+    return subject, body, count
+
+
+def _due_users(conn, now, send_all):
+    rows = conn.execute(f"""
+        SELECT e.user_email, MIN(e.created_at), {window_sql()}, COALESCE(u.full_name, '')
+        FROM notification_digest_events e
+        LEFT JOIN users u ON u.email = e.user_email
+        GROUP BY e.user_email
+    """).fetchall()
+    due = []
+    for email, oldest, window, name in rows:
+        seconds = DIGEST_WINDOWS.get(window, DIGEST_WINDOWS[DIGEST_DEFAULT_WINDOW])
+        if send_all or datetime.strptime(oldest, '%Y-%m-%d %H:%M:%S') <= now - timedelta(seconds=seconds):
+            due.append((email, name))
+    return due
+
+
+def send_due_digests(db_path=DB_PATH, send_all=False):
+    """
+    Queue one digest email per user whose window has elapsed
+
+    Args:
+        db_path: Path to the SQLite database
+        send_all: Ignore the windows (flush everything)
+
+    Returns:
+        Number of digest emails queued
+    """
+    conn = sqlite3.connect(db_path, timeout=30.0, isolation_level=None)
+    try:
+        if not digest_available(conn):
+            return 0
+        outbox = get_outbox(db_path)
+        outbox.start()
+        started = time.perf_counter()
+        now = datetime.utcnow()  # created_at is CURRENT_TIMESTAMP (UTC)
+        due = _due_users(conn, now, send_all)
+        queued = events_sent = 0
+
+        for start in range(0, len(due), DIGEST_USER_BATCH):
+            batch = due[start:start + DIGEST_USER_BATCH]
+            emails = [email for email, _ in batch]
+            placeholders = ','.join('?' * len(emails))
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(f"""
+                    SELECT id, user_email, event_type, item_id, related_id, score
+                    FROM notification_digest_events
+                    WHERE user_email IN ({placeholders})
+                    ORDER BY id
+                """, emails).fetchall()
+                found = _item_details(conn, 'found_items', {row[3] for row in rows})
+                lost = _item_details(conn, 'lost_items', {row[4] for row in rows if row[2] == 'match'})
+
+                events_by_user = {}
+                for _, email, event_type, item_id, related_id, score in rows:
+                    events_by_user.setdefault(email, []).append((event_type, item_id, related_id, score))
+
+                messages = []
+                for email, name in batch:
+                    subject, body, count = render_digest(name, events_by_user.get(email, []), found, lost)
+                    if count:
+                        messages.append((email, subject, body))
+                outbox.enqueue_many(messages, conn)
+                conn.executemany('DELETE FROM notification_digest_events WHERE id = ?', [(row[0],) for row in rows])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            outbox.wake()
+            queued += len(messages)
+            events_sent += len(rows)
+
+        if queued:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 📧 Queued {queued} digest email(s) "
+                  f"covering {events_sent} notification(s) in {time.perf_counter() - started:.2f}s")
+        return queued
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    count = send_due_digests(os.environ.get('TRACEBACK_DB', DB_PATH), send_all='--all' in sys.argv)
+    print(f"[INFO] {count} digest email(s) queued")
+    if count:
+        get_outbox(os.environ.get('TRACEBACK_DB', DB_PATH)).flush()
@@ -0,0 +1,359 @@
+"""
+Notification Fan-out
+Sends one item notification (a found item became public, or got its first
+claimer) to every eligible user.
+
+A fan-out is a row in notification_fanout_jobs. Recipients are read in
+chunks of FANOUT_CHUNK with one anti-join against email_notifications,
+walking users by email. Each chunk is one short write transaction:
+- queue the chunk's messages in the mail outbox,
+- insert the chunk's dedup rows,
+- advance the job's cursor.
+A crash therefore loses or repeats nothing. A restarted run continues from
+the cursor, and the anti-join skips users already queued. SMTP delivery
+happens on the mail_transport worker pool, outside these transactions.
+Users on an hourly/daily digest get a digest event instead of an email
+(see notification_digest.py).
+The job's subject and body are parsed once per run (email_templates.py), so
+each recipient only costs the RECIPIENT_NAME substitution. Item values put
+into them must go through template_literal(), or a title containing
+{{recipient_name}} would be filled in per recipient too.
+
+Usage:
+    python notification_fanout.py                 # run pending/interrupted fan-outs
+    python notification_fanout.py --bench 10000   # time a fan-out to N synthetic users
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from mail_transport import get_outbox
+from email_templates import compile_template
+from notification_digest import digest_available, window_sql, add_events
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traceback_100k.db')
+
+FANOUT_CHUNK = int(os.environ.get('FANOUT_CHUNK', '500'))
+FANOUT_STALE_SECONDS = 600     # 'running' jobs not advanced for this long belonged to a dead process
+RECIPIENT_FIELD = 'recipient_name'
+RECIPIENT_NAME = '{{' + RECIPIENT_FIELD + '}}'  # replaced per recipient in subject/body
+
+# Who receives a fan-out (never the finder)
+AUDIENCES = {
+    'verified': 'u.is_active = 1 AND u.is_verified = 1',
+    'all': 'u.email IS NOT NULL',
+}
+
+RECIPIENTS_QUERY = """
+    SELECT u.email, COALESCE(u.full_name, ''), {window} FROM users u
+    WHERE {audience}
+      AND u.email != ?
+      AND u.email > ?
+      AND NOT EXISTS (
+          SELECT 1 FROM email_notifications en
+          WHERE en.found_item_id = ? AND en.user_email = u.email AND en.notification_type = ?
+      )
+    ORDER BY u.email
+    LIMIT ?
+"""
+
+
+def template_literal(value, html=True):
+    """
+    An item value to embed in a job's body (or subject, html=False) that can never
+    form a placeholder when the job is compiled
+
+    Args:
+        value: Item field (title, category, ...)
+        html: Use character references (the body is HTML); subjects are plain
+              text, so doubled braces are split with a space instead
+
+    Returns:
+        Text safe to store in the job
+    """
+    text = str(value)
+    if html:
+        return text.replace('{', '&#123;').replace('}', '&#125;')
+    return re.sub(r'([{}])(?=\1)', r'\1 ', text)
+
+
+def recipients_query(conn, audience):
+    """
+    Next chunk of recipients of a fan-out
+
+    Parameters: (exclude_email, cursor_email, item_id, notification_type, chunk_size)
+    """
+    window = window_sql() if digest_available(conn) else "'immediate'"
+    return RECIPIENTS_QUERY.format(audience=AUDIENCES[audience], window=window)
+
+
+def _connect(db_path):
+    return sqlite3.connect(db_path, timeout=30.0, isolation_level=None)
+
+
+def init_fanout_table(db_path=DB_PATH):
+    """Create the fan-out job table if it doesn't exist"""
+    conn = _connect(db_path)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS notification_fanout_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                found_item_id INTEGER NOT NULL,
+                notification_type TEXT NOT NULL,
+                audience TEXT NOT NULL,
+                exclude_email TEXT NOT NULL DEFAULT '',
+                subject TEXT NOT NULL,
+                html_body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                cursor_email TEXT NOT NULL DEFAULT '',
+                queued_count INTEGER NOT NULL DEFAULT 0,
+                heartbeat_at REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP,
+                UNIQUE(found_item_id, notification_type)
+            )
+        ''')
+    finally:
+        conn.close()
+
+
+def create_fanout(db_path, found_item_id, notification_type, subject, html_body,
+                  exclude_email='', audience='verified'):
+    """
+    Record a fan-out job (a second call for the same item and type is ignored)
+
+    Args:
+        db_path: Path to the SQLite database
+        found_item_id: Item the notification is about (dedup key with notification_type)
+        notification_type: email_notifications.notification_type, e.g. 'public'
+        subject: Subject line; may contain RECIPIENT_NAME (item values via template_literal(html=False))
+        html_body: HTML body; may contain RECIPIENT_NAME (item values via template_literal())
+        exclude_email: Address that never receives it (the finder)
+        audience: Key of AUDIENCES
+
+    Returns:
+        True when a new job was created
+    """
+    if audience not in AUDIENCES:
+        raise ValueError(f"Unknown audience: {audience}")
+    init_fanout_table(db_path)
+    conn = _connect(db_path)
+    try:
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO notification_fanout_jobs
+            (found_item_id, notification_type, audience, exclude_email, subject, html_body)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (found_item_id, notification_type, audience, exclude_email or '', subject, html_body))
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
+def _job_templates(subject, html_body):
+    """Subject and body parsed once per job; only RECIPIENT_NAME is rendered per recipient"""
+    return (compile_template(subject, (RECIPIENT_FIELD,), escape=False),
+            compile_template(html_body, (RECIPIENT_FIELD,)))
+
+
+def _personalize(templates, name):
+    subject, body = templates
+    name = name or 'User'
+    return subject.render(recipient_name=name), body.render(recipient_name=name)
+
+
+def _claim_job(conn):
+    """Take the oldest pending job, or a running one whose process stopped advancing it"""
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        job = conn.execute('''
+            SELECT id, found_item_id, notification_type, audience, exclude_email, subject, html_body, cursor_email
+            FROM notification_fanout_jobs
+            WHERE status = 'pending' OR (status = 'running' AND heartbeat_at < ?)
+            ORDER BY id
+            LIMIT 1
+        ''', (now - FANOUT_STALE_SECONDS,)).fetchone()
+        if job:
+            conn.execute(
+                "UPDATE notification_fanout_jobs SET status = 'running', heartbeat_at = ? WHERE id = ?",
+                (now, job[0])
+            )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return job
+
+
+def _run_chunk(conn, outbox, job_id, item_id, notification_type, audience, exclude_email,
+               templates, cursor_email, chunk_size):
+    """
+    Queue one chunk of recipients in a single transaction
+
+    Args:
+        templates: (subject, body) from _job_templates()
+
+    Returns:
+        Tuple of (recipients queued, new cursor email or None when the job is finished)
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        recipients = conn.execute(
+            recipients_query(conn, audience),
+            (exclude_email, cursor_email, item_id, notification_type, chunk_size)
+        ).fetchall()
+        # Digest users get the item in their next digest instead of an email now
+        outbox.enqueue_many(
+            [(email, *_personalize(templates, name))
+             for email, name, user_window in recipients if user_window == 'immediate'],
+            conn
+        )
+        add_events(conn, [(email, notification_type, item_id, None, None)
+                          for email, _, user_window in recipients if user_window != 'immediate'])
+        conn.executemany('''
+            INSERT OR IGNORE INTO email_notifications (found_item_id, user_email, notification_type)
+            VALUES (?, ?, ?)
+        ''', [(item_id, email, notification_type) for email, _, _ in recipients])
+
+        done = len(recipients) < chunk_size
+        next_cursor = recipients[-1][0] if recipients else cursor_email
+        conn.execute(f'''
+            UPDATE notification_fanout_jobs
+            SET cursor_email = ?, queued_count = queued_count + ?, heartbeat_at = ?,
+                status = ?{", finished_at = CURRENT_TIMESTAMP" if done else ""}
+            WHERE id = ?
+        ''', (next_cursor, len(recipients), time.time(), 'done' if done else 'running', job_id))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    if recipients:
+        outbox.wake()
+    return len(recipients), None if done else next_cursor
+
+
+def run_fanout_jobs(db_path=DB_PATH, chunk_size=None, deliver=True):
+    """
+    Run every pending (or interrupted) fan-out job to completion
+
+    Args:
+        db_path: Path to the SQLite database
+        chunk_size: Recipients per transaction (default FANOUT_CHUNK)
+        deliver: Also start this process's outbox workers (False only queues)
+
+    Returns:
+        Number of messages queued
+    """
+    chunk_size = chunk_size or FANOUT_CHUNK
+    init_fanout_table(db_path)
+    outbox = get_outbox(db_path)
+    if deliver:
+        outbox.start()
+    conn = _connect(db_path)
+    total = 0
+    try:
+        while True:
+            job = _claim_job(conn)
+            if job is None:
+                return total
+            job_id, item_id, notification_type, audience, exclude_email, subject, html_body, cursor_email = job
+            started = time.perf_counter()
+            templates = _job_templates(subject, html_body)
+            queued = 0
+            while cursor_email is not None:
+                count, cursor_email = _run_chunk(
+                    conn, outbox, job_id, item_id, notification_type, audience, exclude_email,
+                    templates, cursor_email, chunk_size
+                )
+                queued += count
+            total += queued
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 📧 Fan-out '{notification_type}' for item "
+                  f"{item_id}: {queued} recipient(s) notified in {time.perf_counter() - started:.2f}s")
+    finally:
+        conn.close()
+
+
+_runner_lock = threading.Lock()
+_runner_threads = {}
+
+
+def start_fanout(db_path, found_item_id, notification_type, subject, html_body,
+                 exclude_email='', audience='verified'):
+    """
+    Create a fan-out job and run it on this process's background fan-out thread
+
+    Returns:
+        True when a new job was created
+    """
+    created = create_fanout(db_path, found_item_id, notification_type, subject, html_body, exclude_email, audience)
+    key = os.path.abspath(db_path)
+    with _runner_lock:
+        thread = _runner_threads.get(key)
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_runner, args=(db_path, key), name='notification-fanout', daemon=True)
+            _runner_threads[key] = thread
+            thread.start()
+    return created
+
+
+def _runner(db_path, key):
+    """Drain fan-out jobs; jobs created while running are picked up before the thread exits"""
+    try:
+        while True:
+            run_fanout_jobs(db_path)
+            with _runner_lock:
+                conn = _connect(db_path)
+                try:
+                    pending = conn.execute(
+                        "SELECT 1 FROM notification_fanout_jobs WHERE status = 'pending' LIMIT 1"
+                    ).fetchone()
+                finally:
+                    conn.close()
+                if not pending:
+                    _runner_threads.pop(key, None)
+                    return
+    except Exception as e:
+        with _runner_lock:
+            _runner_threads.pop(key, None)
+        print(f"❌ Notification fan-out failed: {e}")
+
+
+def _bench(user_count):
+    """Fan out one item to `user_count` synthetic users in a scratch database"""
+    folder = tempfile.mkdtemp(prefix='fanout_bench_')
+    db_path = os.path.join(folder, 'bench.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE NOT NULL, full_name TEXT,
+                            is_active BOOLEAN DEFAULT 1, is_verified BOOLEAN DEFAULT 1);
+        CREATE TABLE email_notifications (notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            found_item_id INTEGER, user_email TEXT, notification_type TEXT,
+                            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            UNIQUE(found_item_id, user_email, notification_type));
+    ''')
+    conn.executemany('INSERT INTO users (email, full_name) VALUES (?, ?)',
+                     [(f'user{i:06d}@kent.edu', f'User {i}') for i in range(user_count)])
+    conn.commit()
+    conn.close()
+
+    body = '<p>Hello ' + RECIPIENT_NAME + ',</p>' + '<p>x</p>' * 200
+    create_fanout(db_path, 1, 'public', 'New found item', body, exclude_email='user000000@kent.edu')
+    started = time.perf_counter()
+    queued = run_fanout_jobs(db_path, deliver=False)
+    elapsed = time.perf_counter() - started
+    print(f"Queued {queued} emails for {user_count} users in {elapsed:.2f}s "
+          f"({queued / elapsed:.0f}/s, chunk={FANOUT_CHUNK}); outbox: {get_outbox(db_path).depth()}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3 and sys.argv[1] == '--bench':
+        _bench(int(sys.argv[2]))
+    else:
+        queued = run_fanout_jobs(os.environ.get('TRACEBACK_DB', DB_PATH))
+        print(f"[INFO] {queued} email(s) queued")
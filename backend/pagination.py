@@ -0,0 +1,199 @@
+"""
+Keyset Pagination
+Opaque cursor tokens for list endpoints. A cursor holds the sort key of the
+last row on a page and the next page is read with a WHERE on that key instead
+of OFFSET, so page 1000 costs the same as page 1. Total counts are optional
+and can be served from a short-lived cache.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+
+COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL', '60'))
+COUNT_MODES = ('exact', 'cached', 'none')
+COUNT_CACHE_MAX = 1024
+
+
+class InvalidCursor(ValueError):
+    """Cursor token that is malformed or belongs to another list"""
+
+
+class Keyset:
+    """Sort key of one list, and the SQL to page through it by cursor"""
+
+    def __init__(self, scope, keys):
+        """
+        Args:
+            scope: Name of the list (cursors from other lists are rejected)
+            keys: [(sql_expression, descending), ...]; the last key must be unique (e.g. rowid)
+        """
+        self.scope = scope
+        self.keys = keys
+
+    def select_sql(self):
+        """Extra SELECT columns carrying the sort key values (removed again by page())"""
+        return ', '.join(f'{expr} AS _key{i}' for i, (expr, _) in enumerate(self.keys))
+
+    def order_sql(self):
+        return ', '.join(f"{expr} {'DESC' if desc else 'ASC'}" for expr, desc in self.keys)
+
+    def condition(self, values):
+        """
+        WHERE condition selecting the rows after a cursor position
+
+        Returns:
+            Tuple of (sql, params)
+        """
+        directions = {desc for _, desc in self.keys}
+        if len(directions) == 1:
+            # A row-value comparison lets SQLite seek the index directly
+            op = '<' if directions.pop() else '>'
+            columns = ', '.join(expr for expr, _ in self.keys)
+            return f"({columns}) {op} ({', '.join('?' * len(values))})", list(values)
+
+        # Mixed directions: (a > ?) OR (a = ? AND b < ?) OR ...
+        clauses, params = [], []
+        for i, (expr, desc) in enumerate(self.keys):
+            parts = [f'{prev} = ?' for prev, _ in self.keys[:i]]
+            parts.append(f"{expr} {'<' if desc else '>'} ?")
+            clauses.append(f"({' AND '.join(parts)})")
+            params.extend(values[:i + 1])
+        return f"({' OR '.join(clauses)})", params
+
+    def encode(self, values):
+        payload = json.dumps({'s': self.scope, 'v': list(values)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, token):
+        """
+        Sort key values of a cursor token
+
+        Returns:
+            List of values, or None for an empty token (first page)
+
+        Raises:
+            InvalidCursor: Token is malformed or from another list
+        """
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['v']
+            valid = payload['s'] == self.scope and isinstance(values, list) and len(values) == len(self.keys)
+        except (ValueError, TypeError, KeyError):
+            valid = False
+        if not valid:
+            raise InvalidCursor('Invalid cursor')
+        return values
+
+    def page(self, rows, limit):
+        """
+        Split a result fetched with LIMIT limit + 1 into the page and the next cursor
+
+        Returns:
+            Tuple of (list of row dictionaries, next cursor token or None)
+        """
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and items:
+            next_cursor = self.encode([items[-1][f'_key{i}'] for i in range(len(self.keys))])
+        for item in items:
+            for i in range(len(self.keys)):
+                item.pop(f'_key{i}', None)
+        return items, next_cursor
+
+
+def page_sql(template, keyset, cursor_mode, position=None, default_order='', **fields):
+    """
+    Fill a page template for page-number or cursor mode
+
+    Args:
+        template: SQL with {key_columns}, {seek} and {order} slots
+        keyset: Keyset of the list
+        cursor_mode: Select the keyset columns and order by the keyset
+        position: Decoded cursor to seek past (None for the first page)
+        default_order: ORDER BY of page-number mode
+        **fields: Other slots of the template
+
+    Returns:
+        Tuple of (sql, parameters of the seek condition)
+    """
+    if not cursor_mode:
+        return template.format(key_columns='', seek='', order=default_order, **fields), []
+    seek, params = '', []
+    if position:
+        condition, params = keyset.condition(position)
+        seek = f' AND {condition}'
+    sql = template.format(key_columns=f', {keyset.select_sql()}', seek=seek, order=keyset.order_sql(), **fields)
+    return sql, params
+
+
+class CountCache:
+    """COUNT(*) results cached for a few seconds, keyed by query and parameters"""
+
+    def __init__(self, ttl=COUNT_CACHE_TTL, max_entries=COUNT_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, conn, sql, params=()):
+        key = (sql, tuple(params))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                return entry[0]
+
+        count = conn.execute(sql, params).fetchone()[0]
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries, then the oldest if still full
+                self._entries = {k: v for k, v in self._entries.items() if now - v[1] < self.ttl}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(min(self._entries, key=lambda k: self._entries[k][1]))
+            self._entries[key] = (count, now)
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def total_count(conn, mode, sql, params=()):
+    """
+    Total row count according to the requested count mode
+
+    Args:
+        conn: Database connection
+        mode: 'exact' (run the COUNT), 'cached' (reuse a recent result) or 'none'
+        sql: COUNT(*) query
+        params: Query parameters
+
+    Returns:
+        Count, or None for mode 'none'
+    """
+    if mode == 'none':
+        return None
+    if mode == 'cached':
+        return count_cache.get(conn, sql, params)
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def cursor_pagination(limit, cursor, next_cursor, total):
+    """Pagination block of a cursor-mode response"""
+    return {
+        'mode': 'cursor',
+        'limit': limit,
+        'cursor': cursor or None,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None,
+        'total': total,
+    }
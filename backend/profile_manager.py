@@ -7,6 +7,9 @@ Handles user profile creation, updates, and image uploads
 from flask import Flask, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 import sqlite3
+from db_pool import pooled_connect
+from response_cache import response_cache
+from notification_digest import DIGEST_WINDOWS, DIGEST_DEFAULT_WINDOW, digest_available
 import os
 import uuid
 from datetime import datetime
@@ -75,19 +78,25 @@ def get_user_profile(user_id):
     """Get complete user profile by ID"""
     conn = None
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=20.0)
-        conn.row_factory = sqlite3.Row
+        conn = pooled_connect(DB_PATH, row_factory=sqlite3.Row)
         cursor = conn.cursor()
         
-        cursor.execute("""
+        # Before migration 5 there is no digest_window column: everyone gets immediate emails
+        if digest_available(conn):
+            digest_column, digest_default = 'COALESCE(digest_window, ?)', DIGEST_DEFAULT_WINDOW
+        else:
+            digest_column, digest_default = '?', 'immediate'
+        
+        cursor.execute(f"""
             SELECT id, email, first_name, last_name, full_name, student_id,
                    profile_image, bio, interests, phone_number, year_of_study, 
                    major, building_preference, notification_preferences, 
                    privacy_settings, profile_completed, profile_updated_at,
-                   created_at, last_login, is_verified
+                   created_at, last_login, is_verified,
+                   {digest_column} as digest_window
             FROM users 
             WHERE id = ? AND is_active = 1
-        """, (user_id,))
+        """, (digest_default, user_id))
         
         user = cursor.fetchone()
         
@@ -110,9 +119,8 @@ def update_user_profile(user_id, profile_data):
     """Update user profile with new data"""
     conn = None
     try:
-        # Use timeout and isolation level to prevent locking
-        conn = sqlite3.connect(DB_PATH, timeout=20.0, isolation_level='DEFERRED')
-        conn.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging for better concurrency
+        # Pooled connection (busy timeout and WAL are set once by db_pool)
+        conn = pooled_connect(DB_PATH)
         cursor = conn.cursor()
         
         # Build dynamic update query
@@ -125,6 +133,16 @@ def update_user_profile(user_id, profile_data):
             'notification_preferences', 'privacy_settings', 'profile_image'
         }
         
+        digest_window = profile_data.get('digest_window')
+        if digest_window is not None:
+            if digest_window not in DIGEST_WINDOWS:
+                return False, f"digest_window must be one of: {', '.join(DIGEST_WINDOWS)}"
+            if digest_available(conn):
+                allowed_fields.add('digest_window')
+            elif digest_window != 'immediate':
+                # Column is added by migration 5; 'immediate' (what GET reports) is a no-op
+                return False, "Notification digests are not available yet"
+        
         for field, value in profile_data.items():
             if field in allowed_fields and value is not None:
                 update_fields.append(f"{field} = ?")
@@ -160,6 +178,8 @@ def update_user_profile(user_id, profile_data):
         
         success = cursor.rowcount > 0
         conn.commit()
+        if success:
+            response_cache.invalidate(f'user:{user_id}')  # public profile shows the name
         
         return success, "Profile updated successfully" if success else "User not found"
         
@@ -213,7 +233,7 @@ def create_profile_endpoints(app):
             
             # Get current user data to verify identity
             try:
-                conn = sqlite3.connect(DB_PATH, timeout=20.0)
+                conn = pooled_connect(DB_PATH)
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT first_name, last_name, student_id 
@@ -408,7 +428,7 @@ def create_profile_endpoints(app):
     def get_profile_stats():
         """Get profile completion statistics"""
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = pooled_connect(DB_PATH)
             cursor = conn.cursor()
             
             # Get profile completion stats
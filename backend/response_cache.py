@@ -0,0 +1,187 @@
+"""
+Response Cache
+In-process TTL/LRU cache for read-mostly GET endpoints. Cached responses
+carry an ETag and Last-Modified so browsers revalidate with a 304 instead of
+downloading the body again. Entries are tagged (e.g. 'categories',
+'user:12') and write endpoints drop them with invalidate(tag).
+"""
+
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, g, make_response, request
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '1024'))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+
+
+class CachedResponse:
+    """One stored response body with its validators"""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'last_modified', 'expires', 'tags')
+
+    def __init__(self, body, mimetype, ttl, tags):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()
+        # HTTP dates have one-second resolution
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.expires = time.monotonic() + ttl
+        self.tags = tags
+
+    def respond(self, private=False):
+        """Full response, or 304 when the request's If-None-Match/If-Modified-Since still match"""
+        response = current_app.response_class(self.body, mimetype=self.mimetype)
+        response.set_etag(self.etag)
+        response.last_modified = self.last_modified
+        # Clients may store it but must revalidate, so invalidation is seen immediately
+        response.cache_control.no_cache = True
+        if private:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    """LRU of CachedResponse entries with per-entry TTL and tag invalidation"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, default_ttl=RESPONSE_CACHE_TTL):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            default_ttl: Seconds an entry lives when the endpoint gives no TTL
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._tags = {}           # tag -> set of keys
+        self._generation = 0      # bumped by every invalidation
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0, 'evictions': 0, 'expired': 0}
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for tag in entry.tags:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tags[tag]
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._drop(key)
+                self.stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def store(self, key, body, mimetype, ttl=None, tags=(), generation=None):
+        """
+        Store a response body
+
+        Args:
+            generation: Value of generation() before the body was computed; when an
+                invalidation happened since, the body may be stale and is not stored
+
+        Returns:
+            The CachedResponse (stored or not)
+        """
+        entry = CachedResponse(body, mimetype, self.default_ttl if ttl is None else ttl, tuple(tags))
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+        return entry
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the tags"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def record(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['entries'] = len(self._entries)
+            metrics['max_entries'] = self.max_entries
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 3) if lookups else None
+        return metrics
+
+
+response_cache = ResponseCache()
+
+
+def tag_response(*tags):
+    """Add invalidation tags to the response being cached (tags known only inside the view)"""
+    g.setdefault('_response_cache_tags', []).extend(tags)
+
+
+def cached_response(tags=(), ttl=None, private=False, cache=None):
+    """
+    Cache a GET view's 200 responses, keyed by path and query string
+
+    Args:
+        tags: Invalidation tags; may use the view's URL arguments, e.g. 'user:{user_id}'
+        ttl: Entry lifetime in seconds (defaults to the cache's TTL)
+        private: Cache-Control private (per-user data) instead of public
+        cache: ResponseCache to use (defaults to the shared one)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            store = cache or response_cache
+            key = (view.__name__, request.full_path)
+            entry = store.get(key)
+            if entry is None:
+                generation = store.generation()
+                g._response_cache_tags = []
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry_tags = [tag.format(**kwargs) for tag in tags] + g.pop('_response_cache_tags', [])
+                entry = store.store(key, response.get_data(), response.mimetype, ttl, entry_tags, generation)
+            response = entry.respond(private)
+            if response.status_code == 304:
+                store.record('not_modified')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,96 @@
+"""
+Full-Text Item Search
+Query helpers for the item_search FTS5 index (created and kept in sync by
+migration 2 in migrations.py). User input is turned into a prefix query,
+results are ranked with bm25 and matching text is highlighted with snippet().
+snippet() output is item text, so it goes through highlight_snippet() (HTML
+escaping, then the <mark> tags) before it is returned to the browser.
+"""
+
+import html
+import re
+
+SEARCH_TABLE = 'item_search'
+# bm25 column weights, in table column order:
+# item_type, item_id (unindexed), title, description, color, category, location
+BM25_WEIGHTS = (0.0, 0.0, 10.0, 4.0, 2.0, 2.0, 2.0)
+TITLE_COLUMN = 2
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# snippet() wraps matches in these private-use characters, which survive html.escape()
+SNIPPET_OPEN = '\ue000'
+SNIPPET_CLOSE = '\ue001'
+SNIPPET_TOKENS = 12
+# Longer queries are cut to this many terms
+MAX_TERMS = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_index_available = False
+
+
+def build_match_query(text, columns=None):
+    """
+    Turn free-form user input into an FTS5 MATCH expression
+
+    Every word becomes a quoted prefix term ("wal"* matches wallet); all terms
+    must match. FTS5 operators and punctuation in the input are ignored.
+
+    Args:
+        text: Search box input
+        columns: Optional list of columns to restrict the match to
+
+    Returns:
+        MATCH expression, or None when the input has no searchable words
+    """
+    terms = _TOKEN_RE.findall(text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    expression = ' '.join(f'"{term.lower()}"*' for term in terms)
+    if columns:
+        expression = f"{{{' '.join(columns)}}} : ({expression})"
+    return expression
+
+
+def search_index_available(conn):
+    """Whether the item_search table exists (FTS5 builds without it fall back to LIKE)"""
+    global _index_available
+    if not _index_available:
+        _index_available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+        ).fetchone() is not None
+    return _index_available
+
+
+def rank_expression():
+    """bm25() call with the column weights (lower = more relevant)"""
+    return f"bm25({SEARCH_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})"
+
+
+def snippet_expression(column=-1):
+    """snippet() call marking matches (column -1 = best matching column); render with highlight_snippet()"""
+    return (
+        f"snippet({SEARCH_TABLE}, {column}, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS})"
+    )
+
+
+def highlight_snippet(snippet):
+    """
+    HTML of a snippet() result: the item text escaped, matches wrapped in HIGHLIGHT_START/END
+
+    Args:
+        snippet: Value of a snippet_expression() column (may be None)
+
+    Returns:
+        Safe HTML string, or None
+    """
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_OPEN, HIGHLIGHT_START).replace(SNIPPET_CLOSE, HIGHLIGHT_END)
+
+
+def matching_ids_clause(item_type):
+    """
+    SQL fragment selecting item rowids that match a MATCH expression parameter,
+    for use as `x.rowid IN (...)`
+    """
+    return f"SELECT item_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ? AND item_type = '{item_type}'"
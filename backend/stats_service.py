@@ -0,0 +1,181 @@
+"""
+Stats Snapshot Service
+/api/stats is served from an in-memory snapshot instead of running every
+aggregate per request. A snapshot older than STATS_TTL is returned as-is
+while one background thread recomputes it; concurrent callers that need a
+fresh computation (no snapshot yet, or older than STATS_MAX_STALE) wait on
+that single computation instead of starting their own.
+"""
+
+import os
+import threading
+import time
+from datetime import timedelta
+
+STATS_TTL = float(os.environ.get('STATS_TTL', '30'))
+STATS_MAX_STALE = float(os.environ.get('STATS_MAX_STALE', '300'))
+
+TOP_GROUPS_QUERY = """
+    SELECT {columns},
+           COALESCE(l.n, 0) as lost_count,
+           COALESCE(f.n, 0) as found_count
+    FROM {table} g
+    LEFT JOIN (SELECT {key}, COUNT(*) AS n FROM lost_items WHERE is_resolved = 0 GROUP BY {key}) l
+           ON l.{key} = g.id
+    LEFT JOIN (SELECT {key}, COUNT(*) AS n FROM found_items WHERE is_claimed = 0 GROUP BY {key}) f
+           ON f.{key} = g.id
+    ORDER BY lost_count + found_count DESC, g.id
+    LIMIT 5
+"""
+
+
+def compute_stats(conn, now):
+    """
+    Run the /api/stats aggregates (a handful of grouped scans instead of one query per number)
+
+    Args:
+        conn: Connection with sqlite3.Row row factory
+        now: Current ET datetime
+
+    Returns:
+        Stats dictionary in the /api/stats response shape
+    """
+    seven_days_ago = (now - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+
+    found = conn.execute("""
+        SELECT COUNT(*) as total,
+               COALESCE(SUM(is_claimed = 0), 0) as active,
+               COALESCE(SUM(created_at >= ?), 0) as recent,
+               COALESCE(SUM(is_private = 1 AND datetime(privacy_expires_at) > datetime('now')), 0) as private
+        FROM found_items
+    """, (seven_days_ago,)).fetchone()
+    returns = conn.execute("""
+        SELECT COUNT(*) as total, COALESCE(SUM(finalized_at >= ?), 0) as recent
+        FROM successful_returns
+    """, (seven_days_ago,)).fetchone()
+    lost = conn.execute("""
+        SELECT COALESCE(SUM(is_resolved = 0), 0) as active, COALESCE(SUM(created_at >= ?), 0) as recent
+        FROM lost_items
+    """, (seven_days_ago,)).fetchone()
+    lookups = conn.execute("""
+        SELECT (SELECT COUNT(*) FROM categories) as categories,
+               (SELECT COUNT(*) FROM locations) as locations
+    """).fetchone()
+
+    stats = {}
+    # Total found items (including historical ones from successful_returns)
+    stats['total_found_items'] = found['total'] + returns['total']
+    stats['items_claimed'] = returns['total']
+    stats['active_found_items'] = found['active']
+    # Found items posted this week - from both active and finalized
+    stats['found_this_week'] = found['recent'] + returns['recent']
+
+    # Legacy stats for compatibility
+    stats['active_lost_items'] = lost['active']
+    stats['unclaimed_found_items'] = stats['active_found_items']
+    stats['recent_found_items'] = stats['found_this_week']
+    stats['total_categories'] = lookups['categories']
+    stats['total_locations'] = lookups['locations']
+    stats['recent_lost_items'] = lost['recent']
+    stats['private_found_items'] = found['private']
+
+    stats['top_categories'] = [dict(row) for row in conn.execute(
+        TOP_GROUPS_QUERY.format(columns='g.name', table='categories', key='category_id')
+    ).fetchall()]
+    stats['top_locations'] = [dict(row) for row in conn.execute(
+        TOP_GROUPS_QUERY.format(columns='g.name, g.building_code', table='locations', key='location_id')
+    ).fetchall()]
+
+    stats['total_items'] = stats['active_lost_items'] + stats['unclaimed_found_items']
+    stats['recent_total'] = stats['recent_lost_items'] + stats['recent_found_items']
+    return stats
+
+
+class StatsSnapshot:
+    """Single-flight, stale-while-revalidate cache around one computation"""
+
+    def __init__(self, compute, ttl=STATS_TTL, max_stale=STATS_MAX_STALE):
+        """
+        Args:
+            compute: Callable returning a fresh stats dictionary
+            ttl: Seconds a snapshot is served without triggering a refresh
+            max_stale: Seconds after which callers wait for a refresh instead of getting the old snapshot
+        """
+        self.compute = compute
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self._value = None
+        self._computed_at = None      # time.time() of the current snapshot
+        self._lock = threading.Lock()
+        self._done = None             # Event of the computation in flight, if any
+        self._error = None
+        self.stats = {'hits': 0, 'stale_hits': 0, 'refreshes': 0, 'waits': 0, 'errors': 0}
+
+    def _refresh(self, done):
+        try:
+            value = self.compute()
+            with self._lock:
+                self._value, self._computed_at, self._error = value, time.time(), None
+                self.stats['refreshes'] += 1
+        except Exception as e:
+            with self._lock:
+                self._error = e
+                self.stats['errors'] += 1
+            print(f"[WARNING] Stats refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._done = None
+            done.set()
+
+    def _start_refresh(self):
+        """Start a computation unless one is running (call with the lock held); returns its Event"""
+        if self._done is None:
+            self._done = threading.Event()
+            return self._done, True
+        return self._done, False
+
+    def get(self):
+        """
+        Current snapshot, refreshing it when needed
+
+        Returns:
+            Tuple of (stats dictionary, snapshot age in seconds)
+        """
+        with self._lock:
+            age = None if self._computed_at is None else time.time() - self._computed_at
+            if age is not None and age < self.ttl:
+                self.stats['hits'] += 1
+                return self._value, age
+
+            done, owner = self._start_refresh()
+            if age is not None and age < self.max_stale:
+                # Serve the stale snapshot; the refresh runs in the background
+                self.stats['stale_hits'] += 1
+                if owner:
+                    threading.Thread(target=self._refresh, args=(done,), name='stats-refresh', daemon=True).start()
+                return self._value, age
+            if not owner:
+                self.stats['waits'] += 1
+
+        # No usable snapshot: compute here, or wait for the caller already computing
+        if owner:
+            self._refresh(done)
+        else:
+            done.wait()
+
+        with self._lock:
+            if self._value is None:
+                raise self._error or RuntimeError('Stats unavailable')
+            return self._value, time.time() - self._computed_at
+
+    def invalidate(self):
+        """Force the next get() to recompute"""
+        with self._lock:
+            self._computed_at = None if self._value is None else self._computed_at - self.max_stale
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['age_seconds'] = None if self._computed_at is None else round(time.time() - self._computed_at, 1)
+            metrics['ttl'] = self.ttl
+        return metrics
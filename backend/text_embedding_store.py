@@ -0,0 +1,329 @@
+"""
+Persistent Text Embedding Store
+Caches sentence transformer embeddings of lost/found item descriptions in SQLite
+so each description is encoded once instead of once per compared pair
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+# Item embeddings kept in memory (~1.5 KB each at 384 dims); older ones are re-read from SQLite
+EMBEDDING_MEMORY_LIMIT = int(os.environ.get('EMBEDDING_MEMORY_LIMIT', '20000'))
+
+ITEM_TABLES = {
+    'lost': 'lost_items',
+    'found': 'found_items',
+}
+
+
+def content_hash(text, model_key=''):
+    """
+    Stable fingerprint of a description for the model that embedded it
+
+    Args:
+        text: Description text
+        model_key: Identifier of the embedding model (changes invalidate the hash)
+
+    Returns:
+        Hex digest string
+    """
+    return hashlib.sha1(f"{model_key}\0{text or ''}".encode('utf-8')).hexdigest()
+
+
+def normalize_rows(vectors):
+    """L2-normalize embedding rows so cosine similarity becomes a dot product"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class TextEmbeddingStore:
+    def __init__(self, db_path, encoder, model_key='', batch_size=64, memory_limit=EMBEDDING_MEMORY_LIMIT):
+        """
+        Initialize embedding store backed by the text_embeddings side table
+
+        Args:
+            db_path: SQLite database file path
+            encoder: Callable taking a list of strings and returning an (n, dim) array
+            model_key: Identifier of the embedding model, folded into content hashes
+            batch_size: Number of descriptions encoded per model call
+            memory_limit: Most item embeddings kept in memory (least recently used are dropped)
+        """
+        self.db_path = db_path
+        self.encoder = encoder
+        self.model_key = model_key
+        self.batch_size = batch_size
+        self.memory_limit = max(0, memory_limit)
+
+        # (item_type, item_id) -> (content_hash, normalized vector), least recently used first
+        self._memory = OrderedDict()
+        # content_hash -> normalized vector, for ad-hoc text without a row
+        self._adhoc = {}
+        self._lock = threading.Lock()
+
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'encoded': 0}
+
+        self.init_embeddings_table()
+
+    def get_db_connection(self):
+        """Get database connection"""
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_embeddings_table(self):
+        """Create text_embeddings table if it doesn't exist"""
+        conn = self.get_db_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS text_embeddings (
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                embedding BLOB NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (item_type, item_id)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _encode(self, texts):
+        """Encode texts in batches and return normalized float32 rows"""
+        chunks = []
+        for start in range(0, len(texts), self.batch_size):
+            chunks.append(normalize_rows(self.encoder(texts[start:start + self.batch_size])))
+        self.stats['encoded'] += len(texts)
+        return np.vstack(chunks)
+
+    def embed_text(self, text):
+        """
+        Embed free text that is not tied to a stored item (cached by content hash)
+
+        Args:
+            text: Description text
+
+        Returns:
+            Normalized embedding vector, or None for empty text
+        """
+        if not text:
+            return None
+
+        digest = content_hash(text, self.model_key)
+        vector = self._adhoc.get(digest)
+        if vector is None:
+            vector = self._encode([text])[0]
+            with self._lock:
+                if len(self._adhoc) >= 10000:
+                    self._adhoc.clear()
+                self._adhoc[digest] = vector
+        return vector
+
+    def get(self, item_type, item_id, text):
+        """
+        Get the embedding for one item, encoding and persisting it if missing or stale
+
+        Args:
+            item_type: 'lost' or 'found'
+            item_id: Row id of the item
+            text: Current description of the item
+
+        Returns:
+            Normalized embedding vector, or None for empty text
+        """
+        if not text:
+            return None
+        return self.get_many(item_type, [(item_id, text)])[item_id]
+
+    def get_many(self, item_type, items):
+        """
+        Get embeddings for many items of one type in a single pass
+
+        Stale rows (description edited since it was embedded) are detected by
+        content hash and re-encoded together in batches
+
+        Args:
+            item_type: 'lost' or 'found'
+            items: Iterable of (item_id, description) pairs
+
+        Returns:
+            Dictionary mapping item_id to normalized vector (None for empty text)
+        """
+        result = {}
+        wanted = {}
+
+        with self._lock:
+            for item_id, text in items:
+                if not text:
+                    result[item_id] = None
+                    continue
+                digest = content_hash(text, self.model_key)
+                key = (item_type, item_id)
+                cached = self._memory.get(key)
+                if cached is not None and cached[0] == digest:
+                    self._memory.move_to_end(key)
+                    result[item_id] = cached[1]
+                    self.stats['memory_hits'] += 1
+                else:
+                    wanted[item_id] = (digest, text)
+
+        if not wanted:
+            return result
+
+        conn = self.get_db_connection()
+        try:
+            stored = self._load_rows(conn, item_type, list(wanted.keys()))
+
+            missing = []
+            for item_id, (digest, text) in wanted.items():
+                row = stored.get(item_id)
+                if row is not None and row[0] == digest:
+                    result[item_id] = row[1]
+                    self._remember(item_type, item_id, digest, row[1])
+                    self.stats['db_hits'] += 1
+                else:
+                    missing.append(item_id)
+
+            if missing:
+                vectors = self._encode([wanted[item_id][1] for item_id in missing])
+                now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                conn.executemany('''
+                    INSERT OR REPLACE INTO text_embeddings
+                    (item_type, item_id, content_hash, dim, embedding, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [
+                    (item_type, item_id, wanted[item_id][0], vector.shape[0], vector.tobytes(), now)
+                    for item_id, vector in zip(missing, vectors)
+                ])
+                conn.commit()
+
+                for item_id, vector in zip(missing, vectors):
+                    result[item_id] = vector
+                    self._remember(item_type, item_id, wanted[item_id][0], vector)
+        finally:
+            conn.close()
+
+        return result
+
+    def _load_rows(self, conn, item_type, item_ids):
+        """Read stored (content_hash, vector) rows for the given ids"""
+        rows = {}
+        # Stay below SQLite's bound parameter limit
+        for start in range(0, len(item_ids), 900):
+            chunk = item_ids[start:start + 900]
+            placeholders = ','.join('?' * len(chunk))
+            for row in conn.execute(f'''
+                SELECT item_id, content_hash, embedding
+                FROM text_embeddings
+                WHERE item_type = ? AND item_id IN ({placeholders})
+            ''', [item_type] + chunk):
+                rows[row['item_id']] = (
+                    row['content_hash'],
+                    np.frombuffer(row['embedding'], dtype=np.float32)
+                )
+        return rows
+
+    def _remember(self, item_type, item_id, digest, vector):
+        key = (item_type, item_id)
+        with self._lock:
+            self._memory[key] = (digest, vector)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_limit:
+                self._memory.popitem(last=False)
+
+    def invalidate(self, item_type, item_id):
+        """Drop the stored embedding for an item (e.g. after it is deleted)"""
+        with self._lock:
+            self._memory.pop((item_type, item_id), None)
+        conn = self.get_db_connection()
+        conn.execute(
+            'DELETE FROM text_embeddings WHERE item_type = ? AND item_id = ?',
+            (item_type, item_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def refresh_all(self):
+        """
+        Embed every lost/found description that is new or edited since its last encoding
+
+        Returns:
+            Number of descriptions that had to be (re-)encoded
+        """
+        before = self.stats['encoded']
+        conn = self.get_db_connection()
+        try:
+            for item_type, table in ITEM_TABLES.items():
+                rows = conn.execute(f'SELECT rowid, description FROM {table}').fetchall()
+                self.get_many(item_type, [(row[0], row[1]) for row in rows])
+        finally:
+            conn.close()
+        return self.stats['encoded'] - before
+
+    def refresh_items(self, item_type, item_ids):
+        """
+        Embed the given items if their description is new or edited since its last encoding
+
+        Args:
+            item_type: 'lost' or 'found'
+            item_ids: Row ids to check (ids of deleted items are skipped)
+
+        Returns:
+            Number of descriptions that had to be (re-)encoded
+        """
+        before = self.stats['encoded']
+        item_ids = list(item_ids)
+        rows = []
+        conn = self.get_db_connection()
+        try:
+            for start in range(0, len(item_ids), 900):
+                chunk = item_ids[start:start + 900]
+                placeholders = ','.join('?' * len(chunk))
+                rows.extend(conn.execute(
+                    f'SELECT rowid, description FROM {ITEM_TABLES[item_type]} WHERE rowid IN ({placeholders})',
+                    chunk
+                ).fetchall())
+        finally:
+            conn.close()
+        self.get_many(item_type, [(row[0], row[1]) for row in rows])
+        return self.stats['encoded'] - before
+
+    def prune(self):
+        """
+        Delete stored embeddings whose item no longer exists
+
+        Returns:
+            Number of rows removed
+        """
+        conn = self.get_db_connection()
+        removed = []
+        try:
+            for item_type, table in ITEM_TABLES.items():
+                orphans = [row[0] for row in conn.execute(f'''
+                    SELECT item_id FROM text_embeddings
+                    WHERE item_type = ? AND item_id NOT IN (SELECT rowid FROM {table})
+                ''', (item_type,)).fetchall()]
+                conn.executemany(
+                    'DELETE FROM text_embeddings WHERE item_type = ? AND item_id = ?',
+                    [(item_type, item_id) for item_id in orphans]
+                )
+                removed.extend((item_type, item_id) for item_id in orphans)
+            conn.commit()
+        finally:
+            conn.close()
+
+        # Only forget the deleted items; the rest of the warm cache stays valid
+        if removed:
+            with self._lock:
+                for key in removed:
+                    self._memory.pop(key, None)
+        return len(removed)
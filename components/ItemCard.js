@@ -88,7 +88,7 @@ export default function ItemCard({ item, type, id, title, location, date, ago, c
       {displayItem.image_filename && isMyItem && (
         <div className="mb-3 rounded-lg overflow-hidden">
           <img 
-            src={`http://localhost:5000/api/uploads/${displayItem.image_filename}`}
+            src={`http://localhost:5000/api/uploads/${displayItem.image_filename}?w=640`}
             alt={displayItem.title}
             loading="lazy"
             className="w-full h-48 object-cover hover:scale-105 transition-transform duration-200"